@@ -0,0 +1,59 @@
+from collections import deque
+
+
+class AhoCorasick:
+    """
+    Multi-pattern matcher that finds every occurrence of many patterns in a
+    single pass over the text (Aho-Corasick automaton).
+    """
+
+    def __init__(self, patterns: dict[str, str]):
+        """Compile patterns, a mapping of pattern text to the value reported on a match."""
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._output: list[list[tuple[int, str]]] = [[]]
+
+        for pattern, value in patterns.items():
+            state = 0
+            for char in pattern:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                    self._goto[state][char] = next_state
+                state = next_state
+            self._output[state].append((len(pattern), value))
+
+        # Breadth-first pass to set failure links and merge outputs
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+        # Fold the failure links into the transitions (states in breadth-first order, so each
+        # failure state is complete before it is used), so matching is one lookup per character
+        self._delta: list[dict[str, int]] = [dict(self._goto[0])] + [{} for _ in range(len(self._goto) - 1)]
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            self._delta[state] = {**self._delta[self._fail[state]], **self._goto[state]}
+            queue.extend(self._goto[state].values())
+
+    def find_all(self, text: str):
+        """Yield (start, end, value) for every pattern occurrence, overlapping ones included."""
+        delta = self._delta
+        output = self._output
+        state = 0
+        for index, char in enumerate(text):
+            state = delta[state].get(char, 0)
+            if output[state]:
+                for length, value in output[state]:
+                    yield index - length + 1, index + 1, value
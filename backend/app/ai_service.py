@@ -1,21 +1,50 @@
 import os
 import json
-from openai import OpenAI
-from dotenv import load_dotenv
+from app.settings import get_settings
+from app.llm_client import create_chat_completion, stream_chat_completion, LLMUnavailableError
+from app.stream_parser import JSONStreamParser
+from app.prompt_builder import build_jd_prompt_text
+from app.metrics import timed
 
-load_dotenv()
+MODEL = "gpt-4o-mini"
+# Bump whenever the prompt or the result schema changes so cached analyses
+# produced by an older prompt are not served again.
+PROMPT_VERSION = "4"
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# Outreach drafts are long, so they are streamed as text deltas
+DRAFT_KEYS = ("email_subject", "email_body", "dm_message")
+# Draft fields written for each contact mode
+DRAFT_FIELDS = {
+    "email": ("email_subject", "email_body"),
+    "dm": ("dm_message",),
+    "both": ("email_subject", "email_body", "dm_message")
+}
+# Placeholders shown to the model for each draft field
+DRAFT_FIELD_DESCRIPTIONS = {
+    "email_subject": "<subject line string>",
+    "email_body": "<email body text>",
+    "dm_message": "<short professional DM message, 2-4 lines max>"
+}
 
+# Output token caps: the scoring call returns a short JSON object, drafts are a few paragraphs
+ANALYSIS_MAX_TOKENS = int(os.getenv("ANALYSIS_MAX_TOKENS", "400"))
+DRAFT_MAX_TOKENS = int(os.getenv("DRAFT_MAX_TOKENS", "800"))
+
+SYSTEM_MESSAGE = "You are a helpful assistant that returns only valid JSON. Never include markdown code blocks or any text outside the JSON object."
+
+
+VALIDITY_INSTRUCTIONS = """
+
+ADDITIONALLY: Decide whether the job description text is actually a job description (it describes a role, lists responsibilities/requirements/skills and is about employment), as opposed to UI elements, navigation menus or unrelated content.
+Add a boolean key "is_job_description" to the JSON object with this verdict. If it is false, still return the structure above with your best effort values."""
 
-def analyze_resume_jd(resume_text: str, jd_text: str) -> dict:
-    """Analyze resume against job description using AI."""
-    if not os.getenv("OPENAI_API_KEY"):
-        raise ValueError("OPENAI_API_KEY not found in environment variables")
-    
-    prompt = f"""Analyze the following resume against the job description.
 
-Resume:
+def _build_prompt(resume_text: str, jd_text: str, include_validity: bool = False) -> str:
+    """Build the analysis prompt for a resume/JD pair."""
+    jd_text, _ = build_jd_prompt_text(jd_text)
+    prompt = f"""Analyze the following resume profile against the job description.
+
+Resume profile:
 {resume_text}
 
 Job Description:
@@ -26,37 +55,12 @@ IMPORTANT: Determine the contact method from the job description:
 - DM: Use if JD mentions "DM", "message", "reach out", "comment", "connect on LinkedIn", OR if it's a social media post without an email address
 - BOTH: Use if JD mentions BOTH an email address AND DM/message options (e.g., "email us at X or DM us")
 
-Return ONLY a valid JSON object with no additional text, comments, or markdown formatting.
-
-IF contact_mode is "email", use this structure:
-{{
-  "match_score": <number between 0 and 100>,
-  "missing_skills": [<array of skill strings>],
-  "contact_mode": "email",
-  "destination_email": "<extracted email address>",
-  "email_subject": "<subject line string>",
-  "email_body": "<email body text>",
-  "warnings": [<optional array of warning strings>]
-}}
-
-IF contact_mode is "dm", use this structure:
+Return ONLY a valid JSON object with no additional text, comments, or markdown formatting, using this structure:
 {{
   "match_score": <number between 0 and 100>,
   "missing_skills": [<array of skill strings>],
-  "contact_mode": "dm",
-  "dm_message": "<short professional DM message, 2-4 lines max>",
-  "warnings": [<optional array of warning strings>]
-}}
-
-IF contact_mode is "both", use this structure:
-{{
-  "match_score": <number between 0 and 100>,
-  "missing_skills": [<array of skill strings>],
-  "contact_mode": "both",
-  "destination_email": "<extracted email address>",
-  "email_subject": "<subject line string>",
-  "email_body": "<email body text>",
-  "dm_message": "<short professional DM message, 2-4 lines max>",
+  "contact_mode": "<email, dm or both>",
+  "destination_email": "<extracted email address, only if contact_mode is email or both>",
   "warnings": [<optional array of warning strings>]
 }}
 
@@ -64,94 +68,266 @@ Rules:
 - match_score: Calculate based on skill overlap between resume and JD (0-100)
 - missing_skills: List skills mentioned in JD but not found in resume
 - contact_mode: MUST be "email", "dm", or "both" based on JD content
-- For email mode: destination_email must be an actual email address found in JD (do NOT guess or use "Not specified")
-- For email mode: Generate professional email_subject and email_body
-- For dm mode: Generate a short, direct, polite DM message (2-4 lines) that mentions the role, key skill fit, and ends with a call to action
-- warnings: OPTIONAL array of warning strings. Add warnings if:
-  * Location mismatch: Job location (city/region) is mentioned in JD AND candidate location is found in resume AND they are different AND JD is NOT explicitly marked as "Remote" or "Work from home"
-    - Warning format: "Job location is [JD location], while your resume location is [resume location]." or "This role appears to be location-specific."
-  * Seniority mismatch: JD requires SENIOR level (detect indicators: "Senior", "5+ years", "7+ years", "8+ years", "Lead", "Staff", "Principal", "Senior Engineer", "Senior Developer", etc.) AND resume reflects junior–mid level (based on years of experience, role titles like "Junior", "Associate", "Entry-level", or less than 5 years total experience)
-    - Warning format: "This role is marked as Senior (requires [X] years experience), while your resume reflects a junior–mid level profile." or similar factual, neutral statement
-    - Do NOT add this warning if resume shows senior-level experience or if JD is not clearly senior-level
+- destination_email: For email and both modes, must be an actual email address found in JD (do NOT guess or use "Not specified"); omit it for dm mode
+- warnings: OPTIONAL array of warning strings for other clear mismatches (e.g. a required degree, certification or work authorization the resume lacks)
+  * Do NOT add location or seniority warnings; those are checked separately
   * If no mismatches, warnings array can be empty or omitted
+- Do NOT write an email or message; outreach drafts are written separately, only when the user asks for them
 
 Return ONLY the JSON object, nothing else."""
 
+    if include_validity:
+        prompt += VALIDITY_INSTRUCTIONS
+    return prompt
+
+
+def _build_messages(resume_text: str, jd_text: str, include_validity: bool = False) -> list[dict]:
+    """Build the chat messages for an analysis request."""
+    return [
+        {"role": "system", "content": SYSTEM_MESSAGE},
+        {"role": "user", "content": _build_prompt(resume_text, jd_text, include_validity)}
+    ]
+
+
+def _build_draft_prompt(resume_text: str, jd_text: str, analysis: dict) -> str:
+    """Build the outreach prompt from an earlier analysis of the resume/JD pair."""
+    jd_text, _ = build_jd_prompt_text(jd_text)
+    fields = DRAFT_FIELDS[analysis["contact_mode"]]
+    structure = ",\n".join(f'  "{field}": "{DRAFT_FIELD_DESCRIPTIONS[field]}"' for field in fields)
+    missing_skills = ", ".join(analysis["missing_skills"]) or "none"
+    return f"""Write job application outreach for the following resume profile and job description.
+
+Resume profile:
+{resume_text}
+
+Job Description:
+{jd_text}
+
+The resume has already been analyzed against this job description:
+- Match score: {round(analysis["match_score"])}/100
+- Skills the JD asks for that the resume lacks: {missing_skills}
+
+Return ONLY a valid JSON object with no additional text, comments, or markdown formatting, using this structure:
+{{
+{structure}
+}}
+
+Rules:
+- email_subject and email_body: professional, mention the role and the strongest skill fit from the resume
+- dm_message: short, direct and polite (2-4 lines), mentions the role and key skill fit, and ends with a call to action
+- Never claim the missing skills listed above
+
+Return ONLY the JSON object, nothing else."""
+
+
+def _build_draft_messages(resume_text: str, jd_text: str, analysis: dict) -> list[dict]:
+    """Build the chat messages for an outreach draft request."""
+    return [
+        {"role": "system", "content": SYSTEM_MESSAGE},
+        {"role": "user", "content": _build_draft_prompt(resume_text, jd_text, analysis)}
+    ]
+
+
+def _load_json(result_text: str) -> dict:
+    """Parse the raw model output, tolerating a markdown code block around it."""
+    result_text = result_text.strip()
+    
+    # Remove markdown code blocks if present
+    if result_text.startswith("```json"):
+        result_text = result_text[7:]
+    if result_text.startswith("```"):
+        result_text = result_text[3:]
+    if result_text.endswith("```"):
+        result_text = result_text[:-3]
+    result_text = result_text.strip()
+    
+    result = json.loads(result_text)
+    if not isinstance(result, dict):
+        raise ValueError("Expected a JSON object")
+    return result
+
+
+def _parse_result(result_text: str) -> dict:
+    """Parse and validate the raw scoring output."""
+    result = _load_json(result_text)
+    
+    # Validate common required keys
+    if "match_score" not in result:
+        raise ValueError("Missing required key: match_score")
+    if "missing_skills" not in result:
+        raise ValueError("Missing required key: missing_skills")
+    if "contact_mode" not in result:
+        raise ValueError("Missing required key: contact_mode")
+    
+    # Validate types
+    if not isinstance(result["match_score"], (int, float)) or not (0 <= result["match_score"] <= 100):
+        raise ValueError("match_score must be a number between 0 and 100")
+    if not isinstance(result["missing_skills"], list):
+        raise ValueError("missing_skills must be an array")
+    if result["contact_mode"] not in ["email", "dm", "both"]:
+        raise ValueError("contact_mode must be 'email', 'dm', or 'both'")
+    
+    # The destination address is required wherever an email will be drafted
+    if result["contact_mode"] in ("email", "both"):
+        if "destination_email" not in result:
+            raise ValueError(f"Missing required key for {result['contact_mode']} mode: destination_email")
+        if not isinstance(result["destination_email"], str):
+            raise ValueError("destination_email must be a string")
+    
+    # Validate optional warnings field
+    if "warnings" in result:
+        if not isinstance(result["warnings"], list):
+            raise ValueError("warnings must be an array")
+        for warning in result["warnings"]:
+            if not isinstance(warning, str):
+                raise ValueError("Each warning must be a string")
+    else:
+        # Initialize empty warnings if not present
+        result["warnings"] = []
+    
+    return result
+
+
+def _parse_draft(result_text: str, contact_mode: str) -> dict:
+    """Parse and validate the raw draft output, keeping only the fields of the contact mode."""
+    result = _load_json(result_text)
+    draft = {}
+    for field in DRAFT_FIELDS[contact_mode]:
+        if field not in result:
+            raise ValueError(f"Missing required key for {contact_mode} mode: {field}")
+        if not isinstance(result[field], str):
+            raise ValueError(f"{field} must be a string")
+        draft[field] = result[field]
+    return draft
+
+
+async def analyze_resume_jd_async(resume_text: str, jd_text: str, include_validity: bool = False) -> dict:
+    """
+    Analyze resume against job description without blocking the event loop.
+    With include_validity, the model also returns an "is_job_description" verdict.
+    """
+    if not get_settings().openai_api_key:
+        raise ValueError("OPENAI_API_KEY not found in environment variables")
+    
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant that returns only valid JSON. Never include markdown code blocks or any text outside the JSON object."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.3,
-            response_format={"type": "json_object"}
-        )
-        
-        result_text = response.choices[0].message.content.strip()
+        with timed("llm_completion"):
+            response = await create_chat_completion(
+                model=MODEL,
+                messages=_build_messages(resume_text, jd_text, include_validity),
+                temperature=0.3,
+                max_tokens=ANALYSIS_MAX_TOKENS,
+                response_format={"type": "json_object"}
+            )
+        with timed("json_parse"):
+            return _parse_result(response.choices[0].message.content)
         
-        # Remove markdown code blocks if present
-        if result_text.startswith("```json"):
-            result_text = result_text[7:]
-        if result_text.startswith("```"):
-            result_text = result_text[3:]
-        if result_text.endswith("```"):
-            result_text = result_text[:-3]
-        result_text = result_text.strip()
-        
-        result = json.loads(result_text)
-        
-        # Validate common required keys
-        if "match_score" not in result:
-            raise ValueError("Missing required key: match_score")
-        if "missing_skills" not in result:
-            raise ValueError("Missing required key: missing_skills")
-        if "contact_mode" not in result:
-            raise ValueError("Missing required key: contact_mode")
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Failed to parse AI response as JSON: {str(e)}")
+    except LLMUnavailableError:
+        # Upstream trouble is reported as such (503), not as a bad analysis
+        raise
+    except Exception as e:
+        raise ValueError(f"AI service error: {str(e)}")
+
+
+async def stream_resume_jd_analysis(resume_text: str, jd_text: str):
+    """
+    Stream an analysis as (event, data) pairs.
+    Yields (key, value) as each top-level value such as match_score completes,
+    and finally ("result", result) with the validated result.
+    """
+    if not get_settings().openai_api_key:
+        raise ValueError("OPENAI_API_KEY not found in environment variables")
+    
+    parser = JSONStreamParser()
+    chunks = []
+    try:
+        # Covers the whole stream, including time the consumer spends between chunks
+        with timed("llm_completion"):
+            async for delta in stream_chat_completion(
+                model=MODEL,
+                messages=_build_messages(resume_text, jd_text),
+                temperature=0.3,
+                max_tokens=ANALYSIS_MAX_TOKENS,
+                response_format={"type": "json_object"}
+            ):
+                chunks.append(delta)
+                for _, key, value in parser.feed(delta):
+                    yield key, value
         
-        # Validate types
-        if not isinstance(result["match_score"], (int, float)) or not (0 <= result["match_score"] <= 100):
-            raise ValueError("match_score must be a number between 0 and 100")
-        if not isinstance(result["missing_skills"], list):
-            raise ValueError("missing_skills must be an array")
-        if result["contact_mode"] not in ["email", "dm", "both"]:
-            raise ValueError("contact_mode must be 'email', 'dm', or 'both'")
+        # Run the same validation as the non-streaming path on the final object
+        with timed("json_parse"):
+            result = _parse_result("".join(chunks))
+        yield "result", result
         
-        # Validate mode-specific keys
-        if result["contact_mode"] == "email":
-            required_email_keys = ["destination_email", "email_subject", "email_body"]
-            for key in required_email_keys:
-                if key not in result:
-                    raise ValueError(f"Missing required key for email mode: {key}")
-                if not isinstance(result[key], str):
-                    raise ValueError(f"{key} must be a string")
-        elif result["contact_mode"] == "dm":
-            if "dm_message" not in result:
-                raise ValueError("Missing required key for dm mode: dm_message")
-            if not isinstance(result["dm_message"], str):
-                raise ValueError("dm_message must be a string")
-        elif result["contact_mode"] == "both":
-            required_both_keys = ["destination_email", "email_subject", "email_body", "dm_message"]
-            for key in required_both_keys:
-                if key not in result:
-                    raise ValueError(f"Missing required key for both mode: {key}")
-                if not isinstance(result[key], str):
-                    raise ValueError(f"{key} must be a string")
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Failed to parse AI response as JSON: {str(e)}")
+    except LLMUnavailableError:
+        # Upstream trouble is reported as such (503), not as a bad analysis
+        raise
+    except Exception as e:
+        raise ValueError(f"AI service error: {str(e)}")
+
+
+async def draft_outreach_async(resume_text: str, jd_text: str, analysis: dict) -> dict:
+    """
+    Write the outreach drafts (email and/or DM, per the analysis contact_mode)
+    for an earlier analysis of the resume against the JD.
+    """
+    if not get_settings().openai_api_key:
+        raise ValueError("OPENAI_API_KEY not found in environment variables")
+    
+    try:
+        with timed("llm_draft"):
+            response = await create_chat_completion(
+                model=MODEL,
+                messages=_build_draft_messages(resume_text, jd_text, analysis),
+                temperature=0.5,
+                max_tokens=DRAFT_MAX_TOKENS,
+                response_format={"type": "json_object"}
+            )
+        with timed("json_parse"):
+            return _parse_draft(response.choices[0].message.content, analysis["contact_mode"])
         
-        # Validate optional warnings field
-        if "warnings" in result:
-            if not isinstance(result["warnings"], list):
-                raise ValueError("warnings must be an array")
-            for warning in result["warnings"]:
-                if not isinstance(warning, str):
-                    raise ValueError("Each warning must be a string")
-        else:
-            # Initialize empty warnings if not present
-            result["warnings"] = []
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Failed to parse AI response as JSON: {str(e)}")
+    except LLMUnavailableError:
+        raise
+    except Exception as e:
+        raise ValueError(f"AI service error: {str(e)}")
+
+
+async def stream_outreach_draft(resume_text: str, jd_text: str, analysis: dict):
+    """
+    Stream the outreach drafts as ("draft", {"field": key, "delta": text}) pairs
+    as the text arrives, then ("result", drafts) with the validated drafts.
+    """
+    if not get_settings().openai_api_key:
+        raise ValueError("OPENAI_API_KEY not found in environment variables")
+    
+    parser = JSONStreamParser(stream_keys=DRAFT_KEYS)
+    chunks = []
+    try:
+        with timed("llm_draft"):
+            async for delta in stream_chat_completion(
+                model=MODEL,
+                messages=_build_draft_messages(resume_text, jd_text, analysis),
+                temperature=0.5,
+                max_tokens=DRAFT_MAX_TOKENS,
+                response_format={"type": "json_object"}
+            ):
+                chunks.append(delta)
+                for kind, key, value in parser.feed(delta):
+                    if kind == "delta":
+                        yield "draft", {"field": key, "delta": value}
         
-        return result
+        with timed("json_parse"):
+            draft = _parse_draft("".join(chunks), analysis["contact_mode"])
+        yield "result", draft
         
     except json.JSONDecodeError as e:
         raise ValueError(f"Failed to parse AI response as JSON: {str(e)}")
+    except LLMUnavailableError:
+        raise
     except Exception as e:
         raise ValueError(f"AI service error: {str(e)}")
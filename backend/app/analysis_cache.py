@@ -0,0 +1,115 @@
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from sqlmodel import Session, select, delete, func
+from app.models import AnalysisCacheEntry
+from app.ai_service import MODEL, PROMPT_VERSION
+from app.jd_service import normalize_jd_text
+from app.metrics import CACHE_EVENTS
+
+MAX_ENTRIES = int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", "500"))
+MAX_BYTES = int(os.getenv("ANALYSIS_CACHE_MAX_BYTES", str(5 * 1024 * 1024)))
+TTL_SECONDS = int(os.getenv("ANALYSIS_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+_stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+_stats_lock = threading.Lock()
+
+
+def _count(name: str, amount: int = 1):
+    with _stats_lock:
+        _stats[name] += amount
+    CACHE_EVENTS.inc(amount, cache="analysis", event=name)
+
+
+def make_cache_key(resume_hash: str, jd_text: str) -> str:
+    """Build a content-addressed key from the resume text hash and the JD."""
+    digest = hashlib.sha256()
+    for part in (MODEL, PROMPT_VERSION, resume_hash, normalize_jd_text(jd_text)):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _is_expired(entry: AnalysisCacheEntry, now: datetime) -> bool:
+    return entry.created_at < now - timedelta(seconds=TTL_SECONDS)
+
+
+def get_cached_analysis(session: Session, key: str) -> dict | None:
+    """Return a cached analysis result, or None on a miss."""
+    entry = session.get(AnalysisCacheEntry, key)
+    now = datetime.utcnow()
+    if entry is None or _is_expired(entry, now):
+        if entry is not None:
+            session.delete(entry)
+            session.commit()
+            _count("evictions")
+        _count("misses")
+        return None
+
+    entry.last_accessed_at = now
+    session.add(entry)
+    session.commit()
+    _count("hits")
+    return json.loads(entry.result_json)
+
+
+def store_analysis(session: Session, key: str, result: dict):
+    """Store an analysis result and evict old entries if over the limits."""
+    result_json = json.dumps(result)
+    now = datetime.utcnow()
+    session.merge(AnalysisCacheEntry(
+        key=key,
+        result_json=result_json,
+        size_bytes=len(result_json.encode("utf-8")),
+        created_at=now,
+        last_accessed_at=now
+    ))
+    session.commit()
+    _count("stores")
+    _evict(session)
+
+
+def _evict(session: Session):
+    """Drop expired entries, then least recently used ones over the size limits."""
+    cutoff = datetime.utcnow() - timedelta(seconds=TTL_SECONDS)
+    expired = session.execute(
+        delete(AnalysisCacheEntry).where(AnalysisCacheEntry.created_at < cutoff)
+    ).rowcount
+
+    count, total_bytes = session.execute(
+        select(func.count(), func.coalesce(func.sum(AnalysisCacheEntry.size_bytes), 0))
+    ).one()
+
+    evicted_keys = []
+    if count > MAX_ENTRIES or total_bytes > MAX_BYTES:
+        oldest = session.execute(
+            select(AnalysisCacheEntry.key, AnalysisCacheEntry.size_bytes)
+            .order_by(AnalysisCacheEntry.last_accessed_at)
+        ).all()
+        for key, size_bytes in oldest:
+            if count <= MAX_ENTRIES and total_bytes <= MAX_BYTES:
+                break
+            evicted_keys.append(key)
+            count -= 1
+            total_bytes -= size_bytes
+        if evicted_keys:
+            session.execute(delete(AnalysisCacheEntry).where(AnalysisCacheEntry.key.in_(evicted_keys)))
+
+    session.commit()
+    _count("evictions", expired + len(evicted_keys))
+
+
+def get_cache_stats(session: Session) -> dict:
+    """Return hit/miss counters and current cache size."""
+    count, total_bytes = session.execute(
+        select(func.count(), func.coalesce(func.sum(AnalysisCacheEntry.size_bytes), 0))
+    ).one()
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+    stats["entries"] = count
+    stats["size_bytes"] = total_bytes
+    return stats
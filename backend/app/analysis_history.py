@@ -0,0 +1,133 @@
+import json
+import re
+from sqlmodel import Session, select, func
+from sqlalchemy import text
+from app.models import Analysis
+from app.jd_similarity import minhash_signature, index_analysis
+
+# Maximum page size of the list and search endpoints
+MAX_PAGE_SIZE = 100
+# Characters of the JD shown in list and search results
+JD_PREVIEW_CHARS = 200
+
+
+def record_analysis(session: Session, resume_hash: str, jd_text: str, result: dict, latency_ms: int, usage: dict | None = None,
+                    reused_from: int | None = None) -> Analysis:
+    """
+    Store a completed analysis in the history and index it for near-duplicate lookups.
+    reused_from is the analysis whose result a near-duplicate JD reused.
+    """
+    usage = usage or {}
+    signature = minhash_signature(jd_text)
+    analysis = Analysis(
+        resume_hash=resume_hash,
+        jd_text=jd_text,
+        result_json=json.dumps(result),
+        match_score=result["match_score"],
+        latency_ms=latency_ms,
+        prompt_tokens=usage.get("prompt_tokens", 0),
+        completion_tokens=usage.get("completion_tokens", 0),
+        jd_signature=signature.tobytes() if signature is not None else None,
+        reused_from=reused_from
+    )
+    session.add(analysis)
+    session.commit()
+    session.refresh(analysis)
+    index_analysis(analysis.id, resume_hash, signature)
+    return analysis
+
+
+def store_draft(session: Session, analysis_id: int, draft: dict, usage: dict | None = None):
+    """Store the outreach drafts of an analysis, adding their token usage to its totals."""
+    usage = usage or {}
+    analysis = session.get(Analysis, analysis_id)
+    if analysis is None:
+        return
+    analysis.draft_json = json.dumps(draft)
+    analysis.prompt_tokens += usage.get("prompt_tokens", 0)
+    analysis.completion_tokens += usage.get("completion_tokens", 0)
+    session.add(analysis)
+    session.commit()
+
+
+def _summary(row) -> dict:
+    summary = {
+        "id": row.id,
+        "created_at": row.created_at.isoformat(),
+        "match_score": row.match_score,
+        "jd_preview": row.jd_preview,
+        "latency_ms": row.latency_ms,
+        "prompt_tokens": row.prompt_tokens,
+        "completion_tokens": row.completion_tokens
+    }
+    if getattr(row, "snippet", None) is not None:
+        summary["snippet"] = row.snippet
+    return summary
+
+
+def list_analyses(session: Session, limit: int = 20, offset: int = 0) -> dict:
+    """Return a page of analyses, newest first."""
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    rows = session.execute(
+        select(
+            Analysis.id, Analysis.created_at, Analysis.match_score, Analysis.latency_ms,
+            Analysis.prompt_tokens, Analysis.completion_tokens,
+            func.substr(Analysis.jd_text, 1, JD_PREVIEW_CHARS).label("jd_preview")
+        )
+        .order_by(Analysis.id.desc())
+        .limit(limit)
+        .offset(max(0, offset))
+    ).all()
+    total = session.execute(select(func.count()).select_from(Analysis)).scalar_one()
+    return {"items": [_summary(row) for row in rows], "total": total, "limit": limit, "offset": max(0, offset)}
+
+
+def _fts_query(query: str) -> str:
+    """Turn free text into an FTS5 query matching all words (quoted, so user input is never FTS syntax)."""
+    terms = re.findall(r"[\w+#.]+", query)
+    return " ".join('"' + term.replace('"', '""') + '"' for term in terms)
+
+
+def search_analyses(session: Session, query: str, limit: int = 20, offset: int = 0) -> dict:
+    """Full-text search over analyzed JDs, newest first."""
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    offset = max(0, offset)
+    fts_query = _fts_query(query)
+    if not fts_query:
+        raise ValueError("Search query must contain at least one word")
+
+    rows = session.execute(
+        text(
+            "SELECT a.id, a.created_at, a.match_score, a.latency_ms, a.prompt_tokens, a.completion_tokens, "
+            "substr(a.jd_text, 1, :preview) AS jd_preview, "
+            "snippet(analysis_fts, 0, '[', ']', '...', 16) AS snippet "
+            "FROM analysis_fts JOIN analysis a ON a.id = analysis_fts.rowid "
+            "WHERE analysis_fts MATCH :query "
+            "ORDER BY analysis_fts.rowid DESC LIMIT :limit OFFSET :offset"
+        ).columns(created_at=Analysis.__table__.c.created_at.type),
+        {"query": fts_query, "preview": JD_PREVIEW_CHARS, "limit": limit, "offset": offset}
+    ).all()
+    total = session.execute(
+        text("SELECT count(*) FROM analysis_fts WHERE analysis_fts MATCH :query"),
+        {"query": fts_query}
+    ).scalar_one()
+    return {"items": [_summary(row) for row in rows], "total": total, "limit": limit, "offset": offset}
+
+
+def get_analysis(session: Session, analysis_id: int) -> dict | None:
+    """Return a stored analysis with its full JD and result."""
+    analysis = session.get(Analysis, analysis_id)
+    if analysis is None:
+        return None
+    return {
+        "id": analysis.id,
+        "created_at": analysis.created_at.isoformat(),
+        "resume_hash": analysis.resume_hash,
+        "jd_text": analysis.jd_text,
+        "result": json.loads(analysis.result_json),
+        "draft": json.loads(analysis.draft_json) if analysis.draft_json else None,
+        "reused_from": analysis.reused_from,
+        "latency_ms": analysis.latency_ms,
+        "prompt_tokens": analysis.prompt_tokens,
+        "completion_tokens": analysis.completion_tokens
+    }
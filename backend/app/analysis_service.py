@@ -0,0 +1,381 @@
+import asyncio
+import os
+import time
+from sqlmodel import Session
+from app.db import engine
+from app.analysis_cache import make_cache_key, get_cached_analysis, store_analysis
+from app.analysis_history import record_analysis, get_analysis, store_draft
+from app.jd_similarity import find_near_duplicate
+from app.llm_client import track_usage, LLMUnavailableError
+from app.single_flight import SingleFlight
+from app.metrics import timed
+from app.jd_service import process_jd_text, process_jd_image_async, OCRBusyError
+from app.skill_matcher import score_skills
+from app.resume_profile import check_jd_against_profile
+from app.resume_ranker import ResumeIndex
+from app.ai_service import analyze_resume_jd_async, stream_resume_jd_analysis, draft_outreach_async, stream_outreach_draft, DRAFT_FIELDS
+from app.jd_validator import check_jd_heuristics, classify_jd_text_async, validate_jd_text_async, INVALID_JD_MESSAGE
+
+# How JD validation is combined with the analysis call:
+# - "sequential": validate with the LLM classifier, then analyze (two round trips in series)
+# - "speculative": start the classifier and the analysis together, cancel the analysis if the JD is invalid
+# - "inline": fold the validity verdict into the analysis JSON (a single LLM call)
+JD_VALIDATION_MODE = os.getenv("JD_VALIDATION_MODE", "speculative").lower()
+
+# Warn when the LLM match score and the local skill-overlap score differ by more than this
+SKILL_SCORE_TOLERANCE = int(os.getenv("SKILL_SCORE_TOLERANCE", "30"))
+# Minimum number of recognized JD skills before the local score is trusted for the cross-check
+SKILL_CROSS_CHECK_MIN_SKILLS = 3
+
+# Maximum number of batch items processed concurrently
+BATCH_MAX_WORKERS = int(os.getenv("BATCH_MAX_WORKERS", "4"))
+# Maximum number of JDs accepted in one batch request
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "100"))
+
+
+class InvalidJDError(ValueError):
+    """Raised when the input is not a valid job description."""
+
+
+class ResumeNotStoredError(ValueError):
+    """Raised when drafts are requested for an analysis whose resume was since replaced or deleted."""
+
+
+# Concurrent requests for the same resume and JD share one analysis, and for the same analysis one draft
+_analysis_flights = SingleFlight("analysis_single_flight")
+_draft_flights = SingleFlight("draft_single_flight")
+
+
+async def _cancel(task: asyncio.Task):
+    task.cancel()
+    # Retrieve the outcome so a failed or cancelled task is never left unobserved
+    await asyncio.gather(task, return_exceptions=True)
+
+
+def _raise_if_invalid(verdict: tuple[bool, str]):
+    is_valid, error_message = verdict
+    if not is_valid:
+        raise InvalidJDError(error_message)
+
+
+async def _analyze_sequential(resume_text: str, jd_text: str) -> dict:
+    is_valid, error_message = await validate_jd_text_async(jd_text)
+    if not is_valid:
+        raise InvalidJDError(error_message)
+    return await analyze_resume_jd_async(resume_text, jd_text)
+
+
+async def _analyze_speculative(resume_text: str, jd_text: str) -> dict:
+    # Heuristics are local and cheap, so never start an LLM call for text they reject
+    is_valid, error_message = check_jd_heuristics(jd_text)
+    if not is_valid:
+        raise InvalidJDError(error_message)
+
+    analysis = asyncio.create_task(analyze_resume_jd_async(resume_text, jd_text))
+    try:
+        is_valid, error_message = await classify_jd_text_async(jd_text)
+        if not is_valid:
+            raise InvalidJDError(error_message)
+        return await analysis
+    finally:
+        if not analysis.done():
+            await _cancel(analysis)
+
+
+async def _analyze_inline(resume_text: str, jd_text: str) -> dict:
+    is_valid, error_message = check_jd_heuristics(jd_text)
+    if not is_valid:
+        raise InvalidJDError(error_message)
+
+    result = await analyze_resume_jd_async(resume_text, jd_text, include_validity=True)
+    if result.pop("is_job_description", True) is False:
+        raise InvalidJDError(INVALID_JD_MESSAGE)
+    return result
+
+
+async def validate_and_analyze(profile: dict, jd_text: str) -> dict:
+    """
+    Validate a JD and analyze it against the resume profile using JD_VALIDATION_MODE.
+    Raises InvalidJDError for invalid JDs and ValueError if the analysis fails.
+    """
+    resume_text = profile["prompt_text"]
+    if JD_VALIDATION_MODE == "sequential":
+        result = await _analyze_sequential(resume_text, jd_text)
+    elif JD_VALIDATION_MODE == "inline":
+        result = await _analyze_inline(resume_text, jd_text)
+    else:
+        result = await _analyze_speculative(resume_text, jd_text)
+    return add_local_warnings(result, profile, jd_text)
+
+
+def add_local_warnings(result: dict, profile: dict, jd_text: str) -> dict:
+    """
+    Add the deterministic location/seniority warnings, and a warning when the
+    LLM score disagrees with the local skill-overlap score.
+    """
+    result["warnings"] = check_jd_against_profile(profile, jd_text) + result["warnings"]
+    
+    local = score_skills(frozenset(profile["skills"]), jd_text)
+    if len(local["matched_skills"]) + len(local["missing_skills"]) < SKILL_CROSS_CHECK_MIN_SKILLS:
+        return result
+    if abs(result["match_score"] - local["match_score"]) > SKILL_SCORE_TOLERANCE:
+        result["warnings"].append(
+            f"The AI match score ({round(result['match_score'])}) differs from the keyword-based "
+            f"skill overlap score ({local['match_score']}); review the missing skills carefully."
+        )
+    return result
+
+
+def find_prior_analysis(session: Session, profile: dict, jd_text: str) -> dict | None:
+    """
+    Return the earlier result for a near-duplicate of this JD analyzed against the
+    same resume, flagged with "near_duplicate": {"analysis_id", "similarity"}.
+    The repost gets its own history row (and analysis_id), so drafts are written
+    from its text rather than the earlier posting's.
+    """
+    match = find_near_duplicate(profile["text_hash"], jd_text)
+    if match is None:
+        return None
+    analysis_id, similarity = match
+    prior = get_analysis(session, analysis_id)
+    if prior is None:
+        return None
+    # A changed application email means the contact details of the earlier result are stale
+    destination_email = prior["result"].get("destination_email")
+    if destination_email and destination_email.lower() not in jd_text.lower():
+        return None
+
+    # Drafts stored inside older results were written for the earlier posting
+    draft_fields = {field for fields in DRAFT_FIELDS.values() for field in fields}
+    result = {key: value for key, value in prior["result"].items() if key not in draft_fields}
+    result["near_duplicate"] = {"analysis_id": analysis_id, "similarity": round(similarity, 3)}
+    with timed("db_write"):
+        repost = record_analysis(session, profile["text_hash"], jd_text, result, 0, reused_from=analysis_id)
+        result["analysis_id"] = repost.id
+        store_analysis(session, make_cache_key(profile["text_hash"], jd_text), result)
+    return result
+
+
+async def run_analysis(session: Session, profile: dict, jd_text: str) -> dict:
+    """Return a cached or near-duplicate analysis, or validate, analyze, cache and record the JD."""
+    # Only valid JDs are ever cached, so a hit skips validation too
+    cache_key = make_cache_key(profile["text_hash"], jd_text)
+    with timed("cache_lookup"):
+        cached_result = get_cached_analysis(session, cache_key)
+    if cached_result is not None:
+        return cached_result
+    
+    # Reposts with small edits reuse the earlier analysis instead of calling the LLM
+    with timed("near_duplicate_lookup"):
+        prior_result = find_prior_analysis(session, profile, jd_text)
+    if prior_result is not None:
+        return prior_result
+    
+    # A double-click or a second tab waits for the analysis already running instead of starting another
+    return await _analysis_flights.run(cache_key, lambda: _analyze_and_store(profile, jd_text, cache_key))
+
+
+async def _analyze_and_store(profile: dict, jd_text: str, cache_key: str) -> dict:
+    started = time.perf_counter()
+    with track_usage() as usage:
+        result = await validate_and_analyze(profile, jd_text)
+    latency_ms = round((time.perf_counter() - started) * 1000)
+    # Runs in its own task, which can outlive the request session
+    with timed("db_write"), Session(engine) as session:
+        result["analysis_id"] = record_analysis(session, profile["text_hash"], jd_text, result, latency_ms, usage).id
+        store_analysis(session, cache_key, result)
+    return result
+
+
+def get_single_flight_stats() -> dict:
+    """Return how many analyses and drafts were started and how many requests joined one in flight."""
+    return {"analyses": _analysis_flights.get_stats(), "drafts": _draft_flights.get_stats()}
+
+
+def stored_draft(analysis: dict) -> dict | None:
+    """The drafts already written for a stored analysis, if any."""
+    if analysis["draft"] is not None:
+        return analysis["draft"]
+    # Analyses stored before drafts were split off contain them in the result
+    result = analysis["result"]
+    fields = DRAFT_FIELDS[result["contact_mode"]]
+    if all(field in result for field in fields):
+        return {field: result[field] for field in fields}
+    return None
+
+
+def draft_profile(resumes: ResumeIndex, analysis: dict) -> dict:
+    """Return the profile of the resume a stored analysis was made with, or raise ResumeNotStoredError."""
+    resume = resumes.find_by_text_hash(analysis["resume_hash"])
+    if resume is None:
+        raise ResumeNotStoredError("The resume this analysis was made with has been replaced or deleted. Please analyze the JD again.")
+    return resume["profile"]
+
+
+def draft_response(analysis: dict, draft: dict) -> dict:
+    """The drafts with the contact details they are meant for."""
+    result = analysis["result"]
+    response = {"analysis_id": analysis["id"], "contact_mode": result["contact_mode"]}
+    if "destination_email" in result:
+        response["destination_email"] = result["destination_email"]
+    return {**response, **draft}
+
+
+async def write_draft(resumes: ResumeIndex, analysis: dict) -> dict:
+    """
+    Return the outreach drafts for a stored analysis, writing and storing them on
+    the first request. Raises ResumeNotStoredError if they must be written but
+    the resume is gone, and ValueError if writing them fails.
+    """
+    draft = stored_draft(analysis)
+    if draft is None:
+        profile = draft_profile(resumes, analysis)
+        # A double-click on "write email" waits for the draft already being written
+        draft = await _draft_flights.run(str(analysis["id"]), lambda: _write_and_store_draft(profile, analysis))
+    return draft_response(analysis, draft)
+
+
+async def _write_and_store_draft(profile: dict, analysis: dict) -> dict:
+    with track_usage() as usage:
+        draft = await draft_outreach_async(profile["prompt_text"], analysis["jd_text"], analysis["result"])
+    with timed("db_write"), Session(engine) as session:
+        store_draft(session, analysis["id"], draft, usage)
+    return draft
+
+
+async def stream_draft(profile: dict, analysis: dict):
+    """Stream newly written drafts as (event, data) pairs, storing them once complete."""
+    with track_usage() as usage:
+        async for event, data in stream_outreach_draft(profile["prompt_text"], analysis["jd_text"], analysis["result"]):
+            if event == "result":
+                # The request session is gone once streaming starts
+                with timed("db_write"), Session(engine) as session:
+                    store_draft(session, analysis["id"], data, usage)
+                data = draft_response(analysis, data)
+            yield event, data
+
+
+def select_resume(resumes: ResumeIndex, jd_text: str, resume_id: int | None = None) -> tuple[dict, dict] | None:
+    """
+    Pick the requested resume, or the one most similar to the JD. Returns
+    (resume snapshot, {"id", "filename", "similarity"}), or None if resume_id
+    is not a stored resume.
+    """
+    with timed("resume_ranking"):
+        selection = resumes.select(jd_text, resume_id)
+    if selection is None:
+        return None
+    resume, similarity = selection
+    return resume, {"id": resume["id"], "filename": resume["filename"], "similarity": similarity}
+
+
+async def analyze_item(resumes: ResumeIndex, item: dict, resume_id: int | None = None) -> dict:
+    """
+    Read (OCR for images), validate and analyze one JD, {"source": "text" | "image", "content"},
+    against the requested or best-matching resume. Failures are returned as
+    {"status", "detail"} instead of raised; success is {"resume", "status": 200, "result"}.
+    """
+    try:
+        if item["source"] == "image":
+            jd_text = await process_jd_image_async(item["content"])
+        else:
+            jd_text = process_jd_text(item["content"])
+    except OCRBusyError as e:
+        return {"status": 503, "detail": str(e)}
+    except Exception as e:
+        return {"status": 400, "detail": f"Failed to process image: {str(e)}"}
+    
+    if not jd_text:
+        return {"status": 400, "detail": "Job description text is empty"}
+    if not len(resumes):
+        return {"status": 400, "detail": "No resume uploaded. Please upload a resume first."}
+    
+    selection = select_resume(resumes, jd_text, resume_id)
+    if selection is None:
+        return {"status": 404, "detail": "Resume not found"}
+    resume, choice = selection
+    try:
+        with Session(engine) as session:
+            result = await run_analysis(session, resume["profile"], jd_text)
+    except InvalidJDError as e:
+        return {"resume": choice, "status": 400, "detail": str(e)}
+    except LLMUnavailableError as e:
+        return {"resume": choice, "status": 503, "detail": str(e)}
+    except ValueError as e:
+        return {"resume": choice, "status": 500, "detail": f"AI analysis failed: {str(e)}"}
+    except Exception as e:
+        return {"resume": choice, "status": 500, "detail": f"Analysis error: {str(e)}"}
+    
+    return {"resume": choice, "status": 200, "result": result}
+
+
+async def _run_batch_item(resumes: ResumeIndex, resume_id: int | None, item: dict, semaphore: asyncio.Semaphore) -> dict:
+    outcome = {"index": item["index"], "source": item["source"]}
+    if item.get("filename"):
+        outcome["filename"] = item["filename"]
+    
+    async with semaphore:
+        return {**outcome, **await analyze_item(resumes, item, resume_id)}
+
+
+async def analyze_batch(resumes: ResumeIndex, items: list[dict], resume_id: int | None = None, max_workers: int = BATCH_MAX_WORKERS):
+    """
+    Analyze many JDs, each against the requested resume or the best-matching
+    one, at most max_workers at a time.
+    Each item is {"index", "source": "text" | "image", "content", "filename"?}.
+    Yields one outcome dict per item in completion order; a failing item is
+    reported with its status and detail instead of aborting the batch.
+    """
+    semaphore = asyncio.Semaphore(max_workers)
+    tasks = [asyncio.create_task(_run_batch_item(resumes, resume_id, item, semaphore)) for item in items]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def stream_validate_and_analyze(profile: dict, jd_text: str):
+    """
+    Stream (event, data) pairs for an analysis of a JD that passed the heuristics.
+    The LLM classifier runs alongside the stream (or first, in sequential mode;
+    inline mode streams like speculative) and events are held back until its
+    verdict is known.
+    Raises InvalidJDError for invalid JDs and ValueError if the analysis fails.
+    """
+    resume_text = profile["prompt_text"]
+    if JD_VALIDATION_MODE == "sequential":
+        _raise_if_invalid(await classify_jd_text_async(jd_text))
+        async for event, data in stream_resume_jd_analysis(resume_text, jd_text):
+            if event == "result":
+                data = add_local_warnings(data, profile, jd_text)
+            yield event, data
+        return
+
+    verdict = asyncio.create_task(classify_jd_text_async(jd_text))
+    stream = stream_resume_jd_analysis(resume_text, jd_text)
+    held = []
+    try:
+        async for event in stream:
+            if event[0] == "result":
+                event = ("result", add_local_warnings(event[1], profile, jd_text))
+            if held is not None and not verdict.done():
+                held.append(event)
+                continue
+            if held is not None:
+                _raise_if_invalid(verdict.result())
+                for held_event in held:
+                    yield held_event
+                held = None
+            yield event
+        
+        if held is not None:
+            _raise_if_invalid(await verdict)
+            for held_event in held:
+                yield held_event
+    finally:
+        if not verdict.done():
+            await _cancel(verdict)
+        await stream.aclose()
@@ -1,12 +1,85 @@
+import os
 from sqlmodel import SQLModel, create_engine, Session
+from sqlalchemy import event, inspect, text
 from pathlib import Path
 
 DATABASE_URL = "sqlite:///./resume.db"
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+# Connections kept open by the pool, and extra ones allowed under bursts
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "16"))
+# Page cache per connection, in KiB
+SQLITE_CACHE_KIB = int(os.getenv("SQLITE_CACHE_KIB", "16384"))
+
+engine = create_engine(
+    DATABASE_URL,
+    connect_args={"check_same_thread": False, "timeout": 10},
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=10
+)
+
+
+@event.listens_for(engine, "connect")
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    Tune every new SQLite connection: WAL lets readers run alongside a writer,
+    and synchronous=NORMAL is safe with WAL while avoiding an fsync per commit.
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_KIB}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA busy_timeout=10000")
+    cursor.close()
 
 
 def init_db():
     SQLModel.metadata.create_all(engine)
+    _add_missing_columns()
+    _create_search_index()
+
+
+def _create_search_index():
+    """Create the FTS5 index over analysis JDs, kept in sync by triggers."""
+    with engine.begin() as connection:
+        exists = connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'analysis_fts'")
+        ).first()
+        connection.execute(text(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS analysis_fts "
+            "USING fts5(jd_text, content='analysis', content_rowid='id')"
+        ))
+        connection.execute(text(
+            "CREATE TRIGGER IF NOT EXISTS analysis_fts_insert AFTER INSERT ON analysis BEGIN "
+            "INSERT INTO analysis_fts(rowid, jd_text) VALUES (new.id, new.jd_text); END"
+        ))
+        connection.execute(text(
+            "CREATE TRIGGER IF NOT EXISTS analysis_fts_delete AFTER DELETE ON analysis BEGIN "
+            "INSERT INTO analysis_fts(analysis_fts, rowid, jd_text) VALUES ('delete', old.id, old.jd_text); END"
+        ))
+        connection.execute(text(
+            "CREATE TRIGGER IF NOT EXISTS analysis_fts_update AFTER UPDATE OF jd_text ON analysis BEGIN "
+            "INSERT INTO analysis_fts(analysis_fts, rowid, jd_text) VALUES ('delete', old.id, old.jd_text); "
+            "INSERT INTO analysis_fts(rowid, jd_text) VALUES (new.id, new.jd_text); END"
+        ))
+        if not exists:
+            # Index rows stored before the index existed
+            connection.execute(text("INSERT INTO analysis_fts(analysis_fts) VALUES ('rebuild')"))
+
+
+def _add_missing_columns():
+    """Add model columns missing from tables created by an older version (create_all never alters tables)."""
+    inspector = inspect(engine)
+    with engine.begin() as connection:
+        for table in SQLModel.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    column_type = column.type.compile(engine.dialect)
+                    connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
 
 
 def get_session():
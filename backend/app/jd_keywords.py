@@ -0,0 +1,25 @@
+# Job-related keywords (valid indicators)
+JOB_KEYWORDS = [
+    'responsibilities', 'requirements', 'qualifications', 'experience',
+    'skills', 'role', 'position', 'candidate', 'applicant', 'job',
+    'work', 'team', 'company', 'years', 'degree', 'bachelor', 'master',
+    'develop', 'design', 'manage', 'lead', 'create', 'implement'
+]
+
+# UI/navigation text (invalid indicators)
+UI_INDICATORS = [
+    'menu', 'navigation', 'sidebar', 'click here', 'sign in', 'sign up',
+    'cookie', 'privacy policy', 'terms of service', 'chat', 'new chat',
+    'settings', 'profile', 'logout', 'home', 'back', 'next', 'previous'
+]
+
+# Boilerplate found in pasted JDs: EEO statements, benefits lists, cookie banners
+BOILERPLATE_PHRASES = [
+    'equal opportunity', 'equal employment', 'without regard to', 'religion',
+    'gender identity', 'sexual orientation', 'national origin', 'veteran status',
+    'disability', 'reasonable accommodation', 'affirmative action', 'e-verify',
+    'benefits', 'health insurance', 'dental', 'vision insurance', '401(k)',
+    'paid time off', 'pto', 'parental leave', 'wellness', 'gym membership',
+    'we use cookies', 'accept all', 'cookie', 'privacy policy', 'terms of use',
+    'recruitment agencies', 'unsolicited resumes', 'all rights reserved'
+]
@@ -1,15 +1,57 @@
-from typing import Optional
+from typing import Optional, TYPE_CHECKING
+import asyncio
+import difflib
+import importlib.util
 import io
 import os
 import platform
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
-from PIL import Image
+from sqlmodel import Session
+from app.db import engine
+from app.metrics import timed
+from app.ocr_cache import image_fingerprint, get_cached_ocr, store_ocr
 
-try:
-    import pytesseract
-    OCR_AVAILABLE = True
-except ImportError:
-    OCR_AVAILABLE = False
+if TYPE_CHECKING:
+    import numpy as np
+    from PIL import Image
+
+# Pillow, pytesseract and NumPy are imported on the first image, so text-only use never loads them
+OCR_AVAILABLE = importlib.util.find_spec("pytesseract") is not None
+
+# Number of OCR worker processes
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", str(os.cpu_count() or 2)))
+# Maximum number of images waiting for a free OCR worker before requests are rejected
+OCR_QUEUE_LIMIT = int(os.getenv("OCR_QUEUE_LIMIT", str(OCR_WORKERS * 4)))
+# Resolution Tesseract is tuned for; low-DPI images are upscaled towards it
+OCR_TARGET_DPI = 300
+# Widest image after preprocessing; wider screenshots are downscaled
+OCR_MAX_DIMENSION = int(os.getenv("OCR_MAX_DIMENSION", "4000"))
+# Tallest image after preprocessing; tall screenshots are tiled, so only extreme ones are downscaled
+OCR_MAX_HEIGHT = int(os.getenv("OCR_MAX_HEIGHT", "30000"))
+# Never upscale more than this, so tiny images do not become huge
+OCR_MAX_UPSCALE = 2.0
+# Taller images are cut into horizontal tiles of about this many rows, recognized in parallel
+OCR_TILE_HEIGHT = int(os.getenv("OCR_TILE_HEIGHT", "2000"))
+# Rows searched before each cut for the flattest one, so cuts fall between text lines
+OCR_TILE_SEARCH = OCR_TILE_HEIGHT // 8
+# Minimum rows shared by neighbouring tiles, so a line cut at a tile edge is whole in the other tile
+OCR_TILE_OVERLAP = min(int(os.getenv("OCR_TILE_OVERLAP", "150")), OCR_TILE_HEIGHT // 4)
+# Lines compared when dropping the text two tiles both recognized, and how alike two lines must be
+OCR_STITCH_MAX_LINES = 20
+OCR_STITCH_MIN_SIMILARITY = 0.8
+
+# Result of the one-time tesseract probe (None until probe_tesseract runs)
+_tesseract_available: bool | None = None
+_ocr_pool: ProcessPoolExecutor | None = None
+_ocr_pending = 0
+_ocr_lock = threading.Lock()
+
+
+class OCRBusyError(Exception):
+    """Raised when the OCR queue is full."""
 
 
 def _find_tesseract_windows() -> str | None:
@@ -34,6 +76,12 @@ def _configure_tesseract_path():
     """Configure pytesseract to use tesseract if not in PATH."""
     if not OCR_AVAILABLE:
         return
+    import pytesseract
+    
+    # An explicit path always wins
+    if os.getenv("TESSERACT_CMD"):
+        pytesseract.pytesseract.tesseract_cmd = os.getenv("TESSERACT_CMD")
+        return
     
     # Only configure if tesseract is not already found
     try:
@@ -56,6 +104,7 @@ def _check_tesseract_available() -> bool:
     
     # Try to configure path first
     _configure_tesseract_path()
+    import pytesseract
     
     try:
         pytesseract.get_tesseract_version()
@@ -64,58 +113,196 @@ def _check_tesseract_available() -> bool:
         return False
 
 
-def extract_text_from_image(image_bytes: bytes) -> str:
-    """Extract text from image using OCR (optional, minimal)."""
-    if not OCR_AVAILABLE:
-        raise ValueError("OCR not available. Please install pytesseract: pip install pytesseract")
+def probe_tesseract() -> bool:
+    """Locate and check the tesseract binary once; later calls reuse the result."""
+    global _tesseract_available
+    if _tesseract_available is None:
+        _tesseract_available = _check_tesseract_available()
+    return _tesseract_available
+
+
+def _init_ocr_worker(tesseract_cmd: str | None, available: bool):
+    """Hand the probe result to a worker process so it never probes again."""
+    global _tesseract_available
+    if tesseract_cmd:
+        import pytesseract
+        pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+    _tesseract_available = available
+
+
+def preprocess_image(image: "Image.Image") -> "Image.Image":
+    """Grayscale the image and rescale it to a resolution Tesseract reads well."""
+    from PIL import Image, ImageOps
     
-    # Configure tesseract path before checking
-    _configure_tesseract_path()
+    image = ImageOps.exif_transpose(image).convert("L")
+    
+    # Screenshots are typically 72-96 DPI; upscale small text towards OCR_TARGET_DPI
+    dpi = image.info.get("dpi", (0, 0))[0] or 0
+    scale = min(OCR_TARGET_DPI / dpi, OCR_MAX_UPSCALE) if 0 < dpi < OCR_TARGET_DPI else 1.0
+    # Downscale oversized screenshots (also caps any upscaling)
+    scale = min(scale, OCR_MAX_DIMENSION / image.width, OCR_MAX_HEIGHT / image.height)
     
-    if not _check_tesseract_available():
-        error_msg = (
+    if abs(scale - 1.0) > 0.05:
+        size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        image = image.resize(size, Image.Resampling.LANCZOS)
+    return image
+
+
+def tile_bounds(image: "Image.Image") -> list[tuple[int, int]]:
+    """
+    Split a preprocessed image into horizontal tiles of about OCR_TILE_HEIGHT rows
+    overlapping by at least OCR_TILE_OVERLAP, cut at the flattest rows nearby (the
+    gaps between text lines). Returns (top, bottom) row ranges; short images are one tile.
+    """
+    if image.height <= OCR_TILE_HEIGHT + OCR_TILE_SEARCH:
+        return [(0, image.height)]
+    
+    import numpy as np
+    
+    pixels = np.asarray(image)
+    # Brightness range of each row: 0 for background only, in light and dark themes alike
+    spread = pixels.max(axis=1).astype(np.int16) - pixels.min(axis=1)
+    
+    bounds = []
+    top = 0
+    while image.height - top > OCR_TILE_HEIGHT + OCR_TILE_SEARCH:
+        bottom = _flattest_row(spread, top + OCR_TILE_HEIGHT - OCR_TILE_SEARCH, top + OCR_TILE_HEIGHT)
+        bounds.append((top, bottom))
+        top = _flattest_row(spread, bottom - OCR_TILE_OVERLAP - OCR_TILE_SEARCH, bottom - OCR_TILE_OVERLAP)
+    bounds.append((top, image.height))
+    return bounds
+
+
+def _flattest_row(spread: "np.ndarray", start: int, stop: int) -> int:
+    import numpy as np
+    
+    # The middle of the last run of flattest rows in [start, stop), clear of the text on either side
+    window = spread[start:stop]
+    end = len(window) - 1 - int(np.argmin(window[::-1]))
+    begin = end
+    while begin > 0 and window[begin - 1] == window[end]:
+        begin -= 1
+    return start + (begin + end) // 2
+
+
+def prepare_image(image_bytes: bytes) -> dict:
+    """
+    Decode and preprocess an image, hash it for the OCR cache and cut it into tiles.
+    Returns {"fingerprint", "tiles": [(size, grayscale pixels), ...]}.
+    """
+    from PIL import Image
+    
+    try:
+        image = preprocess_image(Image.open(io.BytesIO(image_bytes)))
+    except Exception as e:
+        raise ValueError(f"Failed to extract text from image: {str(e)}")
+    
+    tiles = []
+    for top, bottom in tile_bounds(image):
+        tile = image.crop((0, top, image.width, bottom))
+        tiles.append((tile.size, tile.tobytes()))
+    return {"fingerprint": image_fingerprint(image), "tiles": tiles}
+
+
+def _tesseract_missing_error() -> ValueError:
+    error_msg = (
+        "Tesseract OCR is not installed or not found. "
+        "Please install tesseract-ocr:\n"
+        "- Windows: Download from https://github.com/UB-Mannheim/tesseract/wiki\n"
+        "- macOS: brew install tesseract\n"
+        "- Linux: sudo apt-get install tesseract-ocr\n\n"
+    )
+    
+    if platform.system() == 'Windows':
+        error_msg += (
+            "If you've already installed Tesseract on Windows:\n"
+            "1. Make sure it's installed to: C:\\Program Files\\Tesseract-OCR\\\n"
+            "2. OR add Tesseract installation folder to your system PATH\n"
+            "3. OR set TESSERACT_CMD environment variable to tesseract.exe path"
+        )
+    
+    return ValueError(error_msg)
+
+
+def _ocr_error(error: Exception) -> ValueError:
+    error_msg = str(error)
+    if "tesseract" in error_msg.lower() or "not found" in error_msg.lower() or "tesseract_cmd" in error_msg.lower():
+        msg = (
             "Tesseract OCR is not installed or not found. "
             "Please install tesseract-ocr:\n"
             "- Windows: Download from https://github.com/UB-Mannheim/tesseract/wiki\n"
             "- macOS: brew install tesseract\n"
-            "- Linux: sudo apt-get install tesseract-ocr\n\n"
+            "- Linux: sudo apt-get install tesseract-ocr"
         )
         
         if platform.system() == 'Windows':
-            error_msg += (
-                "If you've already installed Tesseract on Windows:\n"
-                "1. Make sure it's installed to: C:\\Program Files\\Tesseract-OCR\\\n"
-                "2. OR add Tesseract installation folder to your system PATH\n"
-                "3. OR set TESSERACT_CMD environment variable to tesseract.exe path"
+            msg += (
+                "\n\nIf already installed on Windows:\n"
+                "1. Check if installed at: C:\\Program Files\\Tesseract-OCR\\\n"
+                "2. Add Tesseract folder to system PATH\n"
+                "3. Restart the backend server after adding to PATH"
             )
         
-        raise ValueError(error_msg)
-    
+        return ValueError(msg)
+    return ValueError(f"Failed to extract text from image: {error_msg}")
+
+
+def recognize_tile(tile: tuple[tuple[int, int], bytes]) -> str:
+    """Run Tesseract on one (size, grayscale pixels) tile from prepare_image."""
     try:
-        image = Image.open(io.BytesIO(image_bytes))
-        text = pytesseract.image_to_string(image)
+        import pytesseract
+        from PIL import Image
+        
+        size, pixels = tile
+        text = pytesseract.image_to_string(Image.frombytes("L", size, pixels), config=f"--dpi {OCR_TARGET_DPI}")
         return text.strip()
     except Exception as e:
-        error_msg = str(e)
-        if "tesseract" in error_msg.lower() or "not found" in error_msg.lower() or "tesseract_cmd" in error_msg.lower():
-            msg = (
-                "Tesseract OCR is not installed or not found. "
-                "Please install tesseract-ocr:\n"
-                "- Windows: Download from https://github.com/UB-Mannheim/tesseract/wiki\n"
-                "- macOS: brew install tesseract\n"
-                "- Linux: sudo apt-get install tesseract-ocr"
-            )
-            
-            if platform.system() == 'Windows':
-                msg += (
-                    "\n\nIf already installed on Windows:\n"
-                    "1. Check if installed at: C:\\Program Files\\Tesseract-OCR\\\n"
-                    "2. Add Tesseract folder to system PATH\n"
-                    "3. Restart the backend server after adding to PATH"
-                )
-            
-            raise ValueError(msg)
-        raise ValueError(f"Failed to extract text from image: {error_msg}")
+        raise _ocr_error(e)
+
+
+def _line_key(line: str) -> str:
+    return " ".join(line.split()).lower()
+
+
+def _repeated_lines(previous: list[str], lines: list[str]) -> int:
+    """
+    Number of leading lines of a tile that repeat the end of the previous text:
+    the longest run of its first non-blank lines that (nearly) matches the last
+    non-blank lines before it, since both tiles recognized their overlap.
+    """
+    tail = [_line_key(line) for line in previous if line.strip()][-OCR_STITCH_MAX_LINES:]
+    head = [(index, _line_key(line)) for index, line in enumerate(lines) if line.strip()][:OCR_STITCH_MAX_LINES]
+    for count in range(min(len(tail), len(head)), 0, -1):
+        pairs = zip(tail[len(tail) - count:], (key for _, key in head[:count]))
+        if all(a == b or difflib.SequenceMatcher(None, a, b).ratio() >= OCR_STITCH_MIN_SIMILARITY for a, b in pairs):
+            return head[count - 1][0] + 1
+    return 0
+
+
+def stitch_tile_texts(texts: list[str]) -> str:
+    """Join the text of overlapping tiles top to bottom, dropping the lines recognized twice."""
+    lines = []
+    for text in texts:
+        tile_lines = text.splitlines()
+        tile_lines = tile_lines[_repeated_lines(lines, tile_lines):]
+        while tile_lines and not tile_lines[0].strip():
+            tile_lines.pop(0)
+        lines.extend(tile_lines)
+    return "\n".join(lines).strip()
+
+
+def _require_tesseract():
+    if not OCR_AVAILABLE:
+        raise ValueError("OCR not available. Please install pytesseract: pip install pytesseract")
+    if not probe_tesseract():
+        raise _tesseract_missing_error()
+
+
+def extract_text_from_image(image_bytes: bytes) -> str:
+    """Extract text from image using OCR, one tile at a time (see process_jd_image_async for the parallel path)."""
+    _require_tesseract()
+    prepared = prepare_image(image_bytes)
+    return stitch_tile_texts([recognize_tile(tile) for tile in prepared["tiles"]])
 
 
 def process_jd_text(jd_text: str) -> str:
@@ -123,6 +310,115 @@ def process_jd_text(jd_text: str) -> str:
     return jd_text.strip()
 
 
+def normalize_jd_text(jd_text: str) -> str:
+    """Normalize JD text for hashing (case and whitespace insensitive)."""
+    return " ".join(jd_text.split()).lower()
+
+
 def process_jd_image(image_bytes: bytes) -> str:
     """Process JD image and extract text."""
     return extract_text_from_image(image_bytes)
+
+
+def _get_ocr_pool() -> ProcessPoolExecutor:
+    global _ocr_pool
+    if _ocr_pool is None:
+        tesseract_cmd = None
+        if OCR_AVAILABLE:
+            import pytesseract
+            tesseract_cmd = pytesseract.pytesseract.tesseract_cmd
+        _ocr_pool = ProcessPoolExecutor(
+            max_workers=OCR_WORKERS,
+            initializer=_init_ocr_worker,
+            initargs=(tesseract_cmd, probe_tesseract())
+        )
+    return _ocr_pool
+
+
+def _release_ocr_slot(_future=None):
+    global _ocr_pending
+    with _ocr_lock:
+        _ocr_pending -= 1
+
+
+def _release_ocr_slot_when_done(futures: list[Future]):
+    """Free the image's OCR slot once its last tile is done, even if the request is cancelled meanwhile."""
+    remaining = len(futures)
+    lock = threading.Lock()
+    
+    def tile_done(_future):
+        nonlocal remaining
+        with lock:
+            remaining -= 1
+            if remaining:
+                return
+        _release_ocr_slot()
+    
+    for future in futures:
+        future.add_done_callback(tile_done)
+
+
+def _submit_tiles(tiles: list) -> list[Future]:
+    global _ocr_pool
+    try:
+        pool = _get_ocr_pool()
+        return [pool.submit(recognize_tile, tile) for tile in tiles]
+    except BrokenProcessPool:
+        # A worker died; start a fresh pool on the next request
+        _ocr_pool = None
+        raise ValueError("OCR worker crashed. Please try again.")
+
+
+async def process_jd_image_async(image_bytes: bytes) -> str:
+    """
+    Extract JD text from an image without blocking the event loop: preprocess it in
+    a thread, answer from the OCR cache when a similar image was read before, else
+    recognize its tiles in parallel in the OCR worker pool and stitch them together.
+    Raises OCRBusyError when OCR_QUEUE_LIMIT images are already waiting.
+    """
+    global _ocr_pending
+    if OCR_AVAILABLE and _tesseract_available is None:
+        # The first image locates tesseract (a subprocess call) off the event loop
+        await asyncio.to_thread(probe_tesseract)
+    if not OCR_AVAILABLE or not probe_tesseract():
+        # Fails fast with the install instructions, no worker needed
+        return extract_text_from_image(image_bytes)
+    
+    # One slot per image, whatever its number of tiles
+    with _ocr_lock:
+        if _ocr_pending >= OCR_WORKERS + OCR_QUEUE_LIMIT:
+            raise OCRBusyError("Too many images are being processed. Please try again shortly.")
+        _ocr_pending += 1
+    
+    futures = []
+    try:
+        with timed("ocr_preprocess"):
+            prepared = await asyncio.to_thread(prepare_image, image_bytes)
+        with timed("ocr_cache_lookup"), Session(engine) as session:
+            cached_text = get_cached_ocr(session, prepared["fingerprint"])
+        if cached_text is not None:
+            return cached_text
+        futures = _submit_tiles(prepared["tiles"])
+    finally:
+        if not futures:
+            _release_ocr_slot()
+    
+    _release_ocr_slot_when_done(futures)
+    with timed("ocr"):
+        texts = await asyncio.gather(*(asyncio.wrap_future(future) for future in futures), return_exceptions=True)
+    for text in texts:
+        if isinstance(text, BaseException):
+            raise text
+    
+    text = stitch_tile_texts(texts)
+    with timed("db_write"), Session(engine) as session:
+        store_ocr(session, prepared["fingerprint"], text)
+    return text
+
+
+def shutdown_ocr_pool():
+    """Stop the OCR worker processes."""
+    global _ocr_pool
+    if _ocr_pool is not None:
+        _ocr_pool.shutdown(wait=False, cancel_futures=True)
+        _ocr_pool = None
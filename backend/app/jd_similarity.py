@@ -0,0 +1,209 @@
+import hashlib
+import os
+import re
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from sqlmodel import Session, select, update
+from app.models import Analysis
+from app.metrics import CACHE_EVENTS
+
+# Estimated Jaccard similarity (of word shingles) above which a JD reuses an earlier analysis; 0 disables
+JD_NEAR_DUPLICATE_THRESHOLD = float(os.getenv("JD_NEAR_DUPLICATE_THRESHOLD", "0.8"))
+# Words per shingle; shingles never cross line breaks, so reordered lines keep their shingles
+SHINGLE_WORDS = 3
+# MinHash values per signature, split into LSH bands of SIGNATURE_SIZE // LSH_BANDS values
+SIGNATURE_SIZE = 64
+LSH_BANDS = 16
+
+_ROWS = SIGNATURE_SIZE // LSH_BANDS
+_EMPTY = 0xFFFFFFFF
+_WORD_RE = re.compile(r"\w+")
+
+
+def _shingles(text: str) -> set[str]:
+    shingles = set()
+    for line in text.lower().splitlines():
+        words = _WORD_RE.findall(line)
+        if 0 < len(words) < SHINGLE_WORDS:
+            shingles.add(" ".join(words))
+        for index in range(len(words) - SHINGLE_WORDS + 1):
+            shingles.add(" ".join(words[index:index + SHINGLE_WORDS]))
+    return shingles
+
+
+def minhash_signature(text: str) -> array | None:
+    """
+    Compute a one-permutation MinHash signature: each shingle is hashed once
+    into one of SIGNATURE_SIZE bins, keeping the minimum per bin. Returns None
+    for text without words.
+    """
+    signature = array("I", [_EMPTY]) * SIGNATURE_SIZE
+    for shingle in _shingles(text):
+        value = int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "little")
+        slot = value % SIGNATURE_SIZE
+        value >>= 32
+        if value < signature[slot]:
+            signature[slot] = value
+    if all(value == _EMPTY for value in signature):
+        return None
+
+    # Fill empty bins from the next non-empty bin, mixed with the distance so filled bins stay distinct
+    filled = array("I", signature)
+    for slot in range(SIGNATURE_SIZE):
+        if signature[slot] != _EMPTY:
+            continue
+        offset = 1
+        while signature[(slot + offset) % SIGNATURE_SIZE] == _EMPTY:
+            offset += 1
+        filled[slot] = (signature[(slot + offset) % SIGNATURE_SIZE] ^ (offset * 0x9E3779B1)) & 0xFFFFFFFF
+    return filled
+
+
+def signature_similarity(first: array, second: array) -> float:
+    """Estimate the Jaccard similarity of two texts from their signatures."""
+    return sum(1 for a, b in zip(first, second) if a == b) / SIGNATURE_SIZE
+
+
+def _band_keys(signature: array) -> list[int]:
+    """32-bit hash of each band of _ROWS consecutive signature values."""
+    words = memoryview(signature.tobytes()).cast("Q").tolist()
+    width = len(words) // LSH_BANDS
+    return [hash(tuple(words[start:start + width])) & 0xFFFFFFFF for start in range(0, len(words), width)]
+
+
+class MinHashIndex:
+    """
+    Locality-sensitive hashing index over MinHash signatures. Each band is a
+    sorted array of (band hash << 32 | slot) values, so lookups are a few
+    binary searches and inserts update the index in place.
+    """
+
+    def __init__(self):
+        self._analysis_ids = array("q")
+        self._groups = array("I")
+        self._signatures = array("I")
+        self._group_slots: dict[str, int] = {}
+        self._bands = [array("Q") for _ in range(LSH_BANDS)]
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._analysis_ids)
+
+    def _append(self, analysis_id: int, group: str, signature: array) -> int:
+        slot = len(self._analysis_ids)
+        self._analysis_ids.append(analysis_id)
+        self._groups.append(self._group_slots.setdefault(group, len(self._group_slots)))
+        self._signatures.extend(signature)
+        return slot
+
+    def add(self, analysis_id: int, group: str, signature: array):
+        """Index one signature; group (the resume hash) limits which entries can match."""
+        with self._lock:
+            slot = self._append(analysis_id, group, signature)
+            for band, key in enumerate(_band_keys(signature)):
+                entry = key << 32 | slot
+                self._bands[band].insert(bisect_right(self._bands[band], entry), entry)
+
+    def add_many(self, entries: list[tuple[int, str, array]]):
+        """Index many signatures at once, sorting each band once."""
+        with self._lock:
+            new_entries = [[] for _ in range(LSH_BANDS)]
+            for analysis_id, group, signature in entries:
+                slot = self._append(analysis_id, group, signature)
+                for band, key in enumerate(_band_keys(signature)):
+                    new_entries[band].append(key << 32 | slot)
+            for band in range(LSH_BANDS):
+                self._bands[band] = array("Q", sorted(self._bands[band].tolist() + new_entries[band]))
+
+    def query(self, group: str, signature: array, threshold: float) -> tuple[int, float] | None:
+        """Return (analysis_id, similarity) of the most similar entry in group at or above threshold."""
+        with self._lock:
+            group_slot = self._group_slots.get(group)
+            if group_slot is None:
+                return None
+            candidates = set()
+            for band, key in enumerate(_band_keys(signature)):
+                entries = self._bands[band]
+                start = bisect_left(entries, key << 32)
+                end = bisect_left(entries, (key + 1) << 32, start)
+                candidates.update(entry & 0xFFFFFFFF for entry in entries[start:end])
+
+            best = None
+            for slot in candidates:
+                if self._groups[slot] != group_slot:
+                    continue
+                stored = self._signatures[slot * SIGNATURE_SIZE:(slot + 1) * SIGNATURE_SIZE]
+                similarity = signature_similarity(signature, stored)
+                # Prefer the most similar, then the most recent analysis
+                if similarity >= threshold and (best is None or (similarity, slot) > best):
+                    best = (similarity, slot)
+            if best is None:
+                return None
+            return self._analysis_ids[best[1]], best[0]
+
+
+_index = MinHashIndex()
+_stats = {"lookups": 0, "near_duplicates": 0, "lookup_seconds": 0.0}
+_stats_lock = threading.Lock()
+
+
+def load_similarity_index(session: Session):
+    """Index stored analyses at startup, computing signatures for rows stored before they existed."""
+    entries = []
+    rows = session.execute(
+        select(Analysis.id, Analysis.resume_hash, Analysis.jd_signature).where(Analysis.jd_signature.is_not(None))
+    ).all()
+    for analysis_id, resume_hash, stored in rows:
+        signature = array("I")
+        signature.frombytes(stored)
+        entries.append((analysis_id, resume_hash, signature))
+
+    missing = session.execute(
+        select(Analysis.id, Analysis.resume_hash, Analysis.jd_text).where(Analysis.jd_signature.is_(None))
+    ).all()
+    for analysis_id, resume_hash, jd_text in missing:
+        signature = minhash_signature(jd_text)
+        if signature is None:
+            continue
+        session.execute(update(Analysis).where(Analysis.id == analysis_id).values(jd_signature=signature.tobytes()))
+        entries.append((analysis_id, resume_hash, signature))
+    session.commit()
+
+    global _index
+    index = MinHashIndex()
+    index.add_many(entries)
+    _index = index
+
+
+def index_analysis(analysis_id: int, resume_hash: str, signature: array | None):
+    """Add a newly stored analysis to the index."""
+    if signature is not None:
+        _index.add(analysis_id, resume_hash, signature)
+
+
+def find_near_duplicate(resume_hash: str, jd_text: str) -> tuple[int, float] | None:
+    """Return (analysis_id, similarity) of an earlier analysis of a near-identical JD, if any."""
+    if JD_NEAR_DUPLICATE_THRESHOLD <= 0:
+        return None
+    started = time.perf_counter()
+    signature = minhash_signature(jd_text)
+    match = _index.query(resume_hash, signature, JD_NEAR_DUPLICATE_THRESHOLD) if signature is not None else None
+    with _stats_lock:
+        _stats["lookups"] += 1
+        _stats["near_duplicates"] += match is not None
+        _stats["lookup_seconds"] += time.perf_counter() - started
+    CACHE_EVENTS.inc(cache="near_duplicate", event="hits" if match is not None else "misses")
+    return match
+
+
+def get_similarity_stats() -> dict:
+    """Return near-duplicate lookup counters and index size."""
+    with _stats_lock:
+        stats = dict(_stats)
+    lookup_seconds = stats.pop("lookup_seconds")
+    stats["avg_lookup_ms"] = round(1000 * lookup_seconds / stats["lookups"], 3) if stats["lookups"] else 0.0
+    stats["indexed"] = len(_index)
+    stats["threshold"] = JD_NEAR_DUPLICATE_THRESHOLD
+    return stats
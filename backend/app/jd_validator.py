@@ -1,69 +1,90 @@
+import hashlib
+import logging
 import os
 import re
-from openai import OpenAI
-from dotenv import load_dotenv
+import threading
+from collections import OrderedDict
+from app.settings import get_settings
+from app.llm_client import create_chat_completion
+from app.aho_corasick import AhoCorasick
+from app.jd_keywords import JOB_KEYWORDS, UI_INDICATORS
+from app.prompt_builder import build_jd_prompt_text, JD_CLASSIFIER_TOKEN_BUDGET
+from app.metrics import timed, CACHE_EVENTS
 
-load_dotenv()
+INVALID_JD_MESSAGE = "This does not appear to be a valid job description. Please paste or upload a proper JD."
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# Maximum number of LLM classifier verdicts kept in memory
+JD_VERDICT_CACHE_SIZE = int(os.getenv("JD_VERDICT_CACHE_SIZE", "2048"))
+# Heuristic scores at or above these skip the LLM classifier entirely
+JD_CONFIDENT_KEYWORDS = int(os.getenv("JD_CONFIDENT_KEYWORDS", "8"))
+JD_CONFIDENT_WORDS = 80
 
+# Keyword -> category; matched as substrings, like the original per-keyword scans
+_scanner = AhoCorasick({
+    **{keyword: "job" for keyword in JOB_KEYWORDS},
+    **{indicator: "ui" for indicator in UI_INDICATORS},
+})
 
-def validate_jd_text(jd_text: str) -> tuple[bool, str]:
+_verdicts: OrderedDict[str, tuple[bool, str]] = OrderedDict()
+_verdicts_lock = threading.Lock()
+_stats = {"llm_calls": 0, "cache_hits": 0, "confident_skips": 0, "failed_open": 0}
+
+logger = logging.getLogger(__name__)
+
+
+def _count(name: str):
+    with _verdicts_lock:
+        _stats[name] += 1
+    CACHE_EVENTS.inc(cache="jd_verdict", event=name)
+
+
+def scan_jd_text(text_lower: str) -> dict[str, int]:
+    """Count the distinct job keywords and UI indicators in lowercased text in one pass."""
+    found = {"job": set(), "ui": set()}
+    for start, end, category in _scanner.find_all(text_lower):
+        found[category].add(text_lower[start:end])
+    return {category: len(keywords) for category, keywords in found.items()}
+
+
+def _heuristic_counts(text: str) -> tuple[int, int, int]:
+    counts = scan_jd_text(text.lower())
+    return counts["job"], counts["ui"], len(text.split())
+
+
+def check_jd_heuristics(jd_text: str) -> tuple[bool, str]:
     """
-    Validate if text appears to be a valid job description.
+    Run the cheap keyword/length heuristics.
     Returns (is_valid, error_message)
     """
     if not jd_text or not jd_text.strip():
         return False, "Job description text is empty"
     
-    text = jd_text.strip()
-    
-    # Basic heuristics first (fast, cheap)
-    text_lower = text.lower()
-    
-    # Check for job-related keywords
-    job_keywords = [
-        'responsibilities', 'requirements', 'qualifications', 'experience',
-        'skills', 'role', 'position', 'candidate', 'applicant', 'job',
-        'work', 'team', 'company', 'years', 'degree', 'bachelor', 'master',
-        'develop', 'design', 'manage', 'lead', 'create', 'implement'
-    ]
-    
-    keyword_count = sum(1 for keyword in job_keywords if keyword in text_lower)
-    
-    # Check for UI/navigation text (invalid indicators)
-    ui_indicators = [
-        'menu', 'navigation', 'sidebar', 'click here', 'sign in', 'sign up',
-        'cookie', 'privacy policy', 'terms of service', 'chat', 'new chat',
-        'settings', 'profile', 'logout', 'home', 'back', 'next', 'previous'
-    ]
-    
-    ui_count = sum(1 for indicator in ui_indicators if indicator in text_lower)
-    
-    # Check length (too short is suspicious)
-    word_count = len(text.split())
+    # Job keywords, UI/navigation indicators (invalid) and length (too short is suspicious)
+    with timed("jd_heuristics"):
+        keyword_count, ui_count, word_count = _heuristic_counts(jd_text.strip())
     
     # Heuristic: if has job keywords and reasonable length, likely valid
     # If has many UI indicators, likely invalid
     if ui_count >= 3 and keyword_count < 2:
-        return False, "This does not appear to be a valid job description. Please paste or upload a proper JD."
+        return False, INVALID_JD_MESSAGE
     
     if word_count < 20:
-        return False, "This does not appear to be a valid job description. Please paste or upload a proper JD."
+        return False, INVALID_JD_MESSAGE
     
     if keyword_count < 2 and word_count < 50:
-        return False, "This does not appear to be a valid job description. Please paste or upload a proper JD."
+        return False, INVALID_JD_MESSAGE
     
-    # If heuristics pass, do a lightweight LLM check
-    try:
-        if not os.getenv("OPENAI_API_KEY"):
-            # If no API key, trust heuristics
-            return True, ""
-        
-        prompt = f"""Is the following text a valid job description? Answer only "yes" or "no".
+    return True, ""
+
+
+def _build_classifier_messages(jd_text: str) -> list[dict]:
+    """Build the chat messages for the yes/no classifier."""
+    # Boilerplate-free, requirements-first excerpt instead of the first characters
+    text, _ = build_jd_prompt_text(jd_text.strip(), JD_CLASSIFIER_TOKEN_BUDGET)
+    prompt = f"""Is the following text a valid job description? Answer only "yes" or "no".
 
 Text:
-{text[:1000]}
+{text}
 
 A valid job description should:
 - Describe a job role or position
@@ -78,24 +99,96 @@ Invalid examples:
 
 Answer:"""
 
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "You are a classifier. Answer only 'yes' or 'no'."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0,
-            max_tokens=5
-        )
+    return [
+        {"role": "system", "content": "You are a classifier. Answer only 'yes' or 'no'."},
+        {"role": "user", "content": prompt}
+    ]
+
+
+def _parse_classifier_answer(answer: str) -> tuple[bool, str]:
+    if answer.strip().lower().startswith('yes'):
+        return True, ""
+    return False, INVALID_JD_MESSAGE
+
+
+def _verdict_key(jd_text: str) -> str:
+    # Case, punctuation and whitespace differences do not change the verdict
+    normalized = " ".join(re.sub(r"[^a-z0-9]+", " ", jd_text.lower()).split())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def _known_verdict(jd_text: str, key: str) -> tuple[bool, str] | None:
+    """Return the verdict without the LLM when heuristics are confident or it is cached."""
+    keyword_count, ui_count, word_count = _heuristic_counts(jd_text.strip())
+    if keyword_count >= JD_CONFIDENT_KEYWORDS and word_count >= JD_CONFIDENT_WORDS and ui_count < 3:
+        _count("confident_skips")
+        return True, ""
+    
+    with _verdicts_lock:
+        verdict = _verdicts.get(key)
+        if verdict is not None:
+            _verdicts.move_to_end(key)
+            _stats["cache_hits"] += 1
+    if verdict is not None:
+        CACHE_EVENTS.inc(cache="jd_verdict", event="cache_hits")
+    return verdict
+
+
+def _store_verdict(key: str, verdict: tuple[bool, str]):
+    with _verdicts_lock:
+        _verdicts[key] = verdict
+        _verdicts.move_to_end(key)
+        while len(_verdicts) > JD_VERDICT_CACHE_SIZE:
+            _verdicts.popitem(last=False)
+
+
+def get_validator_stats() -> dict:
+    """Return LLM classifier usage and verdict cache statistics."""
+    with _verdicts_lock:
+        return {**_stats, "cached_verdicts": len(_verdicts), "max_cached_verdicts": JD_VERDICT_CACHE_SIZE}
+
+
+async def classify_jd_text_async(jd_text: str) -> tuple[bool, str]:
+    """
+    Run only the LLM yes/no check (heuristics must already have passed).
+    Returns (is_valid, error_message)
+    """
+    try:
+        if not get_settings().openai_api_key:
+            return True, ""
         
-        answer = response.choices[0].message.content.strip().lower()
+        key = _verdict_key(jd_text)
+        verdict = _known_verdict(jd_text, key)
+        if verdict is not None:
+            return verdict
         
-        if answer.startswith('yes'):
-            return True, ""
-        else:
-            return False, "This does not appear to be a valid job description. Please paste or upload a proper JD."
+        _count("llm_calls")
+        with timed("jd_classifier"):
+            response = await create_chat_completion(
+                model="gpt-4o-mini",
+                messages=_build_classifier_messages(jd_text),
+                temperature=0,
+                max_tokens=5
+            )
+        
+        verdict = _parse_classifier_answer(response.choices[0].message.content)
+        _store_verdict(key, verdict)
+        return verdict
             
-    except Exception as e:
-        # If LLM check fails, trust heuristics
-        # Log error but don't block (heuristics already passed)
+    except Exception:
+        # If LLM check fails, trust heuristics; failed calls also count in stage_errors_total (jd_classifier)
+        logger.warning("JD classifier failed, trusting the heuristics", exc_info=True)
+        _count("failed_open")
         return True, ""
+
+
+async def validate_jd_text_async(jd_text: str) -> tuple[bool, str]:
+    """
+    Validate a job description without blocking the event loop.
+    Returns (is_valid, error_message)
+    """
+    is_valid, error_message = check_jd_heuristics(jd_text)
+    if not is_valid:
+        return False, error_message
+    
+    return await classify_jd_text_async(jd_text)
@@ -0,0 +1,268 @@
+"""
+Durable background analyses: POST /jobs stores the JD in the `job` table and
+returns at once, and a pool of workers runs OCR, validation and the analysis,
+interactive lane first. Jobs that were queued or running when the server
+stopped are picked up again at the next startup (assumes a single server process).
+"""
+import asyncio
+import json
+import os
+from datetime import datetime, timedelta
+from sqlmodel import Session, select, delete, func, or_
+from app.db import engine
+from app.models import Job
+from app.metrics import timed, JOBS, JOB_QUEUE_SECONDS
+from app.resume_service import get_resumes
+from app.analysis_service import analyze_item
+
+# Lanes and their rank; workers always take the lowest rank first
+JOB_LANES = {"interactive": 0, "bulk": 1}
+# Number of workers, and how many of them only take interactive jobs so a bulk backlog never delays a user
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_INTERACTIVE_WORKERS = int(os.getenv("JOB_INTERACTIVE_WORKERS", "1"))
+# Maximum number of queued jobs; further submissions are refused until workers catch up
+JOB_MAX_QUEUED = int(os.getenv("JOB_MAX_QUEUED", "1000"))
+# Tries per job: a 503 (OpenAI unavailable, OCR busy) or a restart mid-run uses one up
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+# Delay before a job is retried after a 503, multiplied by the number of tries so far
+JOB_RETRY_DELAY_SECONDS = float(os.getenv("JOB_RETRY_DELAY_SECONDS", "10"))
+# Finished jobs are deleted at startup once older than this
+JOB_RETENTION_SECONDS = int(os.getenv("JOB_RETENTION_SECONDS", str(7 * 24 * 3600)))
+# Longest a long-poll (GET /jobs/{id}?wait=) is held open
+JOB_MAX_WAIT_SECONDS = 30
+# Pause after a worker fails to read the queue (e.g. the database is locked)
+JOB_ERROR_PAUSE_SECONDS = 1
+
+FINISHED_STATUSES = ("done", "failed")
+
+_workers: list[asyncio.Task] = []
+# One event per worker, set when a job is queued so idle workers look again
+_wakeups: list[asyncio.Event] = []
+# Job id -> one event per long-poll waiting on it, set when the job finishes
+_finished: dict[int, set[asyncio.Event]] = {}
+
+
+class JobQueueFullError(ValueError):
+    """Raised when JOB_MAX_QUEUED jobs are already waiting."""
+
+
+def _lane_name(priority: int) -> str:
+    return next((lane for lane, rank in JOB_LANES.items() if rank == priority), str(priority))
+
+
+def enqueue_job(session: Session, source: str, content: str | bytes, lane: str = "interactive",
+                resume_id: int | None = None, filename: str | None = None) -> Job:
+    """
+    Store a JD ("text" or "image" source) as a queued job and wake the workers.
+    Raises JobQueueFullError when the queue is full.
+    """
+    queued = session.exec(select(func.count()).select_from(Job).where(Job.status == "queued")).one()
+    if queued >= JOB_MAX_QUEUED:
+        raise JobQueueFullError(f"The job queue is full ({JOB_MAX_QUEUED} jobs waiting). Please try again later.")
+
+    job = Job(
+        priority=JOB_LANES[lane],
+        source=source,
+        jd_text=content if source == "text" else None,
+        jd_image=content if source == "image" else None,
+        filename=filename,
+        resume_id=resume_id
+    )
+    with timed("db_write"):
+        session.add(job)
+        session.commit()
+        session.refresh(job)
+    for wakeup in _wakeups:
+        wakeup.set()
+    return job
+
+
+def job_view(job: Job) -> dict:
+    """The API representation of a job; finished jobs carry their "result" or "error"."""
+    view = {
+        "job_id": job.id,
+        "status": job.status,
+        "lane": _lane_name(job.priority),
+        "attempts": job.attempts,
+        "created_at": job.created_at.isoformat(),
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None
+    }
+    if job.outcome_json is not None:
+        outcome = json.loads(job.outcome_json)
+        if outcome["status"] == 200:
+            view["result"] = {**outcome["result"], "resume": outcome["resume"]}
+        else:
+            view["error"] = {"status": outcome["status"], "detail": outcome["detail"]}
+    return view
+
+
+def get_job(session: Session, job_id: int) -> dict | None:
+    """Get a job by id, or None if it does not exist."""
+    job = session.get(Job, job_id)
+    return job_view(job) if job is not None else None
+
+
+async def wait_for_job(job_id: int, timeout: float) -> dict | None:
+    """Get a job, waiting up to timeout seconds for it to finish first."""
+    # Registered before the status is read, so a job finishing in between still wakes this waiter
+    event = asyncio.Event()
+    waiters = _finished.setdefault(job_id, set())
+    waiters.add(event)
+    try:
+        with Session(engine) as session:
+            job = get_job(session, job_id)
+        if job is None or job["status"] in FINISHED_STATUSES or timeout <= 0:
+            return job
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        with Session(engine) as session:
+            return get_job(session, job_id)
+    finally:
+        waiters.discard(event)
+        if not waiters and _finished.get(job_id) is waiters:
+            del _finished[job_id]
+
+
+def get_job_stats(session: Session) -> dict:
+    """Return the number of jobs per lane and status, and the workers."""
+    counts = session.exec(select(Job.priority, Job.status, func.count()).group_by(Job.priority, Job.status)).all()
+    lanes = {lane: {"queued": 0, "running": 0, "done": 0, "failed": 0} for lane in JOB_LANES}
+    for priority, status, count in counts:
+        lanes.setdefault(_lane_name(priority), {})[status] = count
+    return {"workers": len(_workers), "lanes": lanes}
+
+
+def _claim(priorities: tuple[int, ...]) -> dict | None:
+    """Mark the first due queued job in these lanes as running and return it."""
+    now = datetime.utcnow()
+    with Session(engine) as session:
+        job = session.exec(
+            select(Job)
+            .where(Job.status == "queued", Job.priority.in_(priorities), or_(Job.not_before.is_(None), Job.not_before <= now))
+            .order_by(Job.priority, Job.id)
+            .limit(1)
+        ).first()
+        if job is None:
+            return None
+        job.status = "running"
+        job.attempts += 1
+        job.started_at = now
+        session.add(job)
+        session.commit()
+        session.refresh(job)
+        return {
+            "id": job.id,
+            "lane": _lane_name(job.priority),
+            "attempts": job.attempts,
+            "item": {"source": job.source, "content": job.jd_image if job.source == "image" else job.jd_text},
+            "resume_id": job.resume_id,
+            "waited": (now - (job.not_before or job.created_at)).total_seconds()
+        }
+
+
+def _next_due_in(priorities: tuple[int, ...]) -> float | None:
+    """Seconds until the next job held back for a retry becomes due, if any."""
+    with Session(engine) as session:
+        not_before = session.exec(
+            select(func.min(Job.not_before)).where(Job.status == "queued", Job.priority.in_(priorities))
+        ).one()
+    if not_before is None:
+        return None
+    return max(0.0, (not_before - datetime.utcnow()).total_seconds())
+
+
+def _finish(job_id: int, status: str, outcome: dict | None = None, retry_in: float | None = None):
+    with timed("db_write"), Session(engine) as session:
+        job = session.get(Job, job_id)
+        job.status = status
+        if retry_in is not None:
+            job.not_before = datetime.utcnow() + timedelta(seconds=retry_in)
+        else:
+            job.outcome_json = json.dumps(outcome)
+            job.finished_at = datetime.utcnow()
+            # The analysis history keeps the JD text; the image is not needed any more
+            job.jd_image = None
+        session.add(job)
+        session.commit()
+
+
+async def _run_job(job: dict):
+    JOB_QUEUE_SECONDS.observe(job["waited"], lane=job["lane"])
+    try:
+        with Session(engine) as session:
+            resumes = get_resumes(session)
+        outcome = await analyze_item(resumes, job["item"], job["resume_id"])
+    except Exception as e:
+        outcome = {"status": 500, "detail": f"Job error: {str(e)}"}
+
+    if outcome["status"] == 503 and job["attempts"] < JOB_MAX_ATTEMPTS:
+        _finish(job["id"], "queued", retry_in=JOB_RETRY_DELAY_SECONDS * job["attempts"])
+        JOBS.inc(lane=job["lane"], outcome="retried")
+        return
+
+    status = "done" if outcome["status"] == 200 else "failed"
+    _finish(job["id"], status, outcome)
+    JOBS.inc(lane=job["lane"], outcome=status)
+    for event in _finished.get(job["id"], ()):
+        event.set()
+
+
+async def _worker(priorities: tuple[int, ...], wakeup: asyncio.Event):
+    while True:
+        # Cleared before looking, so a job queued after the lookup still wakes this worker
+        wakeup.clear()
+        try:
+            job = _claim(priorities)
+            if job is None:
+                await asyncio.wait_for(wakeup.wait(), _next_due_in(priorities))
+                continue
+            await _run_job(job)
+        except asyncio.TimeoutError:
+            pass
+        except Exception:
+            # Counted in stage_errors_total (db_write) when it came from storing a job
+            await asyncio.sleep(JOB_ERROR_PAUSE_SECONDS)
+
+
+def recover_jobs():
+    """
+    Requeue the jobs a previous process was running when it stopped (failing those
+    out of tries) and delete finished jobs older than JOB_RETENTION_SECONDS.
+    """
+    now = datetime.utcnow()
+    with Session(engine) as session:
+        for job in session.exec(select(Job).where(Job.status == "running")).all():
+            if job.attempts >= JOB_MAX_ATTEMPTS:
+                job.status = "failed"
+                job.outcome_json = json.dumps({"status": 500, "detail": "The job was interrupted too many times"})
+                job.finished_at = now
+                job.jd_image = None
+            else:
+                job.status = "queued"
+            session.add(job)
+        session.execute(delete(Job).where(Job.finished_at < now - timedelta(seconds=JOB_RETENTION_SECONDS)))
+        session.commit()
+
+
+def start_job_workers():
+    """Recover unfinished jobs and start the workers; called from the startup handler."""
+    recover_jobs()
+    # At least one worker takes every lane
+    interactive = min(JOB_INTERACTIVE_WORKERS, JOB_WORKERS - 1)
+    for position in range(JOB_WORKERS):
+        priorities = (JOB_LANES["interactive"],) if position < interactive else tuple(sorted(JOB_LANES.values()))
+        wakeup = asyncio.Event()
+        _wakeups.append(wakeup)
+        _workers.append(asyncio.create_task(_worker(priorities, wakeup)))
+
+
+async def stop_job_workers():
+    """Cancel the workers; jobs they were running stay "running" and are requeued at the next startup."""
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+    _wakeups.clear()
@@ -0,0 +1,281 @@
+import asyncio
+import os
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import TYPE_CHECKING
+from app.settings import get_settings
+from app.metrics import LLM_REQUESTS, LLM_TOKENS, LLM_RETRIES
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+# Maximum number of LLM calls in flight at once across all requests
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+# Per-call timeout in seconds
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+# Size of the shared HTTP connection pool
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+# Retries of a call that failed with 429, 5xx or a connection error, with jittered exponential backoff
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_BACKOFF_BASE_SECONDS = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", "0.5"))
+LLM_BACKOFF_MAX_SECONDS = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", "8"))
+# Consecutive upstream failures that open the circuit, and how long it stays open before a probe call
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_RESET_SECONDS = float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+
+# The openai SDK (about half a second to import) is loaded when the first client is created
+_async_client: "AsyncOpenAI | None" = None
+_semaphore: asyncio.Semaphore | None = None
+# Token totals of the enclosing track_usage() block; tasks started inside it share the same dict
+_usage: ContextVar[dict | None] = ContextVar("llm_usage", default=None)
+
+
+class LLMUnavailableError(Exception):
+    """Raised when OpenAI is rate limiting, failing or unreachable, after retries."""
+
+    def __init__(self, message: str, retry_after: float | None = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Stops calling OpenAI after LLM_BREAKER_FAILURES consecutive upstream failures.
+    While open, calls fail immediately; after LLM_BREAKER_RESET_SECONDS a single
+    probe call is let through (half-open), and its outcome closes or reopens it.
+    """
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_seconds:
+            return "half_open"
+        return "open"
+
+    def before_call(self) -> bool:
+        """Raise LLMUnavailableError unless a call may go ahead now; returns True for the probe call."""
+        state = self.state
+        if state == "closed":
+            return False
+        if state == "half_open" and not self._probing:
+            self._probing = True
+            return True
+        retry_after = max(0.0, self.reset_seconds - (time.monotonic() - self._opened_at))
+        raise LLMUnavailableError("OpenAI is unavailable (circuit open). Please try again shortly.", retry_after or 1.0)
+
+    def record_success(self):
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    def record_failure(self):
+        self._failures += 1
+        if self._probing or self._failures >= self.failure_threshold:
+            self._opened_at = time.monotonic()
+        self._probing = False
+
+    def release_probe(self):
+        """Let another probe through if this one ended without an upstream verdict."""
+        self._probing = False
+
+    def snapshot(self) -> dict:
+        state = self.state
+        snapshot = {"state": state, "consecutive_failures": self._failures}
+        if state == "open":
+            snapshot["retry_in_seconds"] = round(self.reset_seconds - (time.monotonic() - self._opened_at), 1)
+        return snapshot
+
+
+_breaker = CircuitBreaker(LLM_BREAKER_FAILURES, LLM_BREAKER_RESET_SECONDS)
+
+
+def get_async_client() -> "AsyncOpenAI":
+    """Get the shared AsyncOpenAI client, creating it on first use."""
+    global _async_client
+    if _async_client is None:
+        import httpx
+        from openai import AsyncOpenAI
+
+        settings = get_settings()
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=LLM_MAX_CONNECTIONS
+            ),
+            timeout=LLM_TIMEOUT_SECONDS
+        )
+        _async_client = AsyncOpenAI(
+            api_key=settings.openai_api_key,
+            base_url=settings.openai_base_url,
+            http_client=http_client,
+            timeout=LLM_TIMEOUT_SECONDS,
+            # Retries are handled here, so they back off with jitter and feed the circuit breaker
+            max_retries=0
+        )
+    return _async_client
+
+
+async def warm_up_client():
+    """Create the client and open a pooled connection (TCP and TLS) to OpenAI ahead of the first analysis."""
+    if not get_settings().openai_api_key:
+        return
+    # Listing models is free and needs no prompt; any response means the connection is up
+    try:
+        await get_async_client().models.list(timeout=10)
+    except Exception:
+        pass
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+    return _semaphore
+
+
+@contextmanager
+def track_usage():
+    """Collect the token usage of every LLM call made inside the block, including in tasks it starts."""
+    usage = {"prompt_tokens": 0, "completion_tokens": 0, "calls": 0}
+    token = _usage.set(usage)
+    try:
+        yield usage
+    finally:
+        try:
+            _usage.reset(token)
+        except ValueError:
+            # Exited from another context, e.g. an abandoned streaming generator being closed
+            pass
+
+
+def _record_usage(model: str, usage):
+    if usage is None:
+        return
+    LLM_TOKENS.inc(usage.prompt_tokens or 0, model=model, type="prompt")
+    LLM_TOKENS.inc(usage.completion_tokens or 0, model=model, type="completion")
+    totals = _usage.get()
+    if totals is None:
+        return
+    totals["prompt_tokens"] += usage.prompt_tokens or 0
+    totals["completion_tokens"] += usage.completion_tokens or 0
+    totals["calls"] += 1
+
+
+def _is_upstream_failure(error: Exception) -> bool:
+    """429, 5xx and connection errors (timeouts included) mean OpenAI itself is struggling."""
+    from openai import APIConnectionError, RateLimitError, InternalServerError
+
+    return isinstance(error, (RateLimitError, InternalServerError, APIConnectionError))
+
+
+def _retry_delay(attempt: int, error: Exception) -> float:
+    """Full-jitter exponential backoff, at least the Retry-After of a 429 (capped)."""
+    from openai import APIStatusError
+
+    delay = random.uniform(0, min(LLM_BACKOFF_MAX_SECONDS, LLM_BACKOFF_BASE_SECONDS * 2 ** attempt))
+    if isinstance(error, APIStatusError):
+        try:
+            delay = max(delay, float(error.response.headers.get("retry-after", 0)))
+        except ValueError:
+            pass
+    return min(delay, LLM_BACKOFF_MAX_SECONDS)
+
+
+async def _create_with_retries(model: str, keep_slot: bool = False, **kwargs):
+    """
+    Start a completion (or a stream) through the circuit breaker, retrying upstream
+    failures with backoff. Raises LLMUnavailableError once they are exhausted.
+    With keep_slot, the caller must release the concurrency slot when done.
+    """
+    semaphore = _get_semaphore()
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        is_probe = _breaker.before_call()
+        acquired = False
+        try:
+            await semaphore.acquire()
+            acquired = True
+            response = await get_async_client().chat.completions.create(model=model, **kwargs)
+        except BaseException as e:
+            if acquired:
+                semaphore.release()
+            if isinstance(e, Exception):
+                LLM_REQUESTS.inc(model=model, outcome="error")
+            if not isinstance(e, Exception) or not _is_upstream_failure(e):
+                # Cancelled, or a request error (bad input, auth) that says nothing about upstream health
+                if is_probe:
+                    _breaker.release_probe()
+                raise
+            _breaker.record_failure()
+            if attempt == LLM_MAX_RETRIES:
+                raise LLMUnavailableError(f"OpenAI is unavailable: {str(e)}", _retry_delay(attempt, e) or 1.0) from e
+            LLM_RETRIES.inc(model=model, reason=type(e).__name__)
+            # Back off without holding a concurrency slot
+            await asyncio.sleep(_retry_delay(attempt, e))
+            continue
+
+        if not keep_slot:
+            semaphore.release()
+        _breaker.record_success()
+        return response
+
+
+async def create_chat_completion(timeout: float | None = None, **kwargs):
+    """Run a chat completion on the shared client, bounded by the concurrency limit."""
+    model = kwargs.pop("model", None)
+    response = await _create_with_retries(model, timeout=timeout or LLM_TIMEOUT_SECONDS, **kwargs)
+    LLM_REQUESTS.inc(model=model, outcome="ok")
+    _record_usage(model, getattr(response, "usage", None))
+    return response
+
+
+async def stream_chat_completion(timeout: float | None = None, **kwargs):
+    """
+    Stream a chat completion, yielding content deltas; holds a concurrency slot until done.
+    Only starting the stream is retried; a stream that fails midway is not.
+    """
+    model = kwargs.pop("model", None)
+    stream = await _create_with_retries(
+        model,
+        keep_slot=True,
+        timeout=timeout or LLM_TIMEOUT_SECONDS,
+        stream=True,
+        stream_options={"include_usage": True},
+        **kwargs
+    )
+    outcome = "error"
+    try:
+        async for chunk in stream:
+            # Usage arrives in a final chunk without choices
+            _record_usage(model, getattr(chunk, "usage", None))
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+        outcome = "ok"
+    finally:
+        try:
+            await stream.close()
+        finally:
+            _get_semaphore().release()
+            LLM_REQUESTS.inc(model=model, outcome=outcome)
+
+
+def get_circuit_state() -> dict:
+    """State of the OpenAI circuit breaker, for /health."""
+    return _breaker.snapshot()
+
+
+async def close_async_client():
+    """Close the shared client and its connection pool."""
+    global _async_client
+    if _async_client is not None:
+        await _async_client.close()
+        _async_client = None
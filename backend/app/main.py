@@ -1,15 +1,48 @@
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Depends
+# Imported first: loads .env and starts the cold-start clock
+from app.settings import get_settings, IMPORT_STARTED
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Depends, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, PlainTextResponse
 from sqlmodel import Session
 from typing import Optional
-from app.db import init_db, get_session
-from app.resume_service import save_resume, get_resume
-from app.jd_service import process_jd_text, process_jd_image
-from app.ai_service import analyze_resume_jd
-from app.jd_validator import validate_jd_text
+from datetime import timezone
+from email.utils import format_datetime
+import hashlib
+from pathlib import Path
+import json
+import time
+from app.db import init_db, get_session, engine
+from app.resume_service import save_resume, delete_resume, get_resumes, shutdown_pdf_pool, MAX_RESUME_SIZE
+from app.jd_service import process_jd_text, process_jd_image_async, shutdown_ocr_pool, OCRBusyError
+from app.ai_service import DRAFT_KEYS
+from app.jd_validator import check_jd_heuristics, get_validator_stats
+from app.analysis_service import (
+    run_analysis, find_prior_analysis, analyze_batch, stream_validate_and_analyze, select_resume, get_single_flight_stats,
+    stored_draft, draft_profile, draft_response, write_draft, stream_draft, InvalidJDError, ResumeNotStoredError, BATCH_MAX_ITEMS
+)
+from app.llm_client import close_async_client, track_usage, get_circuit_state, LLMUnavailableError
+from app.jd_similarity import load_similarity_index, get_similarity_stats
+from app.metrics import MetricsMiddleware, render_metrics, timed, STARTUP_SECONDS
+from app.warmup import start_warm_up, stop_warm_up
+from app.job_queue import (
+    enqueue_job, wait_for_job, get_job_stats, start_job_workers, stop_job_workers, JobQueueFullError, JOB_LANES, JOB_MAX_WAIT_SECONDS
+)
+from app.analysis_history import record_analysis, list_analyses, search_analyses, get_analysis
+from app.skill_matcher import score_skills
+from app.resume_ranker import ResumeIndex
+from app.triage import triage_feed, read_feed, open_uploaded_feed, feed_format_for, TRIAGE_TOP_K, TRIAGE_MAX_TOP_K
+from app.prompt_builder import get_prompt_stats
+from app.analysis_cache import make_cache_key, get_cached_analysis, store_analysis, get_cache_stats
+from app.ocr_cache import get_ocr_cache_stats
 
 app = FastAPI(title="Resume Analyzer API")
 
+# Size of the chunks uploads are read in
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+# Request latency histograms and Server-Timing headers
+app.add_middleware(MetricsMiddleware)
+
 # CORS middleware for Chrome extension
 app.add_middleware(
     CORSMiddleware,
@@ -21,60 +54,152 @@ app.add_middleware(
 
 # Initialize database on startup
 @app.on_event("startup")
-def on_startup():
+async def on_startup():
+    started = time.perf_counter()
+    STARTUP_SECONDS.set(started - IMPORT_STARTED, phase="import")
     init_db()
+    with Session(engine) as session:
+        load_similarity_index(session)
+    # Resumes the jobs a previous run left unfinished
+    start_job_workers()
+    STARTUP_SECONDS.set(time.perf_counter() - started, phase="startup")
+    # Tesseract, the PDF reader and the OpenAI client are set up on first use, or now in the background
+    if get_settings().warmup:
+        start_warm_up()
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    stop_warm_up()
+    await stop_job_workers()
+    await close_async_client()
+    shutdown_ocr_pool()
+    shutdown_pdf_pool()
 
 
 @app.get("/health")
 def health_check():
-    """Health check endpoint."""
-    return {"status": "ok"}
+    """Health check endpoint; reports "degraded" while the OpenAI circuit breaker is open."""
+    circuit = get_circuit_state()
+    return {"status": "degraded" if circuit["state"] == "open" else "ok", "llm_circuit": circuit}
+
+
+@app.get("/metrics")
+def get_metrics():
+    """Latency histograms, token usage and cache counters in the Prometheus text format."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/stats")
+def get_stats(session: Session = Depends(get_session)):
+    """Get cache hit/miss counters, prompt token savings, classifier usage, coalesced requests and queued jobs."""
+    return {
+        "analysis_cache": get_cache_stats(session),
+        "ocr_cache": get_ocr_cache_stats(session),
+        "jd_prompt": get_prompt_stats(),
+        "jd_validator": get_validator_stats(),
+        "jd_similarity": get_similarity_stats(),
+        "single_flight": get_single_flight_stats(),
+        "jobs": get_job_stats(session)
+    }
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [value.strip().removeprefix("W/") for value in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
 
 
 @app.get("/resume/status")
-def get_resume_status(session: Session = Depends(get_session)):
-    """Get resume status (exists, filename, and updated_at)."""
-    resume = get_resume(session)
-    if resume:
-        # Extract filename from file_path
-        from pathlib import Path
-        filename = Path(resume.file_path).name
+def get_resume_status(request: Request, response: Response, session: Session = Depends(get_session)):
+    """Get resume status (exists, count, and the latest filename and updated_at); answers If-None-Match with 304."""
+    resumes = get_resumes(session)
+    latest = resumes.latest()
+    headers = {"ETag": resumes.etag, "Cache-Control": "no-cache"}
+    if latest:
+        headers["Last-Modified"] = format_datetime(latest["updated_at"].replace(tzinfo=timezone.utc), usegmt=True)
+    
+    if _etag_matches(request.headers.get("if-none-match"), resumes.etag):
+        return Response(status_code=304, headers=headers)
+    
+    response.headers.update(headers)
+    if latest:
         return {
             "exists": True,
-            "filename": filename,
-            "updated_at": resume.updated_at.isoformat()
+            "count": len(resumes),
+            "filename": latest["filename"],
+            "updated_at": latest["updated_at"].isoformat()
         }
     return {
-        "exists": False
+        "exists": False,
+        "count": 0
     }
 
 
+@app.get("/resumes")
+def list_resumes(session: Session = Depends(get_session)):
+    """List stored resumes with their profile summary."""
+    return [
+        {
+            "id": resume["id"],
+            "filename": resume["filename"],
+            "updated_at": resume["updated_at"].isoformat(),
+            "skills": resume["profile"]["skills"],
+            "years_experience": resume["profile"]["years_experience"],
+            "seniority": resume["profile"]["seniority"]
+        }
+        for resume in get_resumes(session).resumes
+    ]
+
+
+@app.delete("/resumes/{resume_id}")
+def remove_resume(resume_id: int, session: Session = Depends(get_session)):
+    """Delete a stored resume."""
+    if not delete_resume(session, resume_id):
+        raise HTTPException(status_code=404, detail="Resume not found")
+    return {"message": "Resume deleted successfully"}
+
+
+async def _read_upload(file: UploadFile, max_size: int) -> tuple[bytes, str]:
+    """Read an upload in chunks, hashing as it streams and stopping once it exceeds max_size."""
+    if file.size is not None and file.size > max_size:
+        raise HTTPException(status_code=400, detail="Resume file size must be less than 1 MB.")
+    
+    digest = hashlib.sha256()
+    chunks = []
+    size = 0
+    while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+        size += len(chunk)
+        if size > max_size:
+            raise HTTPException(status_code=400, detail="Resume file size must be less than 1 MB.")
+        digest.update(chunk)
+        chunks.append(chunk)
+    return b"".join(chunks), digest.hexdigest()
+
+
 @app.post("/resume/upload")
-def upload_resume(
+async def upload_resume(
     file: UploadFile = File(...),
     session: Session = Depends(get_session)
 ):
-    """Upload or replace resume PDF."""
+    """Upload a resume PDF (a file with the same name as a stored resume replaces it)."""
     if not file.filename:
         raise HTTPException(status_code=400, detail="No file provided")
     
     if not file.filename.lower().endswith('.pdf'):
         raise HTTPException(status_code=400, detail="File must be a PDF")
     
+    pdf_bytes, file_hash = await _read_upload(file, MAX_RESUME_SIZE)
+    if len(pdf_bytes) == 0:
+        raise HTTPException(status_code=400, detail="Empty file")
+    
     try:
-        pdf_bytes = file.file.read()
-        if len(pdf_bytes) == 0:
-            raise HTTPException(status_code=400, detail="Empty file")
-        
-        # Validate file size (1 MB = 1048576 bytes)
-        MAX_FILE_SIZE = 1 * 1024 * 1024  # 1 MB
-        if len(pdf_bytes) > MAX_FILE_SIZE:
-            raise HTTPException(status_code=400, detail="Resume file size must be less than 1 MB.")
-        
-        resume = save_resume(session, pdf_bytes, file.filename)
+        resume = await save_resume(session, pdf_bytes, file.filename, file_hash)
         return {
             "message": "Resume uploaded successfully",
-            "filename": file.filename,
+            "resume_id": resume.id,
+            "filename": Path(resume.file_path).name,
             "updated_at": resume.updated_at.isoformat()
         }
     except ValueError as e:
@@ -83,23 +208,14 @@ def upload_resume(
         raise HTTPException(status_code=500, detail=f"Failed to upload resume: {str(e)}")
 
 
-@app.post("/analyze-jd")
-async def analyze_jd(
-    jd_text: Optional[str] = Form(None),
-    jd_image: Optional[UploadFile] = File(None),
-    session: Session = Depends(get_session)
-):
-    """Analyze job description against resume."""
-    # Get resume
-    resume = get_resume(session)
-    if not resume:
-        raise HTTPException(status_code=400, detail="No resume uploaded. Please upload a resume first.")
-    
-    # Process JD input
+async def _read_jd_input(jd_text: Optional[str], jd_image: Optional[UploadFile]) -> str:
+    """Get JD text from the pasted text or by OCR of the uploaded image."""
     if jd_image and jd_image.filename:
         try:
             image_bytes = await jd_image.read()
-            jd_text_processed = process_jd_image(image_bytes)
+            jd_text_processed = await process_jd_image_async(image_bytes)
+        except OCRBusyError as e:
+            raise HTTPException(status_code=503, detail=str(e))
         except Exception as e:
             raise HTTPException(status_code=400, detail=f"Failed to process image: {str(e)}")
     elif jd_text:
@@ -110,16 +226,331 @@ async def analyze_jd(
     if not jd_text_processed or not jd_text_processed.strip():
         raise HTTPException(status_code=400, detail="Job description text is empty")
     
-    # Validate JD before analysis
-    is_valid, error_message = validate_jd_text(jd_text_processed)
-    if not is_valid:
-        raise HTTPException(status_code=400, detail=error_message)
+    return jd_text_processed
+
+
+def _unavailable(error: LLMUnavailableError) -> HTTPException:
+    headers = {"Retry-After": str(max(1, round(error.retry_after)))} if error.retry_after else None
+    return HTTPException(status_code=503, detail=str(error), headers=headers)
+
+
+def _get_resumes_or_400(session: Session) -> ResumeIndex:
+    # Served from memory after the first request
+    resumes = get_resumes(session)
+    if not len(resumes):
+        raise HTTPException(status_code=400, detail="No resume uploaded. Please upload a resume first.")
+    return resumes
+
+
+def _select_resume(resumes: ResumeIndex, jd_text: str, resume_id: Optional[int]) -> tuple[dict, dict]:
+    """Pick the requested resume, or the one most similar to the JD."""
+    selection = select_resume(resumes, jd_text, resume_id)
+    if selection is None:
+        raise HTTPException(status_code=404, detail="Resume not found")
+    return selection
+
+
+@app.post("/analyze-jd")
+async def analyze_jd(
+    jd_text: Optional[str] = Form(None),
+    jd_image: Optional[UploadFile] = File(None),
+    mode: str = Form("full"),
+    resume_id: Optional[int] = Form(None),
+    session: Session = Depends(get_session)
+):
+    """
+    Analyze job description against the given resume, or the stored resume that
+    best matches it (mode="fast" returns only local skill scoring).
+    """
+    if mode not in ("full", "fast"):
+        raise HTTPException(status_code=400, detail="mode must be 'full' or 'fast'")
     
-    # Analyze with AI
+    resumes = _get_resumes_or_400(session)
+    jd_text_processed = await _read_jd_input(jd_text, jd_image)
+    resume, choice = _select_resume(resumes, jd_text_processed, resume_id)
+    profile = resume["profile"]
+    
+    if mode == "fast":
+        # Deterministic local scoring, no LLM calls
+        is_valid, error_message = check_jd_heuristics(jd_text_processed)
+        if not is_valid:
+            raise HTTPException(status_code=400, detail=error_message)
+        return {**score_skills(frozenset(profile["skills"]), jd_text_processed), "resume": choice}
+    
+    # Validate JD and analyze with AI (repeated JDs are served from the cache)
     try:
-        result = analyze_resume_jd(resume.extracted_text, jd_text_processed)
-        return result
+        return {**await run_analysis(session, profile, jd_text_processed), "resume": choice}
+    except InvalidJDError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except LLMUnavailableError as e:
+        raise _unavailable(e)
     except ValueError as e:
         raise HTTPException(status_code=500, detail=f"AI analysis failed: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Analysis error: {str(e)}")
+
+
+def _sse(event: str, data) -> str:
+    """Format a server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def _stream_analysis_events(profile: dict, jd_text: str, cache_key: str, cached_result: dict | None, choice: dict):
+    yield _sse("resume", choice)
+    if cached_result is not None:
+        # Replay a cached result in the same order a live stream would produce it
+        for key, value in cached_result.items():
+            if key in DRAFT_KEYS:
+                yield _sse("draft", {"field": key, "delta": value})
+            else:
+                yield _sse(key, value)
+        yield _sse("result", cached_result)
+        return
+    
+    started = time.perf_counter()
+    try:
+        with track_usage() as usage:
+            async for event, data in stream_validate_and_analyze(profile, jd_text):
+                if event == "result":
+                    # The request session is gone once streaming starts
+                    latency_ms = round((time.perf_counter() - started) * 1000)
+                    with timed("db_write"), Session(engine) as session:
+                        data["analysis_id"] = record_analysis(session, profile["text_hash"], jd_text, data, latency_ms, usage).id
+                        store_analysis(session, cache_key, data)
+                yield _sse(event, data)
+    except InvalidJDError as e:
+        yield _sse("error", {"status": 400, "detail": str(e)})
+    except LLMUnavailableError as e:
+        yield _sse("error", {"status": 503, "detail": str(e)})
+    except ValueError as e:
+        yield _sse("error", {"status": 500, "detail": f"AI analysis failed: {str(e)}"})
+    except Exception as e:
+        yield _sse("error", {"status": 500, "detail": f"Analysis error: {str(e)}"})
+
+
+@app.post("/analyze-jd/stream")
+async def analyze_jd_stream(
+    jd_text: Optional[str] = Form(None),
+    jd_image: Optional[UploadFile] = File(None),
+    resume_id: Optional[int] = Form(None),
+    session: Session = Depends(get_session)
+):
+    """
+    Analyze job description against the given or best-matching resume, streaming
+    results as server-sent events (the first event names the resume).
+    """
+    resumes = _get_resumes_or_400(session)
+    jd_text_processed = await _read_jd_input(jd_text, jd_image)
+    resume, choice = _select_resume(resumes, jd_text_processed, resume_id)
+    profile = resume["profile"]
+    
+    cache_key = make_cache_key(profile["text_hash"], jd_text_processed)
+    with timed("cache_lookup"):
+        cached_result = get_cached_analysis(session, cache_key)
+    if cached_result is None:
+        with timed("near_duplicate_lookup"):
+            cached_result = find_prior_analysis(session, profile, jd_text_processed)
+    if cached_result is None:
+        # Reject obvious non-JDs before the stream starts so they still get a 400
+        is_valid, error_message = check_jd_heuristics(jd_text_processed)
+        if not is_valid:
+            raise HTTPException(status_code=400, detail=error_message)
+    
+    return StreamingResponse(
+        _stream_analysis_events(profile, jd_text_processed, cache_key, cached_result, choice),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+async def _stream_draft_events(analysis: dict, draft: dict | None, profile: dict | None):
+    if draft is not None:
+        # Replay stored drafts the way a live stream would deliver them
+        for key, value in draft.items():
+            yield _sse("draft", {"field": key, "delta": value})
+        yield _sse("result", draft_response(analysis, draft))
+        return
+    
+    try:
+        async for event, data in stream_draft(profile, analysis):
+            yield _sse(event, data)
+    except LLMUnavailableError as e:
+        yield _sse("error", {"status": 503, "detail": str(e)})
+    except ValueError as e:
+        yield _sse("error", {"status": 500, "detail": f"Draft generation failed: {str(e)}"})
+    except Exception as e:
+        yield _sse("error", {"status": 500, "detail": f"Draft error: {str(e)}"})
+
+
+@app.post("/analyze-jd/{analysis_id}/draft")
+async def draft_outreach(analysis_id: int, stream: bool = False, session: Session = Depends(get_session)):
+    """
+    Write the email and/or DM drafts for an earlier analysis (written once, then
+    served from the database). stream=true sends them as server-sent events.
+    """
+    analysis = get_analysis(session, analysis_id)
+    if analysis is None:
+        raise HTTPException(status_code=404, detail="Analysis not found")
+    resumes = get_resumes(session)
+    
+    if stream:
+        draft = stored_draft(analysis)
+        try:
+            profile = draft_profile(resumes, analysis) if draft is None else None
+        except ResumeNotStoredError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        return StreamingResponse(
+            _stream_draft_events(analysis, draft, profile),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+    
+    try:
+        return await write_draft(resumes, analysis)
+    except ResumeNotStoredError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except LLMUnavailableError as e:
+        raise _unavailable(e)
+    except ValueError as e:
+        raise HTTPException(status_code=500, detail=f"Draft generation failed: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Draft error: {str(e)}")
+
+
+@app.post("/analyze-jd/batch")
+async def analyze_jd_batch(
+    jd_texts: list[str] = Form([]),
+    jd_images: list[UploadFile] = File([]),
+    resume_id: Optional[int] = Form(None),
+    session: Session = Depends(get_session)
+):
+    """
+    Analyze many job descriptions, each against the given or best-matching resume,
+    streaming one NDJSON line per JD.
+    """
+    resumes = _get_resumes_or_400(session)
+    if resume_id is not None and resumes.get(resume_id) is None:
+        raise HTTPException(status_code=404, detail="Resume not found")
+    
+    items = [
+        {"index": index, "source": "text", "content": text}
+        for index, text in enumerate(jd_texts)
+    ]
+    for image in jd_images:
+        if image.filename:
+            # Read uploads now; they are closed once the streaming response starts
+            items.append({
+                "index": len(items),
+                "source": "image",
+                "filename": image.filename,
+                "content": await image.read()
+            })
+    
+    if not items:
+        raise HTTPException(status_code=400, detail="Either jd_texts or jd_images must be provided")
+    if len(items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"A batch can contain at most {BATCH_MAX_ITEMS} job descriptions")
+    
+    async def ndjson_lines():
+        async for outcome in analyze_batch(resumes, items, resume_id):
+            yield json.dumps(outcome) + "\n"
+    
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+
+@app.post("/jobs", status_code=202)
+async def submit_job(
+    response: Response,
+    jd_text: Optional[str] = Form(None),
+    jd_image: Optional[UploadFile] = File(None),
+    resume_id: Optional[int] = Form(None),
+    lane: str = Form("interactive"),
+    session: Session = Depends(get_session)
+):
+    """
+    Queue a JD analysis and return its job id at once; GET /jobs/{id} (with
+    wait= to long-poll) returns the result once a worker has run it.
+    """
+    if lane not in JOB_LANES:
+        raise HTTPException(status_code=400, detail=f"lane must be one of: {', '.join(JOB_LANES)}")
+    
+    resumes = _get_resumes_or_400(session)
+    if resume_id is not None and resumes.get(resume_id) is None:
+        raise HTTPException(status_code=404, detail="Resume not found")
+    
+    if jd_image and jd_image.filename:
+        source, content = "image", await jd_image.read()
+        if not content:
+            raise HTTPException(status_code=400, detail="Empty file")
+    elif jd_text and jd_text.strip():
+        source, content = "text", jd_text
+    else:
+        raise HTTPException(status_code=400, detail="Either jd_text or jd_image must be provided")
+    
+    try:
+        job = enqueue_job(session, source, content, lane, resume_id, jd_image.filename if source == "image" else None)
+    except JobQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    response.headers["Location"] = f"/jobs/{job.id}"
+    return {"job_id": job.id, "status": job.status, "lane": lane}
+
+
+@app.get("/jobs/{job_id}")
+async def get_job_status(job_id: int, wait: float = 0):
+    """
+    Get a job's status, and its result or error once finished. wait=N holds the
+    request open up to N seconds (at most JOB_MAX_WAIT_SECONDS) until the job finishes.
+    """
+    job = await wait_for_job(job_id, min(max(wait, 0), JOB_MAX_WAIT_SECONDS))
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@app.post("/triage")
+async def triage_job_feed(
+    feed: UploadFile = File(...),
+    top_k: int = Form(TRIAGE_TOP_K),
+    resume_id: Optional[int] = Form(None),
+    analyze: bool = Form(True),
+    session: Session = Depends(get_session)
+):
+    """
+    Rank a JSONL or CSV job feed against the resumes locally and run the full
+    analysis only on the top_k postings (analyze=false only ranks).
+    """
+    resumes = _get_resumes_or_400(session)
+    if resume_id is not None and resumes.get(resume_id) is None:
+        raise HTTPException(status_code=404, detail="Resume not found")
+    if not 1 <= top_k <= TRIAGE_MAX_TOP_K:
+        raise HTTPException(status_code=400, detail=f"top_k must be between 1 and {TRIAGE_MAX_TOP_K}")
+    
+    items = read_feed(open_uploaded_feed(feed.file), feed_format_for(feed.filename or ""))
+    try:
+        return await triage_feed(items, resumes, top_k, resume_id, analyze)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid feed: {str(e)}")
+
+
+@app.get("/analyses")
+def get_analyses(limit: int = 20, offset: int = 0, session: Session = Depends(get_session)):
+    """List past analyses, newest first."""
+    return list_analyses(session, limit, offset)
+
+
+@app.get("/analyses/search")
+def search_analysis_history(q: str, limit: int = 20, offset: int = 0, session: Session = Depends(get_session)):
+    """Full-text search past analyses by JD text (all words must match)."""
+    try:
+        return search_analyses(session, q, limit, offset)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/analyses/{analysis_id}")
+def get_analysis_detail(analysis_id: int, session: Session = Depends(get_session)):
+    """Get a past analysis with its full JD and result."""
+    analysis = get_analysis(session, analysis_id)
+    if analysis is None:
+        raise HTTPException(status_code=404, detail="Analysis not found")
+    return analysis
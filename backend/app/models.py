@@ -1,9 +1,84 @@
 from datetime import datetime
+from sqlalchemy import Index
 from sqlmodel import SQLModel, Field
 
 
 class Resume(SQLModel, table=True):
     id: int | None = Field(default=None, primary_key=True)
     file_path: str
+    # sha256 of the uploaded PDF, used to skip identical re-uploads
+    file_hash: str | None = None
     extracted_text: str
+    # Precomputed at upload time (see app.resume_profile)
+    text_hash: str | None = None
+    token_count: int | None = None
+    profile_json: str | None = None
+    # Hashed word/skill vector used to pick the best resume for a JD (see app.resume_ranker)
+    feature_vector: bytes | None = None
     updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class AnalysisCacheEntry(SQLModel, table=True):
+    key: str = Field(primary_key=True)
+    result_json: str
+    size_bytes: int
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    last_accessed_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+
+
+# OCR output of JD images, matched by perceptual hash (see app.ocr_cache)
+class OcrCacheEntry(SQLModel, table=True):
+    id: int | None = Field(default=None, primary_key=True)
+    # Number of square bands the hash splits the image into, and its height/width ratio
+    bands: int = Field(index=True)
+    aspect: float
+    # Difference-hash bits of the grayscale image
+    fingerprint: bytes
+    text: str
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    last_accessed_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+
+
+# Completed analyses, kept as searchable history (see app.analysis_history)
+class Analysis(SQLModel, table=True):
+    id: int | None = Field(default=None, primary_key=True)
+    resume_hash: str = Field(index=True)
+    jd_text: str
+    result_json: str
+    match_score: float
+    latency_ms: int
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    # MinHash signature of the JD for near-duplicate lookups (see app.jd_similarity)
+    jd_signature: bytes | None = None
+    # Outreach drafts, written on the first draft request for this analysis
+    draft_json: str | None = None
+    # The analysis whose result was reused for this near-duplicate JD, if any
+    reused_from: int | None = None
+    created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+
+
+# Queued analyses run by the background workers (see app.job_queue)
+class Job(SQLModel, table=True):
+    # Workers claim the first queued job in (priority, id) order
+    __table_args__ = (Index("ix_job_queue", "status", "priority", "id"),)
+
+    id: int | None = Field(default=None, primary_key=True)
+    # queued, running, done or failed
+    status: str = "queued"
+    # Lane rank, lower runs first (see JOB_LANES)
+    priority: int = 0
+    # "text" or "image"; the input is kept until the job finishes so it survives a restart
+    source: str
+    jd_text: str | None = None
+    jd_image: bytes | None = None
+    filename: str | None = None
+    resume_id: int | None = None
+    attempts: int = 0
+    # A job retried after a 503 is not claimed before this time
+    not_before: datetime | None = None
+    # The analysis outcome: {"resume", "status", "result"} or {"status", "detail"}
+    outcome_json: str | None = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    started_at: datetime | None = None
+    finished_at: datetime | None = Field(default=None, index=True)
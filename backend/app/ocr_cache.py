@@ -0,0 +1,134 @@
+"""
+OCR output cached by a perceptual hash of the image, so pasting the same
+screenshot again (or a recompressed or rescaled copy of it) skips recognition.
+"""
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING
+from sqlmodel import Session, select, delete, func
+from app.models import OcrCacheEntry
+from app.metrics import CACHE_EVENTS
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+# Hash grid of each band: a band (a roughly square slice of the image) becomes OCR_HASH_SIZE x OCR_HASH_SIZE bits
+OCR_HASH_SIZE = 32
+# Most bands per image; taller images get taller bands
+OCR_HASH_MAX_BANDS = 64
+# Share of differing hash bits still treated as the same screenshot
+OCR_HASH_MAX_DISTANCE = float(os.getenv("OCR_HASH_MAX_DISTANCE", "0.05"))
+# Relative difference in height/width ratio beyond which two images never match
+OCR_HASH_ASPECT_TOLERANCE = 0.02
+
+OCR_CACHE_MAX_ENTRIES = int(os.getenv("OCR_CACHE_MAX_ENTRIES", "500"))
+OCR_CACHE_TTL_SECONDS = int(os.getenv("OCR_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+
+_stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+_stats_lock = threading.Lock()
+
+
+def _count(name: str, amount: int = 1):
+    with _stats_lock:
+        _stats[name] += amount
+    CACHE_EVENTS.inc(amount, cache="ocr", event=name)
+
+
+def image_fingerprint(image: "Image.Image") -> dict:
+    """
+    Difference hash of a grayscale image, computed per band so tall screenshots keep
+    enough detail to tell posts apart. Returns {"bands", "aspect", "bits"}; the
+    scale and compression of the image barely change it.
+    """
+    import numpy as np
+    from PIL import Image
+
+    aspect = image.height / image.width
+    bands = min(OCR_HASH_MAX_BANDS, max(1, round(aspect)))
+    grid = image.resize((OCR_HASH_SIZE + 1, OCR_HASH_SIZE * bands), Image.Resampling.BOX)
+    pixels = np.asarray(grid, dtype=np.int16)
+    # One bit per horizontally adjacent pair of cells: is the right one brighter?
+    bits = pixels[:, 1:] > pixels[:, :-1]
+    return {"bands": bands, "aspect": round(aspect, 4), "bits": np.packbits(bits).tobytes()}
+
+
+def _distance(bits: bytes, other: bytes) -> float:
+    """Share of differing bits between two hashes of the same length."""
+    import numpy as np
+
+    differing = np.bitwise_xor(np.frombuffer(bits, dtype=np.uint8), np.frombuffer(other, dtype=np.uint8))
+    return np.unpackbits(differing).sum() / (len(bits) * 8)
+
+
+def get_cached_ocr(session: Session, fingerprint: dict) -> str | None:
+    """Return the OCR text of the closest cached image within OCR_HASH_MAX_DISTANCE, or None on a miss."""
+    now = datetime.utcnow()
+    candidates = session.execute(
+        select(OcrCacheEntry.id, OcrCacheEntry.aspect, OcrCacheEntry.fingerprint).where(
+            OcrCacheEntry.bands == fingerprint["bands"],
+            OcrCacheEntry.created_at >= now - timedelta(seconds=OCR_CACHE_TTL_SECONDS)
+        )
+    ).all()
+
+    best_id, best_distance = None, OCR_HASH_MAX_DISTANCE
+    for entry_id, aspect, bits in candidates:
+        if abs(aspect - fingerprint["aspect"]) > OCR_HASH_ASPECT_TOLERANCE * fingerprint["aspect"]:
+            continue
+        distance = _distance(bits, fingerprint["bits"])
+        if distance <= best_distance:
+            best_id, best_distance = entry_id, distance
+    if best_id is None:
+        _count("misses")
+        return None
+
+    entry = session.get(OcrCacheEntry, best_id)
+    entry.last_accessed_at = now
+    session.add(entry)
+    session.commit()
+    _count("hits")
+    return entry.text
+
+
+def store_ocr(session: Session, fingerprint: dict, text: str):
+    """Store the OCR text of an image and evict old entries if over the limits."""
+    now = datetime.utcnow()
+    session.add(OcrCacheEntry(
+        bands=fingerprint["bands"],
+        aspect=fingerprint["aspect"],
+        fingerprint=fingerprint["bits"],
+        text=text,
+        created_at=now,
+        last_accessed_at=now
+    ))
+    session.commit()
+    _count("stores")
+    _evict(session)
+
+
+def _evict(session: Session):
+    """Drop expired entries, then the least recently used ones over OCR_CACHE_MAX_ENTRIES."""
+    cutoff = datetime.utcnow() - timedelta(seconds=OCR_CACHE_TTL_SECONDS)
+    evicted = session.execute(delete(OcrCacheEntry).where(OcrCacheEntry.created_at < cutoff)).rowcount
+
+    count = session.execute(select(func.count()).select_from(OcrCacheEntry)).scalar_one()
+    if count > OCR_CACHE_MAX_ENTRIES:
+        oldest = session.execute(
+            select(OcrCacheEntry.id).order_by(OcrCacheEntry.last_accessed_at).limit(count - OCR_CACHE_MAX_ENTRIES)
+        ).scalars().all()
+        session.execute(delete(OcrCacheEntry).where(OcrCacheEntry.id.in_(oldest)))
+        evicted += len(oldest)
+
+    session.commit()
+    _count("evictions", evicted)
+
+
+def get_ocr_cache_stats(session: Session) -> dict:
+    """Return hit/miss counters and the number of cached images."""
+    count = session.execute(select(func.count()).select_from(OcrCacheEntry)).scalar_one()
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+    stats["entries"] = count
+    return stats
@@ -0,0 +1,225 @@
+import os
+import re
+import threading
+from functools import lru_cache
+from app.jd_keywords import JOB_KEYWORDS, UI_INDICATORS, BOILERPLATE_PHRASES
+from app.tokens import count_tokens, truncate_to_tokens
+
+# Maximum JD tokens sent in the analysis prompt
+JD_PROMPT_TOKEN_BUDGET = int(os.getenv("JD_PROMPT_TOKEN_BUDGET", "1500"))
+# Maximum JD tokens sent to the yes/no validity classifier
+JD_CLASSIFIER_TOKEN_BUDGET = int(os.getenv("JD_CLASSIFIER_TOKEN_BUDGET", "250"))
+# Pastes longer than this are cut before any processing
+MAX_INPUT_CHARS = 60000
+
+# Section header keywords -> priority (lower is kept first)
+SECTION_PRIORITIES = [
+    (0, ["requirement", "qualification", "what you bring", "looking for", "skills", "must have",
+         "nice to have", "who you are", "about you", "what you need", "preferred"]),
+    (1, ["responsibilit", "what you'll do", "what you will do", "duties", "day to day",
+         "in this role", "your impact", "the role", "role overview", "key tasks"]),
+    (2, ["job description", "overview", "position", "summary", "about the role", "about the job"]),
+    (4, ["about us", "about the company", "who we are", "our company", "why join", "our mission"]),
+]
+# Boilerplate section keywords, only honoured on a line ending with ":"
+BOILERPLATE_HEADERS = [
+    "benefit", "perks", "what we offer", "equal opportunity", "eeo", "diversity",
+    "privacy", "cookie", "accommodation", "disclaimer"
+]
+# Boilerplate section headers recognized without a trailing ":"
+BOILERPLATE_HEADER_PHRASES = {
+    "benefits", "perks", "perks and benefits", "benefits and perks", "perks & benefits", "benefits & perks",
+    "what we offer", "equal opportunity", "equal opportunity employer", "eeo statement",
+    "diversity and inclusion", "diversity & inclusion", "privacy notice", "privacy policy",
+    "cookie policy", "accommodations", "disclaimer"
+}
+# Priority of text before the first recognized header (usually the title and intro)
+DEFAULT_PRIORITY = 2
+# Priority of the about-us sections, kept last
+LOWEST_PRIORITY = 4
+# Lines needed to decide contact_mode are always kept (up to MAX_CONTACT_LINES)
+MAX_CONTACT_LINES = 10
+_CONTACT_RE = re.compile(r"@|\b(apply|email|e-mail|send (your|us)|dm|message|reach out)\b", re.IGNORECASE)
+
+
+def _phrase_regex(phrases: list[str], whole_word: bool) -> re.Pattern:
+    suffix = r"\b" if whole_word else ""
+    return re.compile(r"\b(?:" + "|".join(re.escape(phrase) for phrase in phrases) + r")" + suffix)
+
+
+_JOB_RE = _phrase_regex(JOB_KEYWORDS, whole_word=False)
+_UI_RE = _phrase_regex(UI_INDICATORS, whole_word=True)
+_BOILERPLATE_RE = _phrase_regex(BOILERPLATE_PHRASES, whole_word=False)
+
+_stats = {"prompts": 0, "original_tokens": 0, "prompt_tokens": 0, "duplicate_lines": 0, "boilerplate_blocks": 0}
+_stats_lock = threading.Lock()
+
+
+def _header_priority(line: str) -> int | None:
+    """Return the section priority if line looks like a section header (-1 for boilerplate)."""
+    if len(line) > 60:
+        return None
+    lower = line.lower().rstrip(":").strip()
+    if not (line.endswith(":") or len(lower.split()) <= 5):
+        return None
+    if lower in BOILERPLATE_HEADER_PHRASES or (line.endswith(":") and any(keyword in lower for keyword in BOILERPLATE_HEADERS)):
+        return -1
+    for priority, keywords in SECTION_PRIORITIES:
+        if any(keyword in lower for keyword in keywords):
+            return priority
+    return None
+
+
+def _is_boilerplate(block_lower: str, boilerplate_header: bool = False) -> bool:
+    """
+    Classify a block as boilerplate from its keyword hits. A block under a
+    boilerplate header is boilerplate unless it reads like job content.
+    """
+    boilerplate_hits = len(set(_BOILERPLATE_RE.findall(block_lower)))
+    job_hits = len(set(_JOB_RE.findall(block_lower)))
+    if boilerplate_header:
+        return job_hits < max(3, 2 * boilerplate_hits)
+    if boilerplate_hits >= 2 and job_hits < 2 * boilerplate_hits:
+        return True
+    ui_hits = len(set(_UI_RE.findall(block_lower)))
+    return ui_hits >= 3 and job_hits < 2
+
+
+def _split_blocks(text: str) -> tuple[list[tuple[int, int, list[str]]], int]:
+    """
+    Split text into (priority, position, lines) blocks, dropping duplicate lines.
+    Returns the blocks and the number of duplicate lines removed.
+    """
+    blocks = []
+    seen = set()
+    duplicates = 0
+    priority = DEFAULT_PRIORITY
+    lines = []
+
+    def flush():
+        if lines:
+            blocks.append((priority, len(blocks), list(lines)))
+            lines.clear()
+
+    for raw_line in text.splitlines():
+        line = " ".join(raw_line.split())
+        if not line:
+            flush()
+            # Boilerplate sections (benefits, cookie banners) end at the next blank line
+            if priority == -1:
+                priority = DEFAULT_PRIORITY
+            continue
+        key = line.lower()
+        if key in seen:
+            duplicates += 1
+            continue
+        seen.add(key)
+        header_priority = _header_priority(line)
+        if header_priority is not None:
+            flush()
+            priority = header_priority
+        lines.append(line)
+    flush()
+    return blocks, duplicates
+
+
+def _fit_budget(blocks: list[list[str]], token_budget: int) -> str:
+    """Join blocks in order until the token budget is used up."""
+    kept = []
+    used = 0
+    for lines in blocks:
+        block_text = "\n".join(lines)
+        block_tokens = count_tokens(block_text)
+        if used + block_tokens <= token_budget:
+            kept.append(block_text)
+            used += block_tokens + 1
+            continue
+        # Take as many whole lines of the block as still fit, then stop
+        partial = []
+        for line in lines:
+            line_tokens = count_tokens(line) + 1
+            if used + line_tokens > token_budget:
+                break
+            partial.append(line)
+            used += line_tokens
+        if partial:
+            kept.append("\n".join(partial))
+        break
+    return "\n\n".join(kept)
+
+
+@lru_cache(maxsize=64)
+def _reduce_jd(jd_text: str, token_budget: int) -> tuple[str, dict]:
+    """
+    Reduce a pasted JD to what matters for the prompt: drop duplicate lines and
+    boilerplate blocks, put requirements and responsibilities first, and cut to
+    token_budget tokens. Returns (text, stats).
+    """
+    text = jd_text[:MAX_INPUT_CHARS]
+    blocks, duplicates = _split_blocks(text)
+
+    kept = []
+    contact_lines = []
+    boilerplate_blocks = 0
+    for priority, position, lines in blocks:
+        # Application instructions always go first so they survive the budget,
+        # even when they sit inside a dropped block
+        other_lines = []
+        for line in lines:
+            if _CONTACT_RE.search(line) and len(contact_lines) < MAX_CONTACT_LINES:
+                contact_lines.append(line)
+            else:
+                other_lines.append(line)
+        if _is_boilerplate("\n".join(lines).lower(), boilerplate_header=priority == -1):
+            boilerplate_blocks += 1
+            continue
+        if other_lines:
+            # Job content under a boilerplate header goes last
+            kept.append((LOWEST_PRIORITY if priority == -1 else priority, position, other_lines))
+    kept.sort()
+
+    ordered = [lines for _, _, lines in kept]
+    if contact_lines:
+        ordered.insert(0, contact_lines)
+    original_tokens = count_tokens(jd_text)
+    if not duplicates and not boilerplate_blocks and original_tokens <= token_budget:
+        # Nothing to remove and it fits: reordering alone would only add separators
+        prompt_text = jd_text
+    else:
+        prompt_text = _fit_budget(ordered, token_budget)
+    if not prompt_text:
+        # Everything looked like boilerplate; fall back to the head of the raw text
+        prompt_text = truncate_to_tokens(text, token_budget)
+
+    prompt_tokens = count_tokens(prompt_text)
+    stats = {
+        "original_tokens": original_tokens,
+        "prompt_tokens": prompt_tokens,
+        "tokens_saved": max(0, original_tokens - prompt_tokens),
+        "duplicate_lines": duplicates,
+        "boilerplate_blocks": boilerplate_blocks,
+    }
+    return prompt_text, stats
+
+
+def build_jd_prompt_text(jd_text: str, token_budget: int = JD_PROMPT_TOKEN_BUDGET) -> tuple[str, dict]:
+    """
+    Reduce a JD for a prompt (see _reduce_jd, which caches the work) and count
+    the token savings of every build, cached or not. Returns (text, stats).
+    """
+    prompt_text, stats = _reduce_jd(jd_text, token_budget)
+    with _stats_lock:
+        _stats["prompts"] += 1
+        _stats["original_tokens"] += stats["original_tokens"]
+        _stats["prompt_tokens"] += stats["prompt_tokens"]
+        _stats["duplicate_lines"] += stats["duplicate_lines"]
+        _stats["boilerplate_blocks"] += stats["boilerplate_blocks"]
+    return prompt_text, dict(stats)
+
+
+def get_prompt_stats() -> dict:
+    """Return cumulative token savings of the prompt builder."""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["tokens_saved"] = max(0, stats["original_tokens"] - stats["prompt_tokens"])
+    return stats
@@ -0,0 +1,263 @@
+import hashlib
+import re
+from datetime import datetime
+from app.skill_matcher import extract_skills
+from app.tokens import count_tokens
+
+# Bump whenever the profile format changes so stored profiles are rebuilt
+PROFILE_VERSION = 4
+
+# Normalized section header -> canonical section name
+SECTION_HEADERS = {
+    "summary": "summary",
+    "professional summary": "summary",
+    "profile": "summary",
+    "about me": "summary",
+    "objective": "summary",
+    "career objective": "summary",
+    "experience": "experience",
+    "work experience": "experience",
+    "professional experience": "experience",
+    "employment history": "experience",
+    "work history": "experience",
+    "internships": "experience",
+    "internship": "experience",
+    "education": "education",
+    "academic background": "education",
+    "skills": "skills",
+    "technical skills": "skills",
+    "core skills": "skills",
+    "key skills": "skills",
+    "projects": "projects",
+    "personal projects": "projects",
+    "key projects": "projects",
+    "certifications": "certifications",
+    "certificates": "certifications",
+    "achievements": "achievements",
+    "awards": "achievements",
+    "publications": "publications",
+}
+
+# Characters of each section kept in the compact prompt profile
+SECTION_CHAR_LIMITS = {
+    "summary": 600,
+    # The resume's own skill list, so skills outside the skill_matcher vocabulary reach the prompt
+    "skills": 600,
+    "experience": 2000,
+    "projects": 800,
+    "education": 400,
+    "certifications": 300,
+    "achievements": 300,
+}
+
+MONTHS = {
+    "jan": 1, "feb": 2, "mar": 3, "apr": 4, "may": 5, "jun": 6,
+    "jul": 7, "aug": 8, "sep": 9, "oct": 10, "nov": 11, "dec": 12,
+}
+
+_DATE = r"(?:(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?\s+|(\d{1,2})/)?((?:19|20)\d{2})"
+_DATE_RANGE_RE = re.compile(
+    _DATE + r"\s*(?:-|–|—|to)\s*(?:" + _DATE + r"|(present|current|now|date))",
+    re.IGNORECASE
+)
+_YEARS_RE = re.compile(r"(\d{1,2})\+?\s*(?:years|yrs)", re.IGNORECASE)
+_SENIOR_TITLE_RE = re.compile(r"\b(senior|sr\.?|lead|staff|principal|architect|head of|manager)\b", re.IGNORECASE)
+_JUNIOR_TITLE_RE = re.compile(r"\b(intern|internship|junior|jr\.?|trainee|graduate|entry[- ]level|fresher)\b", re.IGNORECASE)
+_LOCATION_LABEL_RE = re.compile(r"^\s*(?:location|address|based in)\s*[:\-]\s*(.+)$", re.IGNORECASE)
+_CITY_RE = re.compile(r"\b([A-Z][a-zA-Z]+(?:[ -][A-Z][a-zA-Z]+)*),\s*([A-Z]{2}|[A-Z][a-zA-Z]+(?: [A-Z][a-zA-Z]+)?)\b")
+
+
+def _normalize_header(line: str) -> str:
+    return re.sub(r"[^a-z ]", "", line.lower()).strip()
+
+
+def segment_sections(text: str) -> dict[str, str]:
+    """Split resume text into sections keyed by canonical section name."""
+    sections = {"header": []}
+    current = "header"
+    for line in text.splitlines():
+        stripped = line.strip()
+        if not stripped:
+            continue
+        header = _normalize_header(stripped) if len(stripped) <= 40 else ""
+        if header in SECTION_HEADERS:
+            current = SECTION_HEADERS[header]
+            sections.setdefault(current, [])
+            continue
+        sections.setdefault(current, []).append(stripped)
+    return {name: "\n".join(lines) for name, lines in sections.items() if lines}
+
+
+def _month_index(month: str | None, numeric_month: str | None, year: str) -> int:
+    if month:
+        month_number = MONTHS[month[:3].lower()]
+    elif numeric_month and 1 <= int(numeric_month) <= 12:
+        month_number = int(numeric_month)
+    else:
+        month_number = 1
+    return int(year) * 12 + month_number - 1
+
+
+def estimate_years_of_experience(sections: dict[str, str], text: str) -> float | None:
+    """Estimate total years of experience from date ranges, else from "N years" statements."""
+    experience = sections.get("experience", "")
+    now = datetime.utcnow()
+    intervals = []
+    for match in _DATE_RANGE_RE.finditer(experience):
+        start = _month_index(match.group(1), match.group(2), match.group(3))
+        if match.group(7):
+            end = now.year * 12 + now.month - 1
+        else:
+            end = _month_index(match.group(4), match.group(5), match.group(6))
+        if end >= start:
+            intervals.append((start, end))
+
+    if intervals:
+        # Merge overlapping roles so parallel positions are not double counted
+        intervals.sort()
+        total_months = 0
+        current_start, current_end = intervals[0]
+        for start, end in intervals[1:]:
+            if start <= current_end:
+                current_end = max(current_end, end)
+            else:
+                total_months += current_end - current_start + 1
+                current_start, current_end = start, end
+        total_months += current_end - current_start + 1
+        return round(total_months / 12, 1)
+
+    stated = [int(years) for years in _YEARS_RE.findall(sections.get("summary", "") or text[:1500])]
+    return float(max(stated)) if stated else None
+
+
+def estimate_seniority(sections: dict[str, str], years: float | None) -> str:
+    """Classify the profile as "junior", "mid" or "senior"."""
+    titles = sections.get("experience", "")[:600] + "\n" + sections.get("header", "")
+    if years is not None:
+        if years >= 5 or (_SENIOR_TITLE_RE.search(titles) and years >= 3):
+            return "senior"
+        if years < 2:
+            return "junior"
+        return "mid"
+    if _SENIOR_TITLE_RE.search(titles):
+        return "senior"
+    if _JUNIOR_TITLE_RE.search(titles):
+        return "junior"
+    return "mid"
+
+
+def extract_location(sections: dict[str, str]) -> str | None:
+    """Find the candidate location in the contact header."""
+    header_lines = sections.get("header", "").splitlines()[:10]
+    for line in header_lines:
+        label = _LOCATION_LABEL_RE.match(line)
+        if label:
+            return label.group(1).strip()
+    for line in header_lines:
+        # Skip contact details such as emails, URLs and phone numbers
+        for part in re.split(r"[|•·]", line):
+            if "@" in part or "http" in part or "www." in part or re.search(r"\d{5,}", part):
+                continue
+            match = _CITY_RE.search(part)
+            if match:
+                return match.group(0).strip()
+    return None
+
+
+def _compact(text: str, limit: int) -> str:
+    text = re.sub(r"[ \t]+", " ", text).strip()
+    if len(text) <= limit:
+        return text
+    return text[:limit].rsplit(" ", 1)[0] + " ..."
+
+
+def render_profile(profile: dict) -> str:
+    """Render the compact resume profile used in prompts instead of the raw text."""
+    lines = []
+    if profile.get("location"):
+        lines.append(f"Location: {profile['location']}")
+    if profile.get("years_experience") is not None:
+        lines.append(f"Experience: {profile['years_experience']} years ({profile['seniority']} level)")
+    else:
+        lines.append(f"Seniority: {profile['seniority']}")
+    if profile.get("skills"):
+        lines.append("Recognized skills: " + ", ".join(profile["skills"]))
+    for name, content in profile.get("sections", {}).items():
+        lines.append(f"\n{name.capitalize()}:\n{content}")
+    return "\n".join(lines)
+
+
+def build_profile(text: str) -> dict:
+    """Build the structured resume profile from extracted resume text."""
+    sections = segment_sections(text)
+    years = estimate_years_of_experience(sections, text)
+    profile = {
+        "version": PROFILE_VERSION,
+        "text_hash": hashlib.sha256(text.encode("utf-8")).hexdigest(),
+        "skills": sorted(extract_skills(text)),
+        "years_experience": years,
+        "seniority": estimate_seniority(sections, years),
+        "location": extract_location(sections),
+        "sections": {
+            name: _compact(sections[name], limit)
+            for name, limit in SECTION_CHAR_LIMITS.items()
+            if sections.get(name)
+        },
+    }
+    if not profile["sections"]:
+        # Nothing recognizable as sections; keep a trimmed copy of the raw text
+        profile["sections"] = {"resume": _compact(text, 3000)}
+    profile["prompt_text"] = render_profile(profile)
+    profile["token_count"] = count_tokens(text)
+    profile["prompt_token_count"] = count_tokens(profile["prompt_text"])
+    return profile
+
+
+_JD_REMOTE_RE = re.compile(r"\b(remote|work from home|wfh|work from anywhere)\b", re.IGNORECASE)
+# Only the trigger words are case-insensitive; the place after them must be capitalized,
+# and the label or phrase ends at the end of the sentence
+_JD_LOCATION_RE = re.compile(
+    r"(?:^\s*(?i:(?:job\s+)?location)\s*[:\-]\s*(?P<label>[^\n.;]+)"
+    r"|\b(?i:based in|located in|on-?site in|office in)\s+(?P<phrase>[A-Z][a-zA-Z]+(?:(?:\s|,\s*)[A-Z][a-zA-Z]+)*))",
+    re.MULTILINE
+)
+# "5+ years of experience", "3 years in backend development", "minimum 4 yrs experience"
+_JD_REQUIRED_YEARS_RE = re.compile(
+    r"(\d{1,2})\+?\s*(?:years|yrs)(?:\s+(?:of|in|with)\b[^.;\n]{0,60}?)?\s+(?:professional\s+|relevant\s+|hands-on\s+)?experience",
+    re.IGNORECASE
+)
+_JD_SENIOR_TITLE_RE = re.compile(r"\b(senior|sr\.|lead|staff|principal)\b", re.IGNORECASE)
+
+
+def _city(location: str) -> str:
+    return location.split(",")[0].strip().lower()
+
+
+def check_jd_against_profile(profile: dict, jd_text: str) -> list[str]:
+    """Run the location and seniority mismatch checks locally; returns warnings."""
+    warnings = []
+
+    # Location mismatch, unless the role is remote
+    resume_location = profile.get("location")
+    if resume_location and not _JD_REMOTE_RE.search(jd_text):
+        match = _JD_LOCATION_RE.search(jd_text)
+        if match:
+            jd_location = (match.group("label") or match.group("phrase")).strip()
+            jd_city, resume_city = _city(jd_location), _city(resume_location)
+            if jd_city and resume_city and jd_city not in resume_city and resume_city not in jd_city:
+                warnings.append(f"Job location is {jd_location}, while your resume location is {resume_location}.")
+
+    # Seniority mismatch: a senior JD against a junior-mid profile
+    required_years = [int(years) for years in _JD_REQUIRED_YEARS_RE.findall(jd_text) if int(years) <= 20]
+    most_required = max(required_years) if required_years else None
+    is_senior_role = (most_required is not None and most_required >= 5) or bool(_JD_SENIOR_TITLE_RE.search(jd_text[:300]))
+    if is_senior_role and profile.get("seniority") != "senior":
+        if most_required is not None and most_required >= 5:
+            warnings.append(
+                f"This role is marked as Senior (requires {most_required}+ years experience), "
+                "while your resume reflects a junior–mid level profile."
+            )
+        else:
+            warnings.append("This role is marked as Senior, while your resume reflects a junior–mid level profile.")
+
+    return warnings
@@ -0,0 +1,144 @@
+import hashlib
+import math
+import re
+import zlib
+from collections import Counter
+from typing import TYPE_CHECKING
+import numpy as np
+from app.skill_matcher import extract_skills
+
+if TYPE_CHECKING:
+    from scipy.sparse import csr_matrix
+
+# Dimension of the hashed feature space (collisions are rare at resume/JD vocabulary sizes)
+FEATURE_DIMENSION = 2 ** 18
+# Weight of each recognized skill, relative to a word occurring once
+SKILL_FEATURE_WEIGHT = 3.0
+
+_TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9+#.]*[a-z0-9+#]|[a-z]")
+STOP_WORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or our that the their this to we will with you "
+    "your using use used work working years year experience team teams role job etc".split()
+)
+
+
+def _feature_index(feature: str) -> int:
+    # crc32 is stable across processes, unlike hash(), so stored vectors stay valid
+    return zlib.crc32(feature.encode("utf-8")) % FEATURE_DIMENSION
+
+
+def feature_vector(text: str, skills) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Hash the words (sublinear term frequency, stop words dropped) and recognized
+    skills of a text into a sparse, L2-normalized vector; returns (indices, values).
+    """
+    features = Counter()
+    for word, count in Counter(_TOKEN_RE.findall(text.lower())).items():
+        if word not in STOP_WORDS:
+            features[_feature_index(word)] += 1.0 + math.log(count)
+    for skill in skills:
+        features[_feature_index("skill:" + skill.lower())] += SKILL_FEATURE_WEIGHT
+
+    indices = np.fromiter(sorted(features), dtype=np.int32, count=len(features))
+    values = np.fromiter((features[index] for index in indices.tolist()), dtype=np.float32, count=len(features))
+    norm = np.linalg.norm(values)
+    if norm:
+        values /= norm
+    return indices, values
+
+
+def jd_vector(jd_text: str) -> tuple[np.ndarray, np.ndarray]:
+    """Feature vector of a JD, including the skills recognized in it."""
+    return feature_vector(jd_text, extract_skills(jd_text))
+
+
+def stack_vectors(vectors: list[tuple[np.ndarray, np.ndarray]]) -> "csr_matrix":
+    """Stack sparse vectors into a CSR matrix with one row per vector."""
+    # scipy.sparse takes a noticeable share of the cold start, and nothing needs it until resumes are loaded
+    from scipy.sparse import csr_matrix
+
+    indptr = np.zeros(len(vectors) + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum([len(indices) for indices, _ in vectors])
+    return csr_matrix(
+        (
+            np.concatenate([values for _, values in vectors]) if vectors else np.zeros(0, dtype=np.float32),
+            np.concatenate([indices for indices, _ in vectors]) if vectors else np.zeros(0, dtype=np.int32),
+            indptr
+        ),
+        shape=(len(vectors), FEATURE_DIMENSION)
+    )
+
+
+def pack_vector(vector: tuple[np.ndarray, np.ndarray]) -> bytes:
+    """Serialize a sparse vector for storage (int32 indices followed by float32 values)."""
+    indices, values = vector
+    return indices.astype(np.int32).tobytes() + values.astype(np.float32).tobytes()
+
+
+def unpack_vector(data: bytes) -> tuple[np.ndarray, np.ndarray]:
+    """Inverse of pack_vector."""
+    size = len(data) // 8
+    return np.frombuffer(data, dtype=np.int32, count=size), np.frombuffer(data, dtype=np.float32, count=size, offset=4 * size)
+
+
+class ResumeIndex:
+    """
+    Stored resumes stacked into one sparse matrix (one row per resume), so
+    ranking every resume against a JD is a single matrix-vector product.
+    """
+
+    def __init__(self, resumes: list[dict], vectors: list[tuple[np.ndarray, np.ndarray]]):
+        self.resumes = resumes
+        # Changes whenever a resume is added, replaced or deleted
+        self.etag = (
+            '"' + hashlib.sha256(",".join(resume["etag"] for resume in resumes).encode()).hexdigest()[:16] + '"'
+            if resumes else '"none"'
+        )
+        self._positions = {resume["id"]: position for position, resume in enumerate(resumes)}
+        self._matrix = stack_vectors(vectors)
+
+    def __len__(self) -> int:
+        return len(self.resumes)
+
+    def latest(self) -> dict | None:
+        """The most recently uploaded resume."""
+        return max(self.resumes, key=lambda resume: resume["updated_at"], default=None)
+
+    def get(self, resume_id: int) -> dict | None:
+        position = self._positions.get(resume_id)
+        return self.resumes[position] if position is not None else None
+
+    def find_by_text_hash(self, text_hash: str) -> dict | None:
+        """The stored resume with this text hash (the key analyses are recorded under)."""
+        return next((resume for resume in self.resumes if resume["profile"]["text_hash"] == text_hash), None)
+
+    def scores(self, jd_text: str) -> np.ndarray:
+        """Cosine similarity of every resume to the JD, in resume order."""
+        indices, values = jd_vector(jd_text)
+        dense = np.zeros(FEATURE_DIMENSION, dtype=np.float32)
+        dense[indices] = values
+        return self._matrix @ dense
+
+    def best_matches(self, jd_vectors: list[tuple[np.ndarray, np.ndarray]], resume_id: int | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Score many JDs at once (one sparse matrix product). Returns, per JD, the
+        position of the requested or most similar resume and its similarity.
+        """
+        scores = (stack_vectors(jd_vectors) @ self._matrix.T).toarray()
+        if resume_id is not None:
+            positions = np.full(len(jd_vectors), self._positions[resume_id])
+        else:
+            positions = scores.argmax(axis=1)
+        return positions, scores[np.arange(len(jd_vectors)), positions]
+
+    def select(self, jd_text: str, resume_id: int | None = None) -> tuple[dict, float] | None:
+        """
+        Return (resume snapshot, similarity) for the requested resume, or for the
+        resume most similar to the JD when resume_id is None. Returns None if
+        the requested resume does not exist.
+        """
+        if resume_id is not None and resume_id not in self._positions:
+            return None
+        scores = self.scores(jd_text)
+        position = self._positions[resume_id] if resume_id is not None else int(np.argmax(scores))
+        return self.resumes[position], round(float(scores[position]), 4)
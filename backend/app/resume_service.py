@@ -1,56 +1,238 @@
 from pathlib import Path
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
 from sqlmodel import Session, select
 from app.models import Resume
-import PyPDF2
+from app.resume_profile import build_profile, PROFILE_VERSION
+from app.resume_ranker import ResumeIndex, feature_vector, pack_vector, unpack_vector
+from app.metrics import timed
+import asyncio
 import io
+import json
+import os
+import tempfile
+import threading
+
+# Maximum resume PDF size (1 MB)
+MAX_RESUME_SIZE = 1 * 1024 * 1024
+# Number of processes extracting PDF pages
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "2"))
+UPLOAD_DIR = Path("uploads")
+# Maximum number of stored resumes
+MAX_RESUMES = int(os.getenv("MAX_RESUMES", "100"))
+
+_pdf_pool: ProcessPoolExecutor | None = None
+
+# In-memory index of the stored resumes (profiles and ranking matrix), so hot endpoints run no SQL.
+# Assumes a single server process; every change to the resume table reloads it after commit.
+_NOT_LOADED = object()
+_resumes = _NOT_LOADED
+_resumes_lock = threading.Lock()
+
+
+def _extract_pages(pdf_bytes: bytes, part: int, parts: int) -> list[str]:
+    """Extract the text of every parts-th page starting at page `part` (runs in a worker process)."""
+    import PyPDF2
+    pdf_reader = PyPDF2.PdfReader(io.BytesIO(pdf_bytes))
+    return [pdf_reader.pages[index].extract_text() for index in range(part, len(pdf_reader.pages), parts)]
 
 
 def extract_text_from_pdf(pdf_bytes: bytes) -> str:
     """Extract text from PDF bytes."""
     try:
-        pdf_file = io.BytesIO(pdf_bytes)
-        pdf_reader = PyPDF2.PdfReader(pdf_file)
-        text = ""
-        for page in pdf_reader.pages:
-            text += page.extract_text() + "\n"
-        return text.strip()
+        import PyPDF2
+        pdf_reader = PyPDF2.PdfReader(io.BytesIO(pdf_bytes))
+        return "\n".join(page.extract_text() for page in pdf_reader.pages).strip()
+    except Exception as e:
+        raise ValueError(f"Failed to extract text from PDF: {str(e)}")
+
+
+def _get_pdf_pool() -> ProcessPoolExecutor:
+    global _pdf_pool
+    if _pdf_pool is None:
+        _pdf_pool = ProcessPoolExecutor(max_workers=PDF_WORKERS)
+    return _pdf_pool
+
+
+async def extract_text_from_pdf_async(pdf_bytes: bytes) -> str:
+    """
+    Extract text from PDF bytes in the worker pool, splitting the pages across
+    workers. The PDF is only parsed in the workers, never on the event loop.
+    """
+    try:
+        loop = asyncio.get_running_loop()
+        # Worker i takes pages i, i + PDF_WORKERS, ..., so no page count is needed up front
+        parts = await asyncio.gather(*[
+            loop.run_in_executor(_get_pdf_pool(), _extract_pages, pdf_bytes, part, PDF_WORKERS)
+            for part in range(PDF_WORKERS)
+        ])
+        page_count = sum(len(texts) for texts in parts)
+        pages = [parts[index % PDF_WORKERS][index // PDF_WORKERS] for index in range(page_count)]
+        return "\n".join(pages).strip()
     except Exception as e:
         raise ValueError(f"Failed to extract text from PDF: {str(e)}")
 
 
-def save_resume(session: Session, pdf_bytes: bytes, filename: str) -> Resume:
-    """Save or replace resume in database."""
-    # Extract text
-    extracted_text = extract_text_from_pdf(pdf_bytes)
+def shutdown_pdf_pool():
+    """Stop the PDF extraction worker processes."""
+    global _pdf_pool
+    if _pdf_pool is not None:
+        _pdf_pool.shutdown(wait=False, cancel_futures=True)
+        _pdf_pool = None
+
+
+def _write_file_atomic(path: Path, data: bytes):
+    """Write data to a temporary file and move it into place, so readers never see a partial file."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as tmp_file:
+            tmp_file.write(data)
+            tmp_file.flush()
+            os.fsync(tmp_file.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
+
+
+def _remove_upload(path: Path):
+    path.unlink(missing_ok=True)
+    if path.parent != UPLOAD_DIR and path.parent.exists() and not any(path.parent.iterdir()):
+        path.parent.rmdir()
+
+
+async def save_resume(session: Session, pdf_bytes: bytes, filename: str, file_hash: str) -> Resume:
+    """
+    Store a resume. A file with the same name as a stored resume replaces it
+    (keeping its id); an identical re-upload is returned unchanged.
+    """
+    stored = session.exec(select(Resume)).all()
+    for existing in stored:
+        if existing.file_hash == file_hash and Path(existing.file_path).exists():
+            return existing
+    old_resume = next((existing for existing in stored if Path(existing.file_path).name == Path(filename).name), None)
+    if old_resume is None and len(stored) >= MAX_RESUMES:
+        raise ValueError(f"At most {MAX_RESUMES} resumes can be stored. Delete one before uploading another.")
+    
+    # Extract text and build the profile and ranking vector used by every analysis
+    with timed("pdf_extraction"):
+        extracted_text = await extract_text_from_pdf_async(pdf_bytes)
+    with timed("resume_profile"):
+        profile = build_profile(extracted_text)
+        vector = pack_vector(feature_vector(extracted_text, profile["skills"]))
     
-    # Save file
-    upload_dir = Path("uploads")
-    upload_dir.mkdir(exist_ok=True)
-    file_path = upload_dir / filename
-    file_path.write_bytes(pdf_bytes)
+    # Files live in a per-content directory, so the new file never overwrites the one
+    # a stored row points to; the row switches over in a single commit
+    file_path = UPLOAD_DIR / file_hash[:16] / Path(filename).name
+    _write_file_atomic(file_path, pdf_bytes)
+    old_file_path = Path(old_resume.file_path) if old_resume else None
     
-    # Delete old resume if exists
-    old_resume = session.exec(select(Resume)).first()
-    if old_resume:
-        old_file = Path(old_resume.file_path)
-        if old_file.exists():
-            old_file.unlink()
-        session.delete(old_resume)
+    try:
+        resume = old_resume or Resume(file_path=str(file_path), extracted_text=extracted_text)
+        resume.file_path = str(file_path)
+        resume.file_hash = file_hash
+        resume.extracted_text = extracted_text
+        resume.text_hash = profile["text_hash"]
+        resume.token_count = profile["token_count"]
+        resume.profile_json = json.dumps(profile)
+        resume.feature_vector = vector
+        resume.updated_at = datetime.utcnow()
+        session.add(resume)
         session.commit()
+    except Exception:
+        session.rollback()
+        invalidate_resumes()
+        if old_file_path != file_path:
+            _remove_upload(file_path)
+        raise
     
-    # Create new resume record
-    resume = Resume(
-        file_path=str(file_path),
-        extracted_text=extracted_text,
-        updated_at=datetime.utcnow()
-    )
-    session.add(resume)
-    session.commit()
+    # Cached analyses of a replaced resume are keyed on its old text hash, so they are never served again
+    if old_file_path and old_file_path != file_path:
+        _remove_upload(old_file_path)
     session.refresh(resume)
+    _set_resumes(_load_resumes(session))
     return resume
 
 
-def get_resume(session: Session) -> Resume | None:
-    """Get the current resume."""
-    return session.exec(select(Resume)).first()
+def delete_resume(session: Session, resume_id: int) -> bool:
+    """Delete a stored resume and its file; returns False if it does not exist."""
+    resume = session.get(Resume, resume_id)
+    if resume is None:
+        return False
+    file_path = Path(resume.file_path)
+    session.delete(resume)
+    session.commit()
+    _remove_upload(file_path)
+    _set_resumes(_load_resumes(session))
+    return True
+
+
+def get_resume_profile(session: Session, resume: Resume) -> dict:
+    """Get the resume profile, building it for resumes stored before profiles existed."""
+    if resume.profile_json:
+        profile = json.loads(resume.profile_json)
+        if profile.get("version") == PROFILE_VERSION:
+            return profile
+    
+    profile = build_profile(resume.extracted_text)
+    resume.text_hash = profile["text_hash"]
+    resume.token_count = profile["token_count"]
+    resume.profile_json = json.dumps(profile)
+    resume.feature_vector = None
+    session.add(resume)
+    session.commit()
+    return profile
+
+
+def _snapshot(resume: Resume, profile: dict) -> dict:
+    return {
+        "id": resume.id,
+        "filename": Path(resume.file_path).name,
+        "updated_at": resume.updated_at,
+        "etag": f'"{(resume.file_hash or resume.text_hash or "")[:16]}-{int(resume.updated_at.timestamp() * 1_000_000)}"',
+        "profile": profile
+    }
+
+
+def _load_resumes(session: Session) -> ResumeIndex:
+    """Build the resume index, computing vectors for resumes stored before they existed."""
+    snapshots = []
+    vectors = []
+    for resume in session.exec(select(Resume).order_by(Resume.id)).all():
+        profile = get_resume_profile(session, resume)
+        if resume.feature_vector is None:
+            vector = feature_vector(resume.extracted_text, profile["skills"])
+            resume.feature_vector = pack_vector(vector)
+            session.add(resume)
+            session.commit()
+        else:
+            vector = unpack_vector(resume.feature_vector)
+        snapshots.append(_snapshot(resume, profile))
+        vectors.append(vector)
+    return ResumeIndex(snapshots, vectors)
+
+
+def _set_resumes(index):
+    global _resumes
+    with _resumes_lock:
+        _resumes = index
+
+
+def get_resumes(session: Session) -> ResumeIndex:
+    """
+    Get the index of stored resumes (each a snapshot {id, filename, updated_at,
+    etag, profile}), loading it from the database only on first use.
+    """
+    index = _resumes
+    if index is not _NOT_LOADED:
+        return index
+    
+    index = _load_resumes(session)
+    _set_resumes(index)
+    return index
+
+
+def invalidate_resumes():
+    """Drop the index so the next request reloads the resumes from the database."""
+    _set_resumes(_NOT_LOADED)
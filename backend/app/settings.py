@@ -0,0 +1,31 @@
+import os
+import time
+from dotenv import load_dotenv
+
+# When the app started importing (main.py imports this module first), for the startup metrics
+IMPORT_STARTED = time.perf_counter()
+
+# Fill os.environ from .env once, before any module reads its settings
+load_dotenv()
+
+
+class Settings:
+    """Settings shared by every module, read from the environment once on first use."""
+
+    def __init__(self):
+        self.openai_api_key = os.getenv("OPENAI_API_KEY")
+        # Alternative OpenAI-compatible endpoint (e.g. the benchmark stub); the SDK default otherwise
+        self.openai_base_url = os.getenv("OPENAI_BASE_URL") or None
+        # Start the background warm-up after startup (see app/warmup.py)
+        self.warmup = os.getenv("WARMUP", "false").lower() in ("1", "true", "yes")
+
+
+_settings: Settings | None = None
+
+
+def get_settings() -> Settings:
+    """Get the shared settings, reading them on first use."""
+    global _settings
+    if _settings is None:
+        _settings = Settings()
+    return _settings
@@ -0,0 +1,40 @@
+import asyncio
+from app.metrics import CACHE_EVENTS
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key: the first caller starts the
+    work in its own task and later callers await the same task. The task is
+    shielded, so it finishes (and can store its result) even if every caller
+    goes away.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._tasks: dict[str, asyncio.Task] = {}
+        self._stats = {"leaders": 0, "coalesced": 0}
+
+    async def run(self, key: str, factory):
+        """Return the result of factory() (a coroutine function), shared with concurrent callers of key."""
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.create_task(factory())
+            self._tasks[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+            event = "leaders"
+        else:
+            event = "coalesced"
+        self._stats[event] += 1
+        CACHE_EVENTS.inc(cache=self.name, event=event)
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        if not task.cancelled():
+            # Mark the exception as retrieved when every caller has gone away
+            task.exception()
+
+    def get_stats(self) -> dict:
+        return {**self._stats, "in_flight": len(self._tasks)}
@@ -0,0 +1,162 @@
+from app.aho_corasick import AhoCorasick
+
+# Canonical skill name -> lowercase aliases found in resumes and JDs
+SKILL_ALIASES = {
+    # Languages
+    "Python": ["python", "python3"],
+    "Java": ["java"],
+    "JavaScript": ["javascript", "js", "ecmascript", "es6"],
+    "TypeScript": ["typescript"],
+    "Go": ["golang", "go lang", "go language"],
+    "Rust": ["rust"],
+    "C": ["c language", "ansi c"],
+    "C++": ["c++", "cpp"],
+    "C#": ["c#", "csharp"],
+    "Ruby": ["ruby"],
+    "PHP": ["php"],
+    "Kotlin": ["kotlin"],
+    "Swift": ["swiftui", "swift language", "swift programming"],
+    "Scala": ["scala"],
+    "R": ["r language", "rstudio"],
+    "SQL": ["sql"],
+    "Bash": ["bash", "shell scripting"],
+    "Dart": ["dart language", "dartlang", "dart/flutter", "flutter/dart"],
+    # Frontend
+    "React": ["react", "reactjs", "react.js"],
+    "Angular": ["angular", "angularjs"],
+    "Vue.js": ["vue", "vuejs", "vue.js"],
+    "Next.js": ["next.js", "nextjs"],
+    "Redux": ["redux"],
+    "HTML": ["html", "html5"],
+    "CSS": ["css", "css3"],
+    "Tailwind CSS": ["tailwind", "tailwindcss", "tailwind css"],
+    "Flutter": ["flutter"],
+    "React Native": ["react native"],
+    # Backend
+    "Node.js": ["nodejs", "node.js", "node js"],
+    "Express": ["expressjs", "express.js"],
+    "Django": ["django"],
+    "Flask": ["flask"],
+    "FastAPI": ["fastapi"],
+    "Spring Boot": ["spring boot", "springboot"],
+    "Spring": ["spring framework", "spring mvc"],
+    ".NET": [".net", "dotnet", "asp.net"],
+    "Ruby on Rails": ["ruby on rails", "rails framework"],
+    "Laravel": ["laravel"],
+    "GraphQL": ["graphql"],
+    "REST APIs": ["restful", "rest api", "rest apis"],
+    "gRPC": ["grpc"],
+    "Microservices": ["microservices", "microservice"],
+    # Data stores
+    "PostgreSQL": ["postgresql", "postgres", "psql"],
+    "MySQL": ["mysql"],
+    "SQLite": ["sqlite"],
+    "MongoDB": ["mongodb", "mongo db"],
+    "Redis": ["redis"],
+    "Elasticsearch": ["elasticsearch", "elastic search"],
+    "Cassandra": ["cassandra"],
+    "DynamoDB": ["dynamodb"],
+    "Oracle Database": ["oracle db", "oracle database"],
+    "Snowflake": ["snowflake"],
+    # Messaging and data processing
+    "Kafka": ["kafka", "apache kafka"],
+    "RabbitMQ": ["rabbitmq"],
+    "Spark": ["pyspark", "apache spark", "spark sql", "spark streaming"],
+    "Hadoop": ["hadoop"],
+    "Airflow": ["airflow", "apache airflow"],
+    "dbt": ["dbt"],
+    "ETL": ["etl"],
+    # Cloud and infrastructure
+    "AWS": ["aws", "amazon web services"],
+    "Azure": ["azure"],
+    "GCP": ["gcp", "google cloud"],
+    "Docker": ["docker"],
+    "Kubernetes": ["kubernetes", "k8s"],
+    "Terraform": ["terraform"],
+    "Ansible": ["ansible"],
+    "Linux": ["linux"],
+    "CI/CD": ["ci/cd", "ci cd", "continuous integration", "continuous delivery"],
+    "Jenkins": ["jenkins"],
+    "GitHub Actions": ["github actions"],
+    "Git": ["git"],
+    "Nginx": ["nginx"],
+    "Prometheus": ["prometheus"],
+    "Grafana": ["grafana"],
+    # Data science and ML
+    "Machine Learning": ["machine learning", "ml models", "ml engineer", "ml engineering", "ml pipelines"],
+    "Deep Learning": ["deep learning"],
+    "NLP": ["nlp", "natural language processing"],
+    "Computer Vision": ["computer vision"],
+    "LLMs": ["llm", "llms", "large language models"],
+    "TensorFlow": ["tensorflow"],
+    "PyTorch": ["pytorch"],
+    "scikit-learn": ["scikit-learn", "sklearn"],
+    "Pandas": ["pandas"],
+    "NumPy": ["numpy"],
+    "Tableau": ["tableau"],
+    "Power BI": ["power bi", "powerbi"],
+    "Excel": ["microsoft excel", "ms excel"],
+    # Testing and practices
+    "Unit Testing": ["unit testing", "unit tests"],
+    "Pytest": ["pytest"],
+    "Jest": ["jest"],
+    "Selenium": ["selenium"],
+    "Cypress": ["cypress"],
+    "Agile": ["agile", "scrum"],
+    "System Design": ["system design"],
+    "Data Structures": ["data structures"],
+    # Design and product
+    "Figma": ["figma"],
+    "Jira": ["jira"],
+}
+
+# Canonical names are matched too, except where they are ordinary words
+# ("Excel", "Express", "Go", "Spring", "Swift", "Spark", "Dart") or single letters
+# ("C", "R"); those rely on their aliases. Aliases are never ordinary words ("node", "ml")
+_AMBIGUOUS_NAMES = {"c", "r", "excel", "express", "go", "spring", "swift", "spark", "dart"}
+# Aliases that are also file-style suffixes ("node.js"), so a "." before them is no boundary
+_SUFFIX_ALIASES = {"js"}
+_PATTERNS = {
+    alias: skill
+    for skill, aliases in SKILL_ALIASES.items()
+    for alias in [skill.lower(), *aliases]
+    if alias not in _AMBIGUOUS_NAMES
+}
+
+_matcher = AhoCorasick(_PATTERNS)
+
+
+def _is_boundary(text: str, index: int) -> bool:
+    return index < 0 or index >= len(text) or not text[index].isalnum()
+
+
+def extract_skills(text: str) -> frozenset[str]:
+    """Extract canonical skill names from text in a single pass."""
+    text_lower = text.lower()
+    return frozenset(
+        skill
+        for start, end, skill in _matcher.find_all(text_lower)
+        if _is_boundary(text_lower, start - 1) and _is_boundary(text_lower, end)
+        and not (start > 0 and text_lower[start - 1] == "." and text_lower[start:end] in _SUFFIX_ALIASES)
+    )
+
+
+def score_skills(resume_skills: frozenset[str], jd_text: str) -> dict:
+    """Compute a deterministic skill-overlap match score and missing skills."""
+    jd_skills = extract_skills(jd_text)
+    matched = sorted(jd_skills & resume_skills)
+    missing = sorted(jd_skills - resume_skills)
+
+    warnings = []
+    if jd_skills:
+        match_score = round(100 * len(matched) / len(jd_skills))
+    else:
+        match_score = 0
+        warnings.append("No known skills were found in the job description.")
+
+    return {
+        "match_score": match_score,
+        "missing_skills": missing,
+        "matched_skills": matched,
+        "warnings": warnings
+    }
@@ -0,0 +1,176 @@
+import json
+
+
+class JSONStreamParser:
+    """
+    Incrementally parse a streamed JSON object.
+
+    feed() returns events as soon as they are known:
+    - ("field", key, value) when a top-level value is complete
+    - ("delta", key, text) with new text of a string value listed in stream_keys
+    """
+
+    def __init__(self, stream_keys: tuple[str, ...] = ()):
+        self.stream_keys = set(stream_keys)
+        self._buf = ""
+        self._pos = 0
+        self._state = "start"
+        self._key = None
+        self._token_start = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._emitted = 0
+        self._raw_emitted = 0
+
+    def feed(self, chunk: str) -> list[tuple]:
+        self._buf += chunk
+        events = []
+        while self._pos < len(self._buf):
+            if not self._step(events):
+                break
+        if self._state == "string_value" and self._key in self.stream_keys:
+            self._emit_partial(events)
+        return events
+
+    def _step(self, events: list) -> bool:
+        """Advance the scanner; return False when more input is needed."""
+        buf = self._buf
+        char = buf[self._pos]
+
+        if self._state == "start":
+            # Skip anything before the object (e.g. a stray markdown fence)
+            if char == "{":
+                self._state = "key_or_end"
+            self._pos += 1
+        elif self._state == "key_or_end":
+            if char == '"':
+                self._token_start = self._pos
+                self._state = "key"
+            elif char == "}":
+                self._state = "done"
+            self._pos += 1
+        elif self._state == "key":
+            end = self._find_string_end()
+            if end is None:
+                return False
+            self._key = json.loads(buf[self._token_start:end + 1])
+            self._pos = end + 1
+            self._state = "colon"
+        elif self._state == "colon":
+            if char == ":":
+                self._state = "value"
+            self._pos += 1
+        elif self._state == "value":
+            if char.isspace():
+                self._pos += 1
+            else:
+                self._token_start = self._pos
+                self._pos += 1
+                if char == '"':
+                    self._state = "string_value"
+                    self._emitted = 0
+                    self._raw_emitted = 0
+                elif char in "{[":
+                    self._state = "nested_value"
+                    self._depth = 1
+                    self._in_string = False
+                    self._escaped = False
+                else:
+                    self._state = "scalar_value"
+        elif self._state == "string_value":
+            end = self._find_string_end()
+            if end is None:
+                return False
+            self._pos = end + 1
+            self._finish_value(events, buf[self._token_start:self._pos])
+        elif self._state == "nested_value":
+            self._scan_nested(events)
+        elif self._state == "scalar_value":
+            if char in ",}" or char.isspace():
+                self._finish_value(events, buf[self._token_start:self._pos])
+            else:
+                self._pos += 1
+        else:
+            # Done: ignore trailing text
+            self._pos = len(buf)
+        return True
+
+    def _find_string_end(self) -> int | None:
+        """Return the index of the closing quote of the string being scanned."""
+        buf = self._buf
+        i = self._pos
+        while i < len(buf):
+            char = buf[i]
+            if char == "\\":
+                if i + 1 >= len(buf):
+                    break
+                i += 2
+                continue
+            if char == '"':
+                return i
+            i += 1
+        # Resume here on the next feed (never in the middle of an escape)
+        self._pos = i
+        return None
+
+    def _scan_nested(self, events: list):
+        buf = self._buf
+        while self._pos < len(buf):
+            char = buf[self._pos]
+            self._pos += 1
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._finish_value(events, buf[self._token_start:self._pos])
+                    return
+
+    def _finish_value(self, events: list, raw: str):
+        value = json.loads(raw)
+        if self._key in self.stream_keys and isinstance(value, str):
+            if len(value) > self._emitted:
+                events.append(("delta", self._key, value[self._emitted:]))
+        events.append(("field", self._key, value))
+        self._state = "key_or_end"
+        self._key = None
+
+    def _emit_partial(self, events: list):
+        # Decode only the raw text scanned since the last delta; _pos never
+        # stops inside a two-character escape
+        start = self._token_start + 1 + self._raw_emitted
+        raw = self._buf[start:self._pos]
+        # Hold back a \uXXXX escape that has not fully arrived yet
+        escape_at = raw.rfind("\\u", max(0, len(raw) - 5))
+        if escape_at != -1 and len(raw) - escape_at < 6 and _is_escape_start(raw, escape_at):
+            raw = raw[:escape_at]
+        try:
+            text = json.loads('"' + raw + '"')
+        except json.JSONDecodeError:
+            return
+        # Hold back the first half of a surrogate pair until the second arrives
+        if text and "\ud800" <= text[-1] <= "\udbff":
+            raw = raw[:-6]
+            text = text[:-1]
+        if text:
+            events.append(("delta", self._key, text))
+            self._emitted += len(text)
+            self._raw_emitted += len(raw)
+
+
+def _is_escape_start(raw: str, index: int) -> bool:
+    """Check that the backslash at index is not itself escaped."""
+    backslashes = 0
+    while index - backslashes - 1 >= 0 and raw[index - backslashes - 1] == "\\":
+        backslashes += 1
+    return backslashes % 2 == 0
@@ -0,0 +1,48 @@
+from functools import lru_cache
+
+try:
+    import tiktoken
+    TOKENIZER_AVAILABLE = True
+except ImportError:
+    TOKENIZER_AVAILABLE = False
+
+# Encoding used by gpt-4o-mini
+ENCODING_NAME = "o200k_base"
+# Rough characters-per-token ratio for English text, used without tiktoken
+CHARS_PER_TOKEN = 4
+
+
+@lru_cache(maxsize=1)
+def _get_encoding():
+    """Load the tokenizer once; None if tiktoken or its encoding file is unavailable."""
+    if not TOKENIZER_AVAILABLE:
+        return None
+    try:
+        return tiktoken.get_encoding(ENCODING_NAME)
+    except Exception:
+        # The encoding file is downloaded on first use and may be unreachable
+        return None
+
+
+def encode(text: str) -> list[int] | None:
+    """Tokenize text, or None if no tokenizer is available."""
+    encoding = _get_encoding()
+    if encoding is None:
+        return None
+    return encoding.encode(text, disallowed_special=())
+
+
+def count_tokens(text: str) -> int:
+    """Count prompt tokens (estimated from length if tiktoken is unavailable)."""
+    tokens = encode(text)
+    if tokens is None:
+        return -(-len(text) // CHARS_PER_TOKEN)
+    return len(tokens)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text to at most max_tokens tokens."""
+    encoding = _get_encoding()
+    if encoding is None:
+        return text[:max_tokens * CHARS_PER_TOKEN]
+    return encoding.decode(encoding.encode(text, disallowed_special=())[:max_tokens])
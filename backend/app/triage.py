@@ -0,0 +1,212 @@
+"""
+Bulk job-feed triage: rank a large feed of JDs against the stored resumes
+locally and send only the top K to the full LLM analysis.
+
+    python -m app.triage jobs.jsonl --top-k 20 --output ranked.jsonl
+"""
+import argparse
+import asyncio
+import csv
+import hashlib
+import heapq
+import io
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Iterable, Iterator, TextIO
+from sqlmodel import Session
+from app.db import engine, init_db
+from app.jd_service import process_jd_text
+from app.jd_validator import check_jd_heuristics
+from app.resume_ranker import ResumeIndex, jd_vector
+from app.resume_service import get_resumes
+from app.analysis_service import analyze_batch
+from app.jd_similarity import load_similarity_index
+from app.skill_matcher import score_skills
+from app.llm_client import close_async_client
+
+# Number of top-ranked JDs sent to the LLM by default, and the most a request may ask for
+TRIAGE_TOP_K = int(os.getenv("TRIAGE_TOP_K", "20"))
+TRIAGE_MAX_TOP_K = 100
+# Maximum number of LLM analyses running at once
+TRIAGE_MAX_CONCURRENCY = int(os.getenv("TRIAGE_MAX_CONCURRENCY", "4"))
+# JDs vectorized and scored per sparse matrix product
+TRIAGE_CHUNK_SIZE = 512
+
+# Feed fields holding the JD text (first one present wins) and metadata copied to the output
+TEXT_FIELDS = ("description", "jd_text", "job_description", "text", "body", "content")
+META_FIELDS = ("id", "title", "company", "location", "url")
+
+
+def read_feed(stream: TextIO, feed_format: str) -> Iterator[dict]:
+    """
+    Yield {"index", "text", **metadata} for each posting in a JSONL or CSV feed,
+    one at a time. Postings without a recognizable text field get an empty text.
+    """
+    if feed_format == "csv":
+        records = csv.DictReader(stream)
+    elif feed_format == "jsonl":
+        records = (json.loads(line) for line in stream if line.strip())
+    else:
+        raise ValueError("Feed format must be 'jsonl' or 'csv'")
+
+    try:
+        for index, record in enumerate(records):
+            if not isinstance(record, dict):
+                raise ValueError(f"Feed record {index} is not an object")
+            text = next((record[field] for field in TEXT_FIELDS if record.get(field)), "")
+            item = {"index": index, "text": process_jd_text(str(text))}
+            item.update((field, record[field]) for field in META_FIELDS if record.get(field) not in (None, ""))
+            yield item
+    except csv.Error as e:
+        raise ValueError(f"Invalid CSV feed: {str(e)}")
+
+
+def feed_format_for(filename: str) -> str:
+    """Guess the feed format from the file name (CSV, otherwise JSONL)."""
+    return "csv" if filename.lower().endswith(".csv") else "jsonl"
+
+
+def open_uploaded_feed(raw: io.IOBase) -> TextIO:
+    """Wrap an uploaded binary feed file for streaming text reads."""
+    return io.TextIOWrapper(raw, encoding="utf-8", newline="")
+
+
+def _chunks(items: Iterable[dict], size: int) -> Iterator[list[dict]]:
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def rank_feed(items: Iterable[dict], resumes: ResumeIndex, top_k: int, resume_id: int | None = None) -> tuple[list[dict], dict]:
+    """
+    Drop postings that fail the JD heuristics, score the rest against the resumes
+    chunk by chunk, and keep only the top_k most similar in a heap, so memory
+    stays constant however long the feed is. Exact duplicates are kept once.
+    Returns (top items, best first, with "similarity" and "resume_position"; counters).
+    """
+    stats = {"total": 0, "invalid": 0, "duplicates": 0}
+    # Min-heap of (similarity, -index, text hash, item); the root is the weakest kept item
+    heap = []
+    kept_hashes = set()
+
+    def valid(chunk_items):
+        for item in chunk_items:
+            stats["total"] += 1
+            if check_jd_heuristics(item["text"])[0]:
+                yield item
+            else:
+                stats["invalid"] += 1
+
+    for chunk in _chunks(valid(items), TRIAGE_CHUNK_SIZE):
+        positions, similarities = resumes.best_matches([jd_vector(item["text"]) for item in chunk], resume_id)
+        for item, position, similarity in zip(chunk, positions.tolist(), similarities.tolist()):
+            entry = (similarity, -item["index"])
+            if len(heap) == top_k and entry <= heap[0][:2]:
+                continue
+            text_hash = hashlib.sha256(item["text"].encode("utf-8")).digest()
+            if text_hash in kept_hashes:
+                stats["duplicates"] += 1
+                continue
+            item["similarity"] = round(similarity, 4)
+            item["resume_position"] = position
+            if len(heap) < top_k:
+                heapq.heappush(heap, (*entry, text_hash, item))
+            else:
+                kept_hashes.discard(heapq.heapreplace(heap, (*entry, text_hash, item))[2])
+            kept_hashes.add(text_hash)
+
+    stats["scored"] = stats["total"] - stats["invalid"]
+    return [entry[3] for entry in sorted(heap, reverse=True)], stats
+
+
+async def triage_feed(items: Iterable[dict], resumes: ResumeIndex, top_k: int = TRIAGE_TOP_K,
+                      resume_id: int | None = None, analyze: bool = True) -> dict:
+    """
+    Rank a feed locally, then run the full analysis on the top_k postings, at most
+    TRIAGE_MAX_CONCURRENCY at a time. Returns {"summary", "results"}, with results
+    ordered by LLM match score (then similarity) when analyzed, else by similarity.
+    """
+    started = time.perf_counter()
+    # Scoring is CPU-bound; keep it off the event loop
+    top, summary = await asyncio.to_thread(rank_feed, items, resumes, top_k, resume_id)
+    summary["ranking_seconds"] = round(time.perf_counter() - started, 3)
+
+    results = []
+    for rank, item in enumerate(top):
+        resume = resumes.resumes[item.pop("resume_position")]
+        local = score_skills(frozenset(resume["profile"]["skills"]), item["text"])
+        results.append({
+            **{field: item[field] for field in ("index", *META_FIELDS) if field in item},
+            "local_rank": rank + 1,
+            "similarity": item["similarity"],
+            "skill_score": local["match_score"],
+            "resume": {"id": resume["id"], "filename": resume["filename"]}
+        })
+
+    summary["analyzed"] = 0
+    summary["failed"] = 0
+    if analyze and top:
+        # Without resume_id the batch picks the best-matching resume again, i.e. the one ranked here
+        batch = [{"index": position, "source": "text", "content": item["text"]} for position, item in enumerate(top)]
+        async for outcome in analyze_batch(resumes, batch, resume_id, TRIAGE_MAX_CONCURRENCY):
+            result = results[outcome["index"]]
+            if outcome["status"] == 200:
+                result["analysis"] = outcome["result"]
+                summary["analyzed"] += 1
+            else:
+                result["error"] = {"status": outcome["status"], "detail": outcome["detail"]}
+                summary["failed"] += 1
+        results.sort(key=lambda result: (-result.get("analysis", {}).get("match_score", -1), result["local_rank"]))
+
+    summary["seconds"] = round(time.perf_counter() - started, 3)
+    return {"summary": summary, "results": results}
+
+
+async def _run_cli(args) -> dict:
+    init_db()
+    with Session(engine) as session:
+        resumes = get_resumes(session)
+        load_similarity_index(session)
+    if not len(resumes):
+        raise SystemExit("No resume uploaded. Please upload a resume first.")
+    if args.resume_id is not None and resumes.get(args.resume_id) is None:
+        raise SystemExit(f"Resume {args.resume_id} not found")
+
+    feed_format = args.format or feed_format_for(args.feed)
+    try:
+        with open(args.feed, encoding="utf-8", newline="") as stream:
+            return await triage_feed(read_feed(stream, feed_format), resumes, args.top_k, args.resume_id, not args.no_llm)
+    finally:
+        await close_async_client()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("feed", help="JSONL or CSV file of job postings")
+    parser.add_argument("--format", choices=("jsonl", "csv"), help="feed format (default: from the file extension)")
+    parser.add_argument("--top-k", type=int, default=TRIAGE_TOP_K, help="postings sent to the LLM analysis")
+    parser.add_argument("--resume-id", type=int, help="rank against this resume instead of the best match per JD")
+    parser.add_argument("--no-llm", action="store_true", help="only rank locally")
+    parser.add_argument("--output", default="triage.jsonl", help="ranked output, one JSON line per posting")
+    args = parser.parse_args()
+    if args.top_k < 1:
+        parser.error("--top-k must be at least 1")
+
+    report = asyncio.run(_run_cli(args))
+    with open(args.output, "w", encoding="utf-8") as output:
+        for result in report["results"]:
+            output.write(json.dumps(result) + "\n")
+    json.dump(report["summary"], sys.stdout)
+    print(f"\nWrote {len(report['results'])} ranked postings to {Path(args.output)}")
+
+
+if __name__ == "__main__":
+    main()
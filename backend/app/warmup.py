@@ -0,0 +1,64 @@
+"""
+Optional warm-up (WARMUP=true): right after startup, load in the background
+what the first requests would otherwise wait for, without delaying /health.
+"""
+import asyncio
+import importlib
+import time
+from sqlmodel import Session
+from app.db import engine
+from app.metrics import timed, STARTUP_SECONDS
+from app.llm_client import warm_up_client
+from app.jd_service import probe_tesseract
+from app.resume_service import get_resumes
+from app.tokens import count_tokens
+
+# Modules imported on first use; importing them here also shares them with the forked OCR and PDF workers
+DEFERRED_MODULES = ("openai", "httpx", "scipy.sparse", "PyPDF2", "PIL.Image", "pytesseract")
+
+_task: asyncio.Task | None = None
+
+
+def _import_deferred_modules():
+    for name in DEFERRED_MODULES:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            pass
+
+
+def _load_resumes():
+    with Session(engine) as session:
+        get_resumes(session)
+
+
+async def warm_up():
+    """Import the deferred modules, load the tokenizer and the resumes, locate tesseract and connect to OpenAI."""
+    started = time.perf_counter()
+    steps = (
+        ("warmup_imports", lambda: asyncio.to_thread(_import_deferred_modules)),
+        ("warmup_tokenizer", lambda: asyncio.to_thread(count_tokens, "warm up")),
+        ("warmup_resumes", lambda: asyncio.to_thread(_load_resumes)),
+        ("warmup_tesseract", lambda: asyncio.to_thread(probe_tesseract)),
+        ("warmup_llm", warm_up_client)
+    )
+    for stage, step in steps:
+        try:
+            with timed(stage):
+                await step()
+        except Exception:
+            # Counted in stage_errors_total; the request that needs it sets it up on first use instead
+            pass
+    STARTUP_SECONDS.set(time.perf_counter() - started, phase="warmup")
+
+
+def start_warm_up():
+    """Run warm_up() in the background; called from the startup handler."""
+    global _task
+    _task = asyncio.create_task(warm_up())
+
+
+def stop_warm_up():
+    """Cancel the warm-up if it is still running at shutdown."""
+    if _task is not None and not _task.done():
+        _task.cancel()
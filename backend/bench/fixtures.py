@@ -0,0 +1,117 @@
+"""Synthetic resumes, job descriptions and JD screenshots for the benchmarks."""
+import io
+import random
+
+SKILLS = [
+    "Python", "Go", "Java", "TypeScript", "Rust", "Kotlin", "SQL", "PostgreSQL", "MySQL", "Redis",
+    "Kafka", "RabbitMQ", "Docker", "Kubernetes", "Terraform", "AWS", "GCP", "Azure", "React",
+    "Django", "FastAPI", "Flask", "Spring Boot", "GraphQL", "gRPC", "Airflow", "Spark", "Snowflake",
+    "Elasticsearch", "Jenkins", "Linux", "Pandas", "PyTorch", "TensorFlow", "Node.js", "MongoDB"
+]
+ROLES = ["Backend Engineer", "Data Engineer", "Platform Engineer", "Software Engineer", "ML Engineer", "Full Stack Developer"]
+LEVELS = ["Junior", "", "Senior", "Lead", "Staff"]
+VERBS = ["Design", "Build", "Own", "Scale", "Maintain", "Improve", "Operate", "Migrate", "Automate", "Monitor"]
+OBJECTS = [
+    "event pipelines", "public APIs", "billing services", "search infrastructure", "data warehouses",
+    "deployment tooling", "recommendation models", "internal dashboards", "payment integrations",
+    "observability stacks", "batch jobs", "customer onboarding flows", "mobile backends", "reporting systems"
+]
+COMPANY_PARTS = ["Acme", "Nova", "Blue", "Peak", "Orbit", "Quant", "Leaf", "Iron", "Cloud", "Bright", "Delta", "Pixel"]
+CITIES = ["Pune", "Bangalore", "Berlin", "London", "Austin", "Toronto", "Remote"]
+
+
+def make_jd(rng: random.Random) -> str:
+    """Generate a plausible, unique job description (random enough to avoid near-duplicate matches)."""
+    company = rng.choice(COMPANY_PARTS) + rng.choice(COMPANY_PARTS).lower() + f" {rng.randint(10, 999)}"
+    role = f"{rng.choice(LEVELS)} {rng.choice(ROLES)}".strip()
+    skills = rng.sample(SKILLS, 8)
+    lines = [
+        f"{role} at {company}",
+        f"Location: {rng.choice(CITIES)}. Full-time position.",
+        f"{company} is hiring a {role} to join our {rng.choice(OBJECTS)} team.",
+        "Responsibilities:"
+    ]
+    for _ in range(rng.randint(4, 7)):
+        lines.append(f"- {rng.choice(VERBS)} {rng.choice(OBJECTS)} using {rng.choice(skills)} and {rng.choice(skills)}")
+    lines.append("Requirements:")
+    lines.append(f"- {rng.randint(1, 9)}+ years of experience with {skills[0]} and {skills[1]}")
+    for _ in range(rng.randint(3, 5)):
+        lines.append(f"- Hands-on skills in {rng.choice(skills)}, {rng.choice(skills)} or {rng.choice(skills)}")
+    lines.append(f"Qualifications: degree in computer science or {rng.randint(2, 6)} years of equivalent experience.")
+    lines.append(f"Apply with your resume to jobs+{rng.randint(1000, 99999)}@{company.split()[0].lower()}.example.com")
+    return "\n".join(lines)
+
+
+def make_resume_text(rng: random.Random) -> list[str]:
+    """Generate resume pages (a list of page texts)."""
+    skills = rng.sample(SKILLS, 12)
+    return [
+        "\n".join([
+            f"Candidate {rng.randint(1, 10_000)}",
+            "Pune, India | candidate@example.com",
+            "Summary",
+            f"Software engineer with {rng.randint(2, 8)} years of experience building backend systems.",
+            "Experience",
+            f"Backend Engineer, {rng.choice(COMPANY_PARTS)}soft  Jan 2020 - Present",
+            f"- Built {rng.choice(OBJECTS)} with {skills[0]} and {skills[1]}",
+            f"- Scaled {rng.choice(OBJECTS)} on {skills[2]}",
+            f"Software Engineer, {rng.choice(COMPANY_PARTS)}labs  Jun 2017 - Dec 2019",
+            f"- Maintained {rng.choice(OBJECTS)} using {skills[3]}",
+        ]),
+        "\n".join([
+            "Skills",
+            ", ".join(skills),
+            "Education",
+            "B.E. Computer Engineering, 2017",
+            "Projects",
+            f"- Open source {rng.choice(OBJECTS)} toolkit in {skills[4]}",
+        ])
+    ]
+
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(pages: list[str]) -> bytes:
+    """Write a minimal text PDF (Helvetica, one line per text row) without extra dependencies."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", "", "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in pages:
+        content = "".join(
+            f"BT /F1 11 Tf 50 {750 - 14 * index} Td ({_pdf_escape(line)}) Tj ET\n"
+            for index, line in enumerate(text.split("\n"))
+        )
+        objects.append(f"<< /Length {len(content)} >>\nstream\n{content}endstream")
+        objects.append(
+            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>"
+        )
+        kids.append(len(objects))
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(f'{kid} 0 R' for kid in kids)}] /Count {len(kids)} >>"
+
+    output = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(output))
+        output += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(output)
+    output += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    output += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode("latin-1")
+    output += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF".encode("latin-1")
+    return output
+
+
+def make_jd_image(text: str) -> bytes:
+    """Render JD text as a PNG screenshot."""
+    from PIL import Image, ImageDraw, ImageFont
+
+    font = ImageFont.load_default()
+    lines = text.split("\n")
+    image = Image.new("RGB", (1100, 30 + 22 * len(lines)), "white")
+    draw = ImageDraw.Draw(image)
+    for index, line in enumerate(lines):
+        draw.text((20, 15 + 22 * index), line, fill="black", font=font)
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG", dpi=(96, 96))
+    return buffer.getvalue()
@@ -0,0 +1,426 @@
+"""
+Offline benchmark for the backend.
+
+Starts the stub OpenAI server (bench/stub_openai.py) and the backend in a
+scratch directory, drives the endpoints at fixed concurrency levels and
+writes p50/p95/p99 latency, requests per second and peak RSS to JSON, along
+with the cold start (time from launching the server to its first /health). The
+results are compared against bench/baseline.json; a p95 that grows or a
+throughput that drops by more than the tolerance is reported as a regression.
+
+    python bench/run_bench.py                      # run and compare
+    python bench/run_bench.py --write-baseline     # run and store the baseline
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+
+from fixtures import make_jd, make_jd_image, make_pdf, make_resume_text
+
+BENCH_DIR = Path(__file__).resolve().parent
+BACKEND_DIR = BENCH_DIR.parent
+DEFAULT_BASELINE = BENCH_DIR / "baseline.json"
+
+# Concurrency levels per scenario; uploads replace a stored resume of the same name, so they run one at a time
+SCENARIOS = {
+    "upload": [1],
+    "analyze": [1, 4, 16],
+    "analyze_cached": [16],
+    "jobs": [16],
+    "ocr": [1, 4],
+    "ocr_cached": [4]
+}
+# Scenarios that need tesseract
+OCR_SCENARIOS = ("ocr", "ocr_cached")
+# Metrics compared against the baseline and whether a higher value is worse
+COMPARED = {"p95_ms": True, "rps": False}
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_healthy(url: str, process: subprocess.Popen, timeout: float = 30.0, poll: float = 0.1):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{url} exited with code {process.returncode} before becoming healthy")
+        try:
+            if httpx.get(url, timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(poll)
+    raise RuntimeError(f"{url} did not become healthy within {timeout:.0f}s")
+
+
+def _read_status_kib(pid: int, field: str) -> int:
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def _child_pids(pid: int) -> list[int]:
+    children = []
+    try:
+        for task in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{task}/children") as handle:
+                children.extend(int(child) for child in handle.read().split())
+    except OSError:
+        pass
+    return children
+
+
+def peak_rss_mb(pid: int) -> dict:
+    """Peak resident memory (VmHWM) of the server process and of its worker processes, in MiB."""
+    workers = [_read_status_kib(child, "VmHWM") for child in _child_pids(pid)]
+    return {
+        "server": round(_read_status_kib(pid, "VmHWM") / 1024, 1),
+        "workers": round(sum(workers) / 1024, 1),
+        "worker_count": len(workers)
+    }
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(fraction * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def summarize(latencies: list[float], errors: dict, elapsed: float, concurrency: int) -> dict:
+    total = len(latencies) + sum(errors.values())
+    summary = {
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": sum(errors.values()),
+        "error_statuses": errors,
+        "rps": round(total / elapsed, 2) if elapsed else 0.0
+    }
+    if latencies:
+        summary.update(
+            p50_ms=round(percentile(latencies, 0.50) * 1000, 1),
+            p95_ms=round(percentile(latencies, 0.95) * 1000, 1),
+            p99_ms=round(percentile(latencies, 0.99) * 1000, 1),
+            max_ms=round(max(latencies) * 1000, 1)
+        )
+    return summary
+
+
+async def drive(make_request, count: int, concurrency: int) -> dict:
+    """Send count requests with at most concurrency in flight; make_request(i) returns a response."""
+    latencies = []
+    # HTTP status (or "transport") -> count of failed requests
+    errors = {}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(index: int):
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                status = str((await make_request(index)).status_code)
+            except httpx.HTTPError:
+                status = "transport"
+            if status == "200":
+                latencies.append(time.perf_counter() - started)
+            else:
+                errors[status] = errors.get(status, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(index) for index in range(count)))
+    return summarize(latencies, errors, time.perf_counter() - started, concurrency)
+
+
+class Workload:
+    """Builds the requests for each scenario from seeded synthetic fixtures."""
+
+    def __init__(self, client: httpx.AsyncClient, seed: int):
+        self.client = client
+        self.rng = random.Random(seed)
+        self.cached_jd = make_jd(self.rng)
+        self.cached_image = None
+
+    async def upload(self, index: int) -> httpx.Response:
+        # New content under the same name, so every upload is extracted and replaces the stored resume
+        pdf = make_pdf(make_resume_text(self.rng))
+        return await self.client.post("/resume/upload", files={"file": ("resume.pdf", pdf, "application/pdf")})
+
+    async def analyze(self, index: int) -> httpx.Response:
+        return await self.client.post("/analyze-jd", data={"jd_text": make_jd(self.rng)})
+
+    async def analyze_cached(self, index: int) -> httpx.Response:
+        return await self.client.post("/analyze-jd", data={"jd_text": self.cached_jd})
+
+    async def jobs(self, index: int) -> httpx.Response:
+        # Queue the analysis, then long-poll until a worker has run it; the latency covers both
+        response = await self.client.post("/jobs", data={"jd_text": make_jd(self.rng)})
+        if response.status_code != 202:
+            return response
+        job_url = response.headers["location"]
+        while True:
+            response = await self.client.get(job_url, params={"wait": 30})
+            if response.status_code != 200:
+                return response
+            job = response.json()
+            if job["status"] == "done":
+                return response
+            if job["status"] == "failed":
+                return httpx.Response(job["error"]["status"])
+
+    async def ocr(self, index: int) -> httpx.Response:
+        image = await asyncio.to_thread(make_jd_image, make_jd(self.rng))
+        return await self.client.post("/analyze-jd", files={"jd_image": ("jd.png", image, "image/png")})
+
+    async def ocr_cached(self, index: int) -> httpx.Response:
+        # The same screenshot every time, so only the first request runs OCR
+        if self.cached_image is None:
+            self.cached_image = await asyncio.to_thread(make_jd_image, make_jd(self.rng))
+        return await self.client.post("/analyze-jd", files={"jd_image": ("jd.png", self.cached_image, "image/png")})
+
+
+async def run_scenarios(base_url: str, scenarios: dict, requests: int, warmup: int, seed: int, server_pid: int) -> dict:
+    results = {}
+    async with httpx.AsyncClient(base_url=base_url, timeout=120.0) as client:
+        workload = Workload(client, seed)
+        response = await workload.upload(0)
+        response.raise_for_status()
+
+        for scenario, levels in scenarios.items():
+            make_request = getattr(workload, scenario)
+            # Uploads are slower per request and change server state, so they get fewer of them
+            count = max(1, requests // 4) if scenario == "upload" else requests
+            if warmup:
+                await drive(make_request, warmup, 1)
+            for concurrency in levels:
+                summary = await drive(make_request, count, concurrency)
+                summary["peak_rss_mb"] = peak_rss_mb(server_pid)
+                results[f"{scenario}@c{concurrency}"] = summary
+                print(f"  {scenario}@c{concurrency}: {_describe(summary)}", flush=True)
+            if scenario == "upload":
+                # Leave a resume in place for the scenarios that follow
+                (await workload.upload(0)).raise_for_status()
+    return results
+
+
+def _describe(summary: dict) -> str:
+    if "p50_ms" not in summary:
+        return f"all {summary['requests']} requests failed {summary['error_statuses']}"
+    return (
+        f"p50 {summary['p50_ms']}ms  p95 {summary['p95_ms']}ms  p99 {summary['p99_ms']}ms  "
+        f"{summary['rps']} req/s  errors {summary['errors']}/{summary['requests']}"
+    )
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Return a description of every metric that regressed by more than tolerance."""
+    regressions = []
+    for name, summary in results.get("results", {}).items():
+        reference = baseline.get("results", {}).get(name)
+        if reference is None:
+            continue
+        for metric, higher_is_worse in COMPARED.items():
+            current, previous = summary.get(metric), reference.get(metric)
+            if not current or not previous:
+                continue
+            change = (current - previous) / previous
+            if (change if higher_is_worse else -change) > tolerance:
+                regressions.append(f"{name} {metric}: {previous} -> {current} ({change:+.1%})")
+    return regressions
+
+
+def _tesseract_cmd(requested: str | None) -> str | None:
+    return requested or os.getenv("TESSERACT_CMD") or shutil.which("tesseract")
+
+
+def _start(args: list[str], cwd: str, env: dict, log_name: str) -> subprocess.Popen:
+    # Output goes to a file so a chatty server can never block on a full pipe
+    log = open(os.path.join(cwd, log_name), "wb")
+    return subprocess.Popen(args, cwd=cwd, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+def _stop(process: subprocess.Popen):
+    if process.poll() is None:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def _backend_command(port: int) -> list[str]:
+    return [
+        sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+        "--log-level", "warning"
+    ]
+
+
+def measure_cold_start(runs: int, workdir: str, env: dict) -> dict:
+    """Launch the backend runs times and time each launch until /health answers."""
+    samples = []
+    for _ in range(runs):
+        port = _free_port()
+        started = time.perf_counter()
+        process = _start(_backend_command(port), workdir, env, "cold_start.log")
+        try:
+            _wait_healthy(f"http://127.0.0.1:{port}/health", process, poll=0.01)
+            samples.append(time.perf_counter() - started)
+        finally:
+            _stop(process)
+    return {
+        "runs": runs,
+        "p50_ms": round(percentile(samples, 0.50) * 1000, 1),
+        "p95_ms": round(percentile(samples, 0.95) * 1000, 1),
+        "max_ms": round(max(samples) * 1000, 1)
+    }
+
+
+def run(args) -> dict:
+    scenarios = {name: SCENARIOS[name] for name in args.scenarios}
+    if args.concurrency:
+        scenarios = {name: ([1] if name == "upload" else args.concurrency) for name in scenarios}
+
+    skipped = {}
+    tesseract = _tesseract_cmd(args.tesseract_cmd)
+    for scenario in OCR_SCENARIOS:
+        if scenario in scenarios and not tesseract:
+            skipped[scenario] = "tesseract not found (install it or pass --tesseract-cmd)"
+            del scenarios[scenario]
+
+    stub_port, backend_port = _free_port(), _free_port()
+    workdir = tempfile.mkdtemp(prefix="shortlist-bench-")
+    env = {
+        **os.environ,
+        "OPENAI_API_KEY": "bench",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{stub_port}/v1",
+        "PYTHONPATH": str(BACKEND_DIR)
+    }
+    if tesseract:
+        env["TESSERACT_CMD"] = tesseract
+
+    stub = _start([
+        sys.executable, str(BENCH_DIR / "stub_openai.py"), "--port", str(stub_port),
+        "--latency-ms", str(args.latency_ms), "--jitter-ms", str(args.jitter_ms), "--error-rate", str(args.error_rate),
+        "--ms-per-token", str(args.ms_per_token)
+    ], workdir, env, "stub.log")
+    results = {}
+    backend = None
+    try:
+        _wait_healthy(f"http://127.0.0.1:{stub_port}/health", stub)
+        if args.cold_starts:
+            results["cold_start"] = measure_cold_start(args.cold_starts, workdir, env)
+            print(
+                f"  cold_start: p50 {results['cold_start']['p50_ms']}ms  max {results['cold_start']['max_ms']}ms "
+                f"to the first /health ({args.cold_starts} launches)", flush=True
+            )
+        backend = _start(_backend_command(backend_port), workdir, env, "backend.log")
+        _wait_healthy(f"http://127.0.0.1:{backend_port}/health", backend)
+        print(f"Benchmarking {', '.join(scenarios)} ({args.requests} requests per level)", flush=True)
+        results.update(asyncio.run(run_scenarios(
+            f"http://127.0.0.1:{backend_port}", scenarios, args.requests, args.warmup, args.seed, backend.pid
+        )))
+    except Exception:
+        if backend is not None:
+            _stop(backend)
+        for log_name in ("backend.log", "cold_start.log"):
+            if Path(workdir, log_name).exists():
+                sys.stderr.write(Path(workdir, log_name).read_text(errors="replace")[-4000:])
+        raise
+    finally:
+        if backend is not None:
+            _stop(backend)
+        _stop(stub)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "requests": args.requests,
+            "seed": args.seed,
+            "stub": {
+                "latency_ms": args.latency_ms, "jitter_ms": args.jitter_ms, "error_rate": args.error_rate,
+                "ms_per_token": args.ms_per_token
+            }
+        },
+        "skipped": skipped,
+        "results": results
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", type=lambda value: value.split(","), default=list(SCENARIOS),
+                        help=f"comma-separated subset of {','.join(SCENARIOS)}")
+    parser.add_argument("--concurrency", type=lambda value: [int(level) for level in value.split(",")],
+                        help="override the concurrency levels, e.g. 1,8,32")
+    parser.add_argument("--requests", type=int, default=64, help="requests per concurrency level")
+    parser.add_argument("--warmup", type=int, default=2, help="unmeasured requests before each scenario")
+    parser.add_argument("--cold-starts", type=int, default=5, help="server launches timed until the first /health (0 to skip)")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--latency-ms", type=float, default=300.0, help="stub OpenAI mean latency")
+    parser.add_argument("--jitter-ms", type=float, default=50.0, help="stub OpenAI latency standard deviation")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of stub OpenAI calls that fail")
+    parser.add_argument("--ms-per-token", type=float, default=0.0, help="stub OpenAI latency added per output token")
+    parser.add_argument("--tesseract-cmd", help="tesseract binary for the OCR scenario")
+    parser.add_argument("--output", default="bench_results.json", help="where to write the results")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE))
+    parser.add_argument("--write-baseline", action="store_true", help="store the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed relative regression (0.15 = 15%%)")
+    args = parser.parse_args()
+
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    results = run(args)
+    for scenario, reason in results["skipped"].items():
+        print(f"  {scenario}: skipped, {reason}")
+    Path(args.output).write_text(json.dumps(results, indent=2) + "\n")
+    print(f"Results written to {args.output}")
+
+    if args.write_baseline:
+        Path(args.baseline).write_text(json.dumps(results, indent=2) + "\n")
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    if not Path(args.baseline).exists():
+        print("No baseline to compare against (create one with --write-baseline)")
+        return 0
+    baseline = json.loads(Path(args.baseline).read_text())
+    if baseline.get("meta", {}).get("stub") != results["meta"]["stub"]:
+        print("Warning: the baseline was recorded with different stub settings")
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"Regressions beyond {args.tolerance:.0%}:")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+    print(f"No regressions beyond {args.tolerance:.0%} against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
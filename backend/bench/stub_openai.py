@@ -0,0 +1,144 @@
+"""
+Minimal OpenAI-compatible chat completions server for offline benchmarks.
+
+Answers the JD classifier with "yes", and analysis and draft calls with a
+fixed, valid result (streamed when requested), after a configurable latency
+with jitter plus an optional time per output token, failing a configurable
+share of calls with HTTP 500.
+
+    python bench/stub_openai.py --port 8900 --latency-ms 300 --jitter-ms 100 --error-rate 0.01
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+RESULT = {
+    "match_score": 72,
+    "missing_skills": ["Kubernetes", "Terraform"],
+    "contact_mode": "email",
+    "destination_email": "careers@example.com",
+    "warnings": []
+}
+DRAFT = {
+    "email_subject": "Application for the Backend Engineer role",
+    "email_body": (
+        "Dear Hiring Team,\n\nI am excited to apply for the Backend Engineer position. "
+        "I have built and operated Python services backed by PostgreSQL and Kafka, "
+        "and I would love to bring that experience to your team.\n\nBest regards,\nCandidate"
+    )
+}
+
+config = {"latency_ms": 300.0, "jitter_ms": 100.0, "error_rate": 0.0, "ms_per_token": 0.0}
+app = FastAPI(title="Stub OpenAI")
+
+
+def _usage(prompt: str, completion: str) -> dict:
+    # Rough token estimate; only the shape matters for the backend
+    prompt_tokens = len(prompt) // 4
+    completion_tokens = max(1, len(completion) // 4)
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens
+    }
+
+
+async def _wait(completion: str):
+    # Real completions take longer the more tokens they write
+    delay = max(0.0, random.gauss(config["latency_ms"], config["jitter_ms"]))
+    delay += config["ms_per_token"] * _usage("", completion)["completion_tokens"]
+    await asyncio.sleep(delay / 1000)
+
+
+@app.get("/health")
+def health():
+    return {"status": "ok"}
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    prompt = "".join(message.get("content", "") for message in body.get("messages", []))
+    if body.get("max_tokens") == 5:
+        content = "yes"
+    elif "Write job application outreach" in prompt:
+        content = json.dumps(DRAFT)
+    else:
+        content = json.dumps(RESULT)
+    completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+    created = int(time.time())
+    model = body.get("model", "gpt-4o-mini")
+
+    await _wait(content)
+    if random.random() < config["error_rate"]:
+        return JSONResponse(
+            status_code=500,
+            content={"error": {"message": "Injected stub error", "type": "server_error", "code": None}}
+        )
+
+    if not body.get("stream"):
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }],
+            "usage": _usage(prompt, content)
+        }
+
+    include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+
+    async def events():
+        def chunk(delta: dict, finish_reason=None, usage=None, choices=True) -> str:
+            data = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}] if choices else []
+            }
+            if usage is not None:
+                data["usage"] = usage
+            return f"data: {json.dumps(data)}\n\n"
+
+        yield chunk({"role": "assistant", "content": ""})
+        for start in range(0, len(content), 24):
+            # Spread a little of the latency over the stream like a real model
+            await asyncio.sleep(0.002)
+            yield chunk({"content": content[start:start + 24]})
+        yield chunk({}, finish_reason="stop")
+        if include_usage:
+            yield chunk({}, usage=_usage(prompt, content), choices=False)
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-ms", type=float, default=config["latency_ms"])
+    parser.add_argument("--jitter-ms", type=float, default=config["jitter_ms"])
+    parser.add_argument("--error-rate", type=float, default=config["error_rate"])
+    parser.add_argument("--ms-per-token", type=float, default=config["ms_per_token"])
+    args = parser.parse_args()
+    config.update(
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate, ms_per_token=args.ms_per_token
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,9 @@ const DEFAULT_BACKEND_URL = 'http://localhost:8000';
 // Store pasted image data
 let pastedImageFile = null;
 
+// Results currently shown (the drafts are merged in once written)
+let currentResults = null;
+
 // Load backend URL from storage (internal use only)
 async function getBackendUrl() {
     const result = await chrome.storage.local.get(['backendUrl']);
@@ -461,6 +464,7 @@ document.getElementById('analyzeBtn').addEventListener('click', async () => {
 // Save analysis results to storage
 async function saveAnalysisResults(data) {
     const resultsData = {
+        analysis_id: data.analysis_id,
         match_score: data.match_score,
         missing_skills: data.missing_skills || [],
         contact_mode: data.contact_mode || 'email',
@@ -496,8 +500,20 @@ async function clearCachedResults() {
     await chrome.storage.local.remove(['cachedAnalysisResults']);
 }
 
+// Whether the email/DM drafts for the contact mode are already present
+function hasDrafts(data) {
+    const contactMode = data.contact_mode || 'email';
+    const hasEmail = Boolean(data.email_subject || data.email_body);
+    const hasDm = Boolean(data.dm_message);
+    if (contactMode === 'email') return hasEmail;
+    if (contactMode === 'dm') return hasDm;
+    return hasEmail && hasDm;
+}
+
 // Display results
 function displayResults(data) {
+    currentResults = data;
+    
     // Switch to RESULT MODE
     switchToResultMode();
     
@@ -586,6 +602,16 @@ function displayResults(data) {
     document.getElementById('emailOnlyBlock').classList.add('hidden');
     document.getElementById('dmOnlyBlock').classList.add('hidden');
     document.getElementById('bothBlock').classList.add('hidden');
+    document.getElementById('draftBlock').classList.add('hidden');
+    clearStatus('draftStatus');
+    
+    // The analysis only scores; the drafts are written on request
+    if (!hasDrafts(data) && data.analysis_id) {
+        const draftLabels = { email: 'Write Email', dm: 'Write DM', both: 'Write Email & DM' };
+        document.getElementById('draftBtnText').textContent = draftLabels[contactMode] || 'Write Message';
+        document.getElementById('draftBlock').classList.remove('hidden');
+        return;
+    }
     
     if (contactMode === 'email') {
         // Show email only block
@@ -615,6 +641,50 @@ function displayResults(data) {
     }
 }
 
+// Set loading state of the draft button
+function setDraftLoadingState(isLoading) {
+    const draftBtn = document.getElementById('draftBtn');
+    const draftBtnSpinner = document.getElementById('draftBtnSpinner');
+    
+    draftBtn.disabled = isLoading;
+    if (isLoading) {
+        draftBtnSpinner.classList.remove('hidden');
+    } else {
+        draftBtnSpinner.classList.add('hidden');
+    }
+}
+
+// Write the email/DM drafts for the current analysis
+document.getElementById('draftBtn').addEventListener('click', async () => {
+    if (!currentResults || !currentResults.analysis_id) {
+        return;
+    }
+    
+    setDraftLoadingState(true);
+    clearStatus('draftStatus');
+    
+    try {
+        const backendUrl = await getBackendUrl();
+        const response = await fetch(`${backendUrl}/analyze-jd/${currentResults.analysis_id}/draft`, {
+            method: 'POST'
+        });
+        
+        const data = await response.json();
+        
+        if (response.ok) {
+            const results = { ...currentResults, ...data };
+            displayResults(results);
+            await saveAnalysisResults(results);
+        } else {
+            showStatus('draftStatus', data.detail || 'Writing the message failed', 'error');
+        }
+    } catch (error) {
+        showStatus('draftStatus', `Error: ${error.message}`, 'error');
+    } finally {
+        setDraftLoadingState(false);
+    }
+});
+
 // Switch to INPUT MODE (show input sections, hide results)
 function switchToInputMode() {
     document.getElementById('extensionTitle').classList.remove('hidden');
@@ -657,6 +727,8 @@ function clearResults() {
     document.getElementById('emailOnlyBlock').classList.add('hidden');
     document.getElementById('dmOnlyBlock').classList.add('hidden');
     document.getElementById('bothBlock').classList.add('hidden');
+    document.getElementById('draftBlock').classList.add('hidden');
+    currentResults = null;
     
     switchToInputMode();
 }